@@ -0,0 +1,172 @@
+import argparse
+import importlib
+import os
+import subprocess
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, List, Sequence
+
+# Modules behind each lazily loaded subsystem. The hardware stack initialises
+# pygame and MQTT at import time; the ML stack (enrollment, gallery export,
+# projection and replication) pulls in OpenCV, scikit-learn and, through the
+# embedding engine, DeepFace/TensorFlow. Routes reach these only through the
+# accessors below, so importing main.py loads none of them.
+SUBSYSTEMS = {
+    "hardware": ("hardware.aggregator", "hardware.fp_input"),
+    "ml": ("deepface_scripts.embedding_repository", "deepface_scripts.training_pipeline",
+           "deepface_scripts.gallery_export", "deepface_scripts.gallery_projection", "deepface_scripts.replication"),
+}
+# "models" builds the face detector and ArcFace and runs one dummy inference.
+WARM_UP_ORDER = ("hardware", "ml", "models")
+REPORT_MODULES = ("main",) + SUBSYSTEMS["hardware"] + SUBSYSTEMS["ml"] + ("deepface_scripts.embedding_engine", "deepface")
+REPORT_TOP = 15
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_status = {name: {"state": "pending", "seconds": None, "error": None} for name in WARM_UP_ORDER}
+_locks = {name: threading.Lock() for name in WARM_UP_ORDER}
+_warm_up_thread = None
+
+
+def _warm_models():
+    import numpy as np
+    from deepface_scripts.embedding_engine import get_engine
+    from deepface_scripts.face_detector import get_detector
+    get_detector().warm_up()
+    get_engine().represent([np.zeros((300, 300, 3), dtype=np.uint8)])
+
+
+def load(subsystem: str):
+    """Import (or warm up) a subsystem once; later calls return immediately.
+
+    A failed load is recorded in the status and re-raised, and the next
+    call tries again.
+    """
+    status = _status[subsystem]
+    if status["state"] == "ready":
+        return
+    with _locks[subsystem]:
+        if status["state"] == "ready":
+            return
+        status["state"] = "loading"
+        start = time.perf_counter()
+        try:
+            if subsystem == "models":
+                _warm_models()
+            else:
+                for name in SUBSYSTEMS[subsystem]:
+                    importlib.import_module(name)
+        except Exception as e:
+            status.update(state="failed", seconds=time.perf_counter() - start, error=str(e))
+            raise
+        status.update(state="ready", seconds=time.perf_counter() - start, error=None)
+
+
+def _module(name: str, subsystem: str) -> Any:
+    load(subsystem)
+    return sys.modules[name]
+
+
+def aggregator() -> Any:
+    return _module("hardware.aggregator", "hardware")
+
+
+def fp_input() -> Any:
+    return _module("hardware.fp_input", "hardware")
+
+
+def embedding_repository() -> Any:
+    return _module("deepface_scripts.embedding_repository", "ml")
+
+
+def training_pipeline() -> Any:
+    return _module("deepface_scripts.training_pipeline", "ml")
+
+
+def gallery_export() -> Any:
+    return _module("deepface_scripts.gallery_export", "ml")
+
+
+def gallery_projection() -> Any:
+    return _module("deepface_scripts.gallery_projection", "ml")
+
+
+def replication() -> Any:
+    return _module("deepface_scripts.replication", "ml")
+
+
+def lazy_function(accessor: Callable[[], Any], name: str) -> Callable:
+    """Module-level stand-in for `from <module> import name` that loads the module on first call."""
+    def call(*args, **kwargs):
+        return getattr(accessor(), name)(*args, **kwargs)
+    call.__name__ = name
+    return call
+
+
+def _warm_up():
+    for subsystem in WARM_UP_ORDER:
+        try:
+            load(subsystem)
+            print(f"[INFO] Warm-up: {subsystem} ready in {_status[subsystem]['seconds']:.2f}s")
+        except Exception as e:
+            print(f"[WARNING] Warm-up: {subsystem} failed: {str(e)}")
+
+
+def start_warm_up() -> threading.Thread:
+    """Load every subsystem in the background so the first request does not pay for it."""
+    global _warm_up_thread
+    if _warm_up_thread is None:
+        _warm_up_thread = threading.Thread(target=_warm_up, name="warm-up", daemon=True)
+        _warm_up_thread.start()
+    return _warm_up_thread
+
+
+def readiness() -> Dict[str, Any]:
+    """Per-subsystem state ("pending", "loading", "ready" or "failed") with load time and error."""
+    subsystems = {name: dict(status) for name, status in _status.items()}
+    return {"ready": all(s["state"] == "ready" for s in subsystems.values()), "subsystems": subsystems}
+
+
+def import_times(module: str) -> List[Dict[str, Any]]:
+    """Per-module import cost of `import module` in a fresh interpreter, from python -X importtime."""
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([BACKEND_DIR, os.path.dirname(BACKEND_DIR)] +
+                                                      [p for p in os.environ.get("PYTHONPATH", "").split(os.pathsep) if p]))
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=BACKEND_DIR, env=env, capture_output=True, text=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append({"module": name.strip(), "self_ms": int(self_us) / 1000, "cumulative_ms": int(cumulative_us) / 1000})
+    if result.returncode != 0:
+        print(f"[WARNING] import {module} failed: {result.stderr.strip().splitlines()[-1]}")
+        return []
+    return rows
+
+
+def import_report(modules: Sequence[str] = REPORT_MODULES, top: int = REPORT_TOP):
+    """Print the total import time of each module and the `top` slowest imports beneath it."""
+    for module in modules:
+        rows = import_times(module)
+        total = next((r["cumulative_ms"] for r in reversed(rows) if r["module"] == module), None)
+        print(f"[INFO] import {module}: " + (f"{total:.0f} ms" if total is not None else "failed"))
+        for row in sorted(rows, key=lambda r: -r["cumulative_ms"])[:top]:
+            print(f"    {row['cumulative_ms']:9.1f} ms cumulative {row['self_ms']:9.1f} ms self  {row['module']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backend subsystem loading")
+    sub = parser.add_subparsers(dest="command", required=True)
+    report = sub.add_parser("report", help="Import time per module, each target in a fresh interpreter")
+    report.add_argument("modules", nargs="*", default=list(REPORT_MODULES))
+    report.add_argument("--top", type=int, default=REPORT_TOP)
+    args = parser.parse_args()
+
+    if args.command == "report":
+        import_report(args.modules, args.top)
+
+
+if __name__ == "__main__":
+    main()
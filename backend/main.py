@@ -1,10 +1,12 @@
 import sys
 import os
+import time
+_import_start = time.perf_counter()
 sys.path.append("/home/salah/doorLockGui")  # Ensure deepface_scripts is importable
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from routes import admin, access, system_settings, user_profiles, gui_utils
-import webview
+from routes import admin, access, system_settings, user_profiles, gui_utils, replication
+from core import services
 import uvicorn
 from threading import Thread
 
@@ -27,11 +29,25 @@ app.add_middleware(
 def ping():
     return {"status": "ok"}
 
+@app.get("/ready")
+def ready():
+    """Which lazily loaded subsystems (hardware, ML stack, models) are loaded yet."""
+    return services.readiness()
+
+@app.on_event("startup")
+def start_warm_up():
+    # The API answers right away; hardware and the ML stack load behind it
+    services.start_warm_up()
+
 app.include_router(admin.router, prefix="/admin")
 app.include_router(access.router, prefix="/access")
 app.include_router(system_settings.router, prefix="/settings")
 app.include_router(user_profiles.router, prefix="/users")
 app.include_router(gui_utils.router, prefix="/gui", tags=["gui"])
+app.include_router(replication.router, prefix="/replication", tags=["replication"])
+
+print(f"[INFO] API importable in {time.perf_counter() - _import_start:.2f}s "
+      f"(per-module breakdown: python -m core.services report)")
 
 # Function to run FastAPI
 def run_fastapi():
@@ -39,6 +55,7 @@ def run_fastapi():
 
 # Start FastAPI and PyWebView together
 if __name__ == "__main__":
+    import webview
     # Run FastAPI in a separate thread
     thread = Thread(target=run_fastapi)
     thread.start()
@@ -3,7 +3,7 @@ from pydantic import BaseModel
 from typing import Optional
 from core.logic import process_access_attempt
 from utils import settings
-from hardware.aggregator import recent_logs
+from core.services import aggregator
 
 router = APIRouter()
 
@@ -35,4 +35,4 @@ def check_access(data: AccessRequest):
 
 @router.get("/recent-logs")
 def get_recent_logs():
-    return list(recent_logs)
\ No newline at end of file
+    return list(aggregator().recent_logs)
\ No newline at end of file
@@ -1,11 +1,13 @@
 from fastapi import APIRouter, HTTPException, Body, Query
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from utils import settings
 from utils.settings import get_settings, update_settings
 from core.user_profile import load_all_user_profiles
 from core.logic import process_access_attempt
 from utils.auth import create_token
-from deepface_scripts.embed_utils import load_embeddings
+from typing import Optional
+from core.services import gallery_export, gallery_projection
 import os
 import json
 
@@ -86,9 +88,35 @@ def change_pin(new_pin: str = Query(...)):
 # ------------------
 
 @router.get("/api/embeddings")
-def get_embeddings():
-    embeddings = load_embeddings()
-    return {"embeddings": embeddings}
+def get_embeddings(mode: str = Query("full"), format: str = Query("json"),
+                   offset: int = Query(0, ge=0),
+                   limit: Optional[int] = Query(None, ge=1)):
+    """Inspect the gallery.
+
+    mode=summary returns per-user counts, centroid norm and spread (no raw
+    vectors), paginated by user. mode=full returns the vectors; format=ndjson
+    streams one user per line and format=binary streams raw float32 records
+    (see gallery_export.iter_binary) instead of building one JSON document.
+    """
+    if mode not in ("full", "summary"):
+        raise HTTPException(status_code=400, detail="mode must be 'full' or 'summary'")
+    if format not in ("json", "ndjson", "binary"):
+        raise HTTPException(status_code=400, detail="format must be 'json', 'ndjson' or 'binary'")
+    export = gallery_export()
+    if mode == "summary":
+        return export.summarize_gallery(offset=offset, limit=limit or export.PAGE_SIZE)
+    if format == "ndjson":
+        return StreamingResponse(export.iter_ndjson(offset=offset, limit=limit), media_type="application/x-ndjson")
+    if format == "binary":
+        return StreamingResponse(export.iter_binary(offset=offset, limit=limit), media_type="application/octet-stream")
+    return {"embeddings": list(export.iter_entries(offset=offset, limit=limit))}
+
+@router.get("/api/embeddings/projection")
+def get_embedding_projection(method: str = Query("pca")):
+    """2-D layout of every embedding for the viewer, cached per gallery version."""
+    if method not in ("pca", "random"):
+        raise HTTPException(status_code=400, detail="method must be 'pca' or 'random'")
+    return gallery_projection().get_projection(method=method).layout()
 
 # ------------------
 # Get Settings
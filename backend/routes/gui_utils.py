@@ -1,11 +1,8 @@
 from fastapi import APIRouter
 from pydantic import BaseModel, validator
-from hardware.fp_input import send_delete_command, send_enroll_command, send_delete_all_command
-from hardware.aggregator import log_event
 from backend.utils.settings import get_settings, update_settings
 from backend.core.user_profile import get_user_by_id, remove_user_by_id, load_all_user_profiles, update_user_by_id
-from deepface_scripts.embed_utils import load_embeddings, save_embeddings
-from deepface_scripts.training_pipeline import add_new_user, start_face_embedding_extraction
+from core.services import aggregator, fp_input, embedding_repository, training_pipeline, lazy_function
 import os
 import re
 import uuid
@@ -17,6 +14,17 @@ USER_PROFILES_PATH = os.path.join(BASE_DIR, "backend/utils/user_profiles.json")
 SETTINGS_PATH = os.path.join(BASE_DIR, "backend/settings.json")
 EMBEDDINGS_PATH = os.path.join(BASE_DIR, "deepface_scripts/face_embeddings.pkl")
 
+# Hardware (pygame, MQTT) and the ML stack load on first use or from the startup warm-up
+send_delete_command = lazy_function(fp_input, "send_delete_command")
+send_enroll_command = lazy_function(fp_input, "send_enroll_command")
+send_delete_all_command = lazy_function(fp_input, "send_delete_all_command")
+log_event = lazy_function(aggregator, "log_event")
+add_user_embeddings = lazy_function(embedding_repository, "add_user_embeddings")
+remove_user = lazy_function(embedding_repository, "remove_user")
+clear_gallery = lazy_function(embedding_repository, "clear_gallery")
+add_new_user = lazy_function(training_pipeline, "add_new_user")
+start_face_embedding_extraction = lazy_function(training_pipeline, "start_face_embedding_extraction")
+
 # Valid roles
 VALID_ROLES = ["user", "admin"]
 
@@ -127,17 +135,11 @@ def create_user_profile(name: str, role: str) -> str | None:
 def add_face_embeddings(user_id: str) -> bool:
     try:
         log_event("Starting face embedding extraction", f"user_id: {user_id}", gui_keywords=True)
-        embeddings = start_face_embedding_extraction(user_id)
-        if not embeddings:
+        # Captures, embeds and stores the user's embeddings in one step
+        if not start_face_embedding_extraction(user_id):
             log_event("[ERROR] Failed to capture face embeddings", f"user_id: {user_id}", gui_keywords=True)
             return False
 
-        all_embeddings = load_embeddings(EMBEDDINGS_PATH)
-        for emb in embeddings:
-            emb['user_id'] = user_id
-        all_embeddings.extend(embeddings)
-        save_embeddings(all_embeddings, EMBEDDINGS_PATH)
-
         log_event("[SUCCESS] Face embeddings saved", f"user_id: {user_id}", gui_keywords=True)
         return True
     except Exception as e:
@@ -224,7 +226,7 @@ async def add_new_user_endpoint(request: UserRequest):
         # Apply face embedding pipeline if requested
         if request.apply_face_pipeline:
             log_event(f"Starting face embedding extraction for user: {request.name}", gui_keywords=True)
-            face_embeddings = start_face_embedding_extraction(id)  # Assumes temp user_id handled internally
+            face_embeddings = start_face_embedding_extraction(id)  # Stores the embeddings under id
             if not face_embeddings:
                 log_event("[ERROR] Failed to capture face embeddings", f"name: {request.name}", gui_keywords=True)
                 return {"success": False, "error": "Failed to capture face embeddings"}
@@ -237,6 +239,8 @@ async def add_new_user_endpoint(request: UserRequest):
             enrolled_fps = send_list_command()
             if enrolled_fps is None:
                 log_event("[ERROR] Failed to get fingerprint list", gui_keywords=True)
+                if face_embeddings:
+                    remove_user(id)
                 return {"success": False, "error": "Failed to communicate with fingerprint sensor"}
             
             # Find next available position
@@ -248,6 +252,8 @@ async def add_new_user_endpoint(request: UserRequest):
             
             if available_position is None:
                 log_event("[ERROR] No available fingerprint positions", gui_keywords=True)
+                if face_embeddings:
+                    remove_user(id)
                 return {"success": False, "error": "No available fingerprint positions"}
             
             success = send_enroll_command(available_position)
@@ -256,6 +262,8 @@ async def add_new_user_endpoint(request: UserRequest):
                 log_event(f"[SUCCESS] Enrolled fingerprint at position {available_position} for user: {request.name}", gui_keywords=True)
             else:
                 log_event(f"[ERROR] Failed to enroll fingerprint for user: {request.name}", gui_keywords=True)
+                if face_embeddings:
+                    remove_user(id)
                 return {"success": False, "error": "Fingerprint enrollment failed"}
         
         # Add the user with collected data
@@ -266,19 +274,13 @@ async def add_new_user_endpoint(request: UserRequest):
             fp_position=fingerprint_position
         )
         if user_id:
-            # Save face embeddings if any
-            if face_embeddings:
-                embeddings = load_embeddings(EMBEDDINGS_PATH)
-                for emb in face_embeddings:
-                    emb['user_id'] = user_id
-                embeddings.extend(face_embeddings)
-                save_embeddings(embeddings, EMBEDDINGS_PATH)
-            
             log_event(f"[SUCCESS] Added user", f"id: {user_id}, name: {request.name}, role: {request.role}, "
                      f"fingerprint_position: {fingerprint_position}, has_embeddings: {bool(face_embeddings)}", gui_keywords=True)
             return {"success": True, "message": "User added successfully", "user_id": user_id}
         else:
             log_event("[ERROR] Failed to add user", f"name: {request.name}, role: {request.role}", gui_keywords=True)
+            if face_embeddings:
+                remove_user(id)
             return {"success": False, "error": "Failed to add new user"}
     except Exception as e:
         log_event("[ERROR] add_new_user error", str(e), gui_keywords=True)
@@ -287,7 +289,7 @@ async def add_new_user_endpoint(request: UserRequest):
 @router.post("/retake_face_embeddings")
 async def retake_face_embeddings(request: UserIdRequest):
     """
-    Delete and retake face embeddings for a user, append to face_embeddings.pkl.
+    Delete and retake face embeddings for a user, replacing the stored ones in one step.
     
     Parameters:
         request (UserIdRequest): JSON payload with user_id (e.g., {"user_id": "123e4567-e89b-12d3-a456-426614174000"}).
@@ -302,16 +304,11 @@ async def retake_face_embeddings(request: UserIdRequest):
     try:
         user_id = request.user_id
         log_event(f"Retaking face embeddings", f"user_id: {user_id}", gui_keywords=True)
-        embeddings = load_embeddings(EMBEDDINGS_PATH)
-        embeddings = [emb for emb in embeddings if emb.get('user_id') != user_id]
-        
-        new_embeddings = start_face_embedding_extraction(user_id)
-        if not new_embeddings:
+        # Old embeddings stay in place until the new capture succeeds
+        if not start_face_embedding_extraction(user_id, replace=True):
             log_event("[ERROR] Failed to capture embeddings", f"user_id: {user_id}", gui_keywords=True)
             return {"success": False, "error": "Failed to capture new embeddings"}
         
-        embeddings.extend(new_embeddings)
-        save_embeddings(embeddings, EMBEDDINGS_PATH)
         log_event("[SUCCESS] Retaken embeddings", f"user_id: {user_id}", gui_keywords=True)
         return {"success": True, "message": "Face embeddings retaken successfully"}
     except FileNotFoundError:
@@ -392,9 +389,7 @@ async def delete_user_profile(request: UserIdRequest):
         #     log_event(f"Sent delete command", f"fp_position: {user.fingerprint_position}, user_id: {user_id}", gui_keywords=True)
         
         # Delete face embeddings
-        embeddings = load_embeddings(EMBEDDINGS_PATH)
-        embeddings = [emb for emb in embeddings if emb.get('user_id') != user_id]
-        save_embeddings(embeddings, EMBEDDINGS_PATH)
+        remove_user(user_id, EMBEDDINGS_PATH)
         
         # Remove profile
         remove_user_by_id(user_id)
@@ -466,7 +461,7 @@ async def reset_system(request: ResetRequest):
         
         # Reset embeddings
         try:
-            save_embeddings([], EMBEDDINGS_PATH)
+            clear_gallery(EMBEDDINGS_PATH)
             log_event("Reset all face embeddings", gui_keywords=True)
         except Exception as e:
             log_event("[ERROR] Failed to reset embeddings", str(e), gui_keywords=True)
@@ -649,12 +644,7 @@ async def create_user_profile_old(request: CreateUserProfileRequest):
         
         # Save face embeddings if provided
         if request.face_embeddings:
-            embeddings = load_embeddings(EMBEDDINGS_PATH)
-            # Update user_id in the embeddings
-            for embedding in request.face_embeddings:
-                embedding['user_id'] = user_id
-            embeddings.extend(request.face_embeddings)
-            save_embeddings(embeddings, EMBEDDINGS_PATH)
+            add_user_embeddings(user_id, request.face_embeddings, path=EMBEDDINGS_PATH)
         
         log_event(f"[SUCCESS] Created user profile", f"user_id: {user_id}", gui_keywords=True)
         return {
@@ -0,0 +1,48 @@
+import json
+from typing import Optional
+from fastapi import APIRouter, Header, HTTPException, Query
+from fastapi.responses import Response
+from core.user_profile import USER_FILE
+from core.services import replication
+
+router = APIRouter()
+
+# ------------------------------
+# Gallery replication (this unit as leader)
+# ------------------------------
+
+def _signed(endpoint: str, since: Optional[int], timestamp: Optional[str], signature: Optional[str],
+            build, media_type: str) -> Response:
+    """Serve `build()` only to followers holding the shared secret, signing the body for them to verify."""
+    rep = replication()
+    try:
+        secret = rep.load_secret()
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    if not rep.verify_request(secret, timestamp, signature, endpoint, since):
+        raise HTTPException(status_code=401, detail="Invalid replication signature")
+    body = build()
+    return Response(content=body, media_type=media_type,
+                    headers={rep.SIGNATURE_HEADER: rep.response_signature(secret, timestamp, body)})
+
+@router.get("/delta")
+def get_delta(since: Optional[int] = Query(None),
+              x_replication_time: Optional[str] = Header(None),
+              x_replication_signature: Optional[str] = Header(None)):
+    return _signed("delta", since, x_replication_time, x_replication_signature,
+                   lambda: json.dumps(replication().export_delta(since, profiles_path=USER_FILE)).encode(),
+                   "application/json")
+
+@router.get("/snapshot")
+def get_snapshot(x_replication_time: Optional[str] = Header(None),
+                 x_replication_signature: Optional[str] = Header(None)):
+    return _signed("snapshot", None, x_replication_time, x_replication_signature,
+                   lambda: replication().export_snapshot(profiles_path=USER_FILE),
+                   "application/octet-stream")
+
+@router.get("/profiles")
+def get_profiles(x_replication_time: Optional[str] = Header(None),
+                 x_replication_signature: Optional[str] = Header(None)):
+    return _signed("profiles", None, x_replication_time, x_replication_signature,
+                   lambda: json.dumps({"profiles": replication().read_profiles(USER_FILE)}).encode(),
+                   "application/json")
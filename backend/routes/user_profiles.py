@@ -2,7 +2,7 @@ from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from typing import List
 from core.user_profile import update_user_by_id, load_all_user_profiles
-from deepface_scripts.training_pipeline import add_new_user
+from core.services import training_pipeline
 
 router = APIRouter()
 
@@ -19,7 +19,7 @@ async def add_user(profile: UserProfileCreate):
     # Placeholder admin check (replace with actual auth logic)
     # if not is_admin_request():
     #     raise HTTPException(status_code=403, detail="Admin access required")
-    user_id = add_new_user(profile.name, profile.role, profile.fingerprint_position)
+    user_id = training_pipeline().add_new_user(profile.name, profile.role, profile.fingerprint_position)
     if user_id:
         return {"user_id": user_id, "message": f"User {profile.name} added successfully"}
     raise HTTPException(status_code=500, detail="Failed to add user")
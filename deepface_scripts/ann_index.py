@@ -0,0 +1,290 @@
+import argparse
+import os
+import time
+import numpy as np
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from deepface_scripts.gallery import EMBEDDING_DIM, flatten_embeddings, l2_normalize
+
+DEFAULT_NPROBE = 8
+KMEANS_ITERATIONS = 20
+TRAIN_SAMPLES_PER_LIST = 64  # k-means training subsample size per inverted list
+RETRAIN_GROWTH = 2.0  # Retrain the coarse quantizer once the index grows this much past its training size
+MIN_TRAIN_SIZE = 256  # Below this a single list (exact search) is used
+
+
+def index_path(embeddings_path: str) -> str:
+    """Index file stored next to the embedding pickle (face_embeddings.pkl -> face_embeddings.ivf.npz)."""
+    return os.path.splitext(embeddings_path)[0] + ".ivf.npz"
+
+
+def default_nlist(n: int) -> int:
+    if n < MIN_TRAIN_SIZE:
+        return 1
+    return int(np.clip(round(np.sqrt(n)), 1, 1024))
+
+
+def spherical_kmeans(vectors: np.ndarray, k: int, iterations: int = KMEANS_ITERATIONS,
+                     seed: int = 0) -> np.ndarray:
+    """k-means on unit vectors with cosine assignment; returns unit centroids."""
+    rng = np.random.default_rng(seed)
+    k = max(1, min(k, len(vectors)))
+    centroids = vectors[rng.choice(len(vectors), k, replace=False)].copy()
+    for _ in range(iterations):
+        assign = np.argmax(vectors @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, vectors)
+        empty = np.bincount(assign, minlength=k) == 0
+        # Re-seed empty lists with random points so every list stays in use
+        sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()))]
+        centroids = l2_normalize(sums)
+    return centroids
+
+
+class IVFIndex:
+    """Inverted-file ANN index over L2-normalised embeddings.
+
+    A k-means coarse quantizer splits the gallery into `nlist` lists; a
+    query is scored only against the vectors in its `nprobe` closest lists.
+    Each list keeps its own vector block and user-id labels, so inserting or
+    deleting a user only copies the lists that user touches.
+    """
+
+    def __init__(self, centroids: np.ndarray, nprobe: int = DEFAULT_NPROBE):
+        self.centroids = np.ascontiguousarray(centroids, dtype=np.float32)
+        self.nprobe = nprobe
+        nlist = len(self.centroids)
+        self.lists = [np.zeros((0, EMBEDDING_DIM), dtype=np.float32) for _ in range(nlist)]
+        self.labels = [np.array([], dtype=str) for _ in range(nlist)]
+        self.trained_size = 0
+        self.version = 0  # Embedding store version the index reflects
+
+    @classmethod
+    def train(cls, user_ids: Sequence[str], vectors: np.ndarray, nlist: Optional[int] = None,
+              nprobe: int = DEFAULT_NPROBE, seed: int = 0) -> "IVFIndex":
+        """Train the coarse quantizer on the given gallery and index all of it."""
+        vectors = l2_normalize(np.asarray(vectors, dtype=np.float32).reshape(-1, EMBEDDING_DIM))
+        nlist = nlist or default_nlist(len(vectors))
+        if len(vectors) == 0:
+            index = cls(np.zeros((1, EMBEDDING_DIM), dtype=np.float32), nprobe)
+            return index
+        rng = np.random.default_rng(seed)
+        sample = vectors
+        if len(vectors) > nlist * TRAIN_SAMPLES_PER_LIST:
+            sample = vectors[rng.choice(len(vectors), nlist * TRAIN_SAMPLES_PER_LIST, replace=False)]
+        index = cls(spherical_kmeans(sample, nlist, seed=seed), nprobe)
+        index.add(user_ids, vectors)
+        index.trained_size = len(vectors)
+        return index
+
+    @classmethod
+    def from_embeddings(cls, entries: Sequence[Dict[str, Any]], **kwargs) -> "IVFIndex":
+        user_ids, vectors = flatten_embeddings(entries)
+        return cls.train(user_ids, vectors, **kwargs)
+
+    def __len__(self) -> int:
+        return sum(len(block) for block in self.lists)
+
+    @property
+    def users(self) -> List[str]:
+        return sorted(set().union(*[set(labels.tolist()) for labels in self.labels]))
+
+    def needs_retrain(self) -> bool:
+        n = len(self)
+        if not self.trained_size:
+            return n >= MIN_TRAIN_SIZE
+        return n > RETRAIN_GROWTH * self.trained_size or (len(self.centroids) == 1 and n >= MIN_TRAIN_SIZE)
+
+    def add(self, user_ids: Sequence[str], vectors: np.ndarray):
+        """Assign new vectors to their nearest list."""
+        vectors = l2_normalize(np.asarray(vectors, dtype=np.float32).reshape(-1, EMBEDDING_DIM))
+        if not len(vectors):
+            return
+        user_ids = np.asarray(user_ids, dtype=str)
+        assign = np.argmax(vectors @ self.centroids.T, axis=1)
+        for lst in np.unique(assign):
+            rows = assign == lst
+            self.lists[lst] = np.concatenate([self.lists[lst], vectors[rows]])
+            self.labels[lst] = np.concatenate([self.labels[lst], user_ids[rows]])
+
+    def add_user(self, user_id: str, vectors: np.ndarray):
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, EMBEDDING_DIM)
+        self.add([user_id] * len(vectors), vectors)
+
+    def remove_user(self, user_id: str) -> int:
+        """Drop every vector of a user; returns how many were removed."""
+        removed = 0
+        for lst, labels in enumerate(self.labels):
+            keep = labels != user_id
+            if not keep.all():
+                removed += int((~keep).sum())
+                self.lists[lst] = self.lists[lst][keep]
+                self.labels[lst] = labels[keep]
+        return removed
+
+    def search(self, queries: np.ndarray, k: int = 10,
+               nprobe: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (labels, similarities), each (F, k), best first; missing slots are "" / -inf."""
+        queries = l2_normalize(np.asarray(queries, dtype=np.float32).reshape(-1, EMBEDDING_DIM))
+        nprobe = min(nprobe or self.nprobe, len(self.centroids))
+        probe = np.argsort(-(queries @ self.centroids.T), axis=1)[:, :nprobe]
+        out_labels = np.full((len(queries), k), "", dtype=object)
+        out_sims = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        for i, q in enumerate(queries):
+            blocks = [self.lists[lst] for lst in probe[i] if len(self.lists[lst])]
+            if not blocks:
+                continue
+            candidates = np.concatenate(blocks)
+            labels = np.concatenate([self.labels[lst] for lst in probe[i] if len(self.lists[lst])])
+            sims = candidates @ q
+            top = min(k, len(sims))
+            best = np.argpartition(-sims, top - 1)[:top]
+            best = best[np.argsort(-sims[best])]
+            out_labels[i, :top] = labels[best]
+            out_sims[i, :top] = sims[best]
+        return out_labels, out_sims
+
+    def nearest_users(self, query: np.ndarray, k: int = 10, nprobe: Optional[int] = None) -> Dict[str, float]:
+        """Best cosine distance per user among the k nearest samples of one query."""
+        labels, sims = self.search(query, k, nprobe)
+        best = {}
+        for label, sim in zip(labels[0], sims[0]):
+            if label and label not in best:
+                best[label] = float(1.0 - sim)
+        return best
+
+    def save(self, path: str):
+        """Write the index atomically (temp file + rename)."""
+        sizes = np.array([len(block) for block in self.lists], dtype=np.int64)
+        tmp = path + ".tmp.npz"
+        np.savez(tmp,
+                 centroids=self.centroids,
+                 vectors=np.concatenate(self.lists) if len(self) else np.zeros((0, EMBEDDING_DIM), np.float32),
+                 labels=np.concatenate(self.labels).astype(str) if len(self) else np.array([], dtype=str),
+                 offsets=np.concatenate([[0], np.cumsum(sizes)]),
+                 meta=np.array([self.nprobe, self.trained_size, self.version], dtype=np.int64))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> "IVFIndex":
+        with np.load(path) as data:
+            meta = [int(v) for v in data["meta"]]
+            nprobe, trained_size = meta[:2]
+            index = cls(data["centroids"], nprobe)
+            offsets, vectors, labels = data["offsets"], data["vectors"], data["labels"]
+            for lst in range(len(index.centroids)):
+                index.lists[lst] = vectors[offsets[lst]:offsets[lst + 1]]
+                index.labels[lst] = labels[offsets[lst]:offsets[lst + 1]]
+            index.trained_size = trained_size
+            index.version = meta[2] if len(meta) > 2 else 0
+        return index
+
+
+def load_index(embeddings_path: str) -> Optional[IVFIndex]:
+    path = index_path(embeddings_path)
+    if not os.path.exists(path):
+        return None
+    try:
+        return IVFIndex.load(path)
+    except Exception as e:
+        print(f"[ERROR] Failed to load ANN index {path}: {str(e)}")
+        return None
+
+
+def rebuild_index(embeddings_path: str) -> IVFIndex:
+    """Retrain the index from the whole embedding store and persist it."""
+    from deepface_scripts.embedding_store import get_store
+    store = get_store(embeddings_path)
+    with store.exclusive():
+        return _rebuild(store, embeddings_path)
+
+
+def _rebuild(store, embeddings_path: str) -> IVFIndex:
+    version = store.version
+    index = IVFIndex.train(*store.arrays())
+    index.version = version
+    index.save(index_path(embeddings_path))
+    return index
+
+
+def sync_index(embeddings_path: str) -> IVFIndex:
+    """Bring the persisted index up to the store's current version and return it.
+
+    Gallery edits do not touch the index; the recognition service calls
+    this when it picks up a new gallery version (see
+    RecognitionService._attach_index) and the `sync` command does it by
+    hand. Only the users changed since the index's version
+    (store.changes_since) are removed and re-inserted, and the index is retrained from scratch
+    when it is missing, the store was compacted past its version, or it
+    grew past RETRAIN_GROWTH. Runs under the store's writer lock, so
+    concurrent syncs and edits cannot lose each other's updates.
+    """
+    from deepface_scripts.embedding_store import get_store
+    store = get_store(embeddings_path)
+    with store.exclusive():
+        index = load_index(embeddings_path)
+        changes = store.changes_since(index.version) if index is not None else None
+        if changes is None:
+            return _rebuild(store, embeddings_path)
+        if not changes:
+            return index
+        for user_id, vectors in changes.items():
+            index.remove_user(user_id)
+            if vectors is not None:
+                index.add_user(user_id, vectors)
+        if index.needs_retrain():
+            return _rebuild(store, embeddings_path)
+        index.version = store.version
+        index.save(index_path(embeddings_path))
+        return index
+
+
+def exact_search(matrix: np.ndarray, labels: np.ndarray, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Brute-force reference for recall measurements; matrix must be L2-normalised."""
+    sims = l2_normalize(queries) @ matrix.T
+    top = np.argsort(-sims, axis=1)[:, :k]
+    return labels[top], np.take_along_axis(sims, top, axis=1)
+
+
+def benchmark_recall(user_ids: Sequence[str], vectors: np.ndarray, queries: np.ndarray,
+                     nprobes: Sequence[int] = (1, 2, 4, 8, 16, 32), k: int = 10,
+                     nlist: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Recall@k of the sample neighbours and per-query latency for exact search and each nprobe."""
+    matrix = l2_normalize(vectors)
+    labels = np.asarray(user_ids, dtype=str)
+    start = time.perf_counter()
+    index = IVFIndex.train(labels, matrix, nlist=nlist)
+    train_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    exact_labels, exact_sims = exact_search(matrix, labels, queries, k)
+    exact_ms = 1000 * (time.perf_counter() - start) / len(queries)
+    rows = [{"method": "exact", "nprobe": len(index.centroids), "recall": 1.0,
+             "top1_user_agree": 1.0, "ms_per_query": exact_ms, "train_s": 0.0}]
+    for nprobe in nprobes:
+        if nprobe > len(index.centroids):
+            continue
+        start = time.perf_counter()
+        _, sims = index.search(queries, k, nprobe)
+        ms = 1000 * (time.perf_counter() - start) / len(queries)
+        found, _ = index.search(queries, 1, nprobe)
+        # A returned neighbour counts when its similarity reaches the exact k-th best
+        hits = (sims >= exact_sims[:, -1:] - 1e-6).sum(axis=1)
+        rows.append({"method": "ivf", "nprobe": nprobe, "recall": float(np.mean(np.minimum(hits, k) / k)),
+                     "top1_user_agree": float(np.mean(found[:, 0] == exact_labels[:, 0])),
+                     "ms_per_query": ms, "train_s": train_s})
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="IVF index next to the embedding store")
+    parser.add_argument("command", choices=["sync", "rebuild"])
+    parser.add_argument("--embeddings", default=None, help="Embeddings path (default: the enrolled gallery)")
+    args = parser.parse_args()
+    from deepface_scripts.embed_utils import EMBEDDINGS_PATH
+    path = args.embeddings or EMBEDDINGS_PATH
+    index = sync_index(path) if args.command == "sync" else rebuild_index(path)
+    print(f"[INFO] ANN index at v{index.version}: {len(index)} vectors, {len(index.centroids)} lists")
+
+
+if __name__ == "__main__":
+    main()
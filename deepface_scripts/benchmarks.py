@@ -0,0 +1,338 @@
+import argparse
+import glob
+import os
+import time
+import cv2
+import numpy as np
+
+TEST_DATASET_DIR = "/home/salah/doorLockGui/deepface_scripts/test_dataset"
+# Largest cosine distance between two preprocessing paths' embeddings of the
+# same crop for an existing gallery to count as compatible with the other path.
+COMPAT_MAX_DISTANCE = 0.02
+
+
+def load_test_images(folder=TEST_DATASET_DIR, limit=None):
+    """Load BGR images from the test dataset folder (sorted by path)."""
+    paths = sorted(glob.glob(os.path.join(folder, "**", "*.jpg"), recursive=True) +
+                   glob.glob(os.path.join(folder, "**", "*.png"), recursive=True))
+    images = [cv2.imread(p) for p in paths[:limit]]
+    return [img for img in images if img is not None]
+
+
+def synthetic_crops(count, size=200, seed=0):
+    """Random face-sized crops for timing when no dataset is available."""
+    rng = np.random.default_rng(seed)
+    return [rng.integers(0, 256, (size, size, 3), dtype=np.uint8) for _ in range(count)]
+
+
+def benchmark_batch_sizes(crops, batch_sizes=(1, 4, 8, 16), repeats=3):
+    """Time ArcFace forward passes over the same crops at each batch size."""
+    from deepface_scripts.embedding_engine import ArcFaceEngine
+    engine = ArcFaceEngine()
+    tensor = engine.preprocess_batch(crops)
+    engine.embed_tensor(tensor[:max(batch_sizes)], batch_size=max(batch_sizes))  # warm-up / graph build
+    results = []
+    for bs in batch_sizes:
+        best = float("inf")
+        for _ in range(repeats):
+            start = time.perf_counter()
+            engine.embed_tensor(tensor, batch_size=bs)
+            best = min(best, time.perf_counter() - start)
+        results.append({"batch_size": bs, "total_s": best, "ms_per_face": 1000 * best / len(tensor),
+                        "faces_per_s": len(tensor) / best})
+    return results
+
+
+def synthetic_gallery(users, samples, dim=512, spread=0.8, seed=0):
+    """Clustered unit vectors standing in for a large enrolled gallery."""
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((users, dim)).astype(np.float32)
+    centres /= np.linalg.norm(centres, axis=1, keepdims=True)
+    noise = rng.standard_normal((users, samples, dim)).astype(np.float32) * spread / np.sqrt(dim)
+    vectors = (centres[:, None, :] + noise).reshape(-1, dim)
+    user_ids = np.repeat([f"user_{i}" for i in range(users)], samples)
+    return list(user_ids), vectors, centres
+
+
+def ann_queries(centres, count, spread=0.8, seed=1):
+    rng = np.random.default_rng(seed)
+    picks = rng.integers(0, len(centres), count)
+    noise = rng.standard_normal((count, centres.shape[1])).astype(np.float32) * spread / np.sqrt(centres.shape[1])
+    return centres[picks] + noise
+
+
+def benchmark_precisions(user_ids, vectors, queries, precisions=("float32", "float16", "int8"), repeats=3):
+    """Memory, scoring speed and decision changes of quantized galleries relative to float32."""
+    from deepface_scripts.gallery import GalleryMatcher
+    reference = GalleryMatcher(user_ids, vectors, precision="float32")
+    ref_distances = reference.user_distances(queries)
+    ref_best = ref_distances.argmin(axis=1)
+    ref_match = ref_distances.min(axis=1) < reference.threshold
+    rows = []
+    for precision in precisions:
+        matcher = GalleryMatcher(user_ids, vectors, precision=precision)
+        best_s = float("inf")
+        for _ in range(repeats):
+            start = time.perf_counter()
+            distances = matcher.user_distances(queries)
+            best_s = min(best_s, time.perf_counter() - start)
+        best = distances.argmin(axis=1)
+        match = distances.min(axis=1) < matcher.threshold
+        rows.append({"precision": precision, "megabytes": matcher.nbytes / 1e6,
+                     "memory_ratio": reference.nbytes / matcher.nbytes,
+                     "ms_per_query": 1000 * best_s / len(queries),
+                     "max_distance_diff": f"{np.abs(distances - ref_distances).max():.2e}",
+                     "changed_user": int((best != ref_best).sum()),
+                     "changed_match": int((match != ref_match).sum())})
+    return rows
+
+
+def compare_preprocessing(crops, backends=("opencv", "skip"), matcher=None, repeats=2,
+                          max_distance=COMPAT_MAX_DISTANCE):
+    """Latency of each ArcFace preprocessing backend and whether it is compatible with the first one.
+
+    The first backend is the reference (the "opencv" re-detection existing
+    galleries were enrolled with). For the others, reports the cosine
+    distance between both embeddings of the same crop and, given a gallery
+    matcher, how many match decisions (best user or accept/reject) change.
+    A backend is marked compatible only if no decision changes and no crop
+    moves further than max_distance.
+    """
+    from deepface_scripts.embedding_engine import ArcFaceEngine
+    from deepface_scripts.gallery import l2_normalize
+    rows, reference = [], None
+    for backend in backends:
+        engine = ArcFaceEngine(detector_backend=backend)
+        engine.represent(crops[:1])  # Warm-up / graph build
+        best = float("inf")
+        for _ in range(repeats):
+            start = time.perf_counter()
+            vectors = engine.represent(crops)
+            best = min(best, time.perf_counter() - start)
+        row = {"backend": backend, "ms_per_face": 1000 * best / len(crops)}
+        if reference is None:
+            reference = vectors
+            row.update({"mean_cos_dist": 0.0, "max_cos_dist": 0.0})
+        else:
+            dist = 1.0 - np.sum(l2_normalize(vectors) * l2_normalize(reference), axis=1)
+            row.update({"mean_cos_dist": float(dist.mean()), "max_cos_dist": float(dist.max())})
+        if matcher is not None and len(matcher.users):
+            distances = matcher.user_distances(vectors)
+            ref_distances = matcher.user_distances(reference)
+            changed_user = distances.argmin(axis=1) != ref_distances.argmin(axis=1)
+            changed_match = (distances.min(axis=1) < matcher.threshold) != (ref_distances.min(axis=1) < matcher.threshold)
+            row.update({"changed_user": int(changed_user.sum()), "changed_match": int(changed_match.sum())})
+        row["compatible"] = "yes" if (row["max_cos_dist"] <= max_distance and not row.get("changed_user")
+                                      and not row.get("changed_match")) else "no"
+        rows.append(row)
+    return rows
+
+
+def _probe_engine(backend, crops, repeats):
+    """Runs in a fresh process: import, load and per-face latency of one engine, plus peak RSS."""
+    import resource
+    start = time.perf_counter()
+    from deepface_scripts.embedding_engine import ENGINES
+    import_s = time.perf_counter() - start
+    start = time.perf_counter()
+    engine = ENGINES[backend]()
+    load_s = time.perf_counter() - start
+    start = time.perf_counter()
+    engine.represent(crops[:1])
+    first_ms = 1000 * (time.perf_counter() - start)
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        engine.represent(crops)
+        best = min(best, time.perf_counter() - start)
+    return {"engine": backend, "import_s": import_s, "load_s": load_s, "first_ms": first_ms,
+            "ms_per_face": 1000 * best / len(crops), "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}
+
+
+def benchmark_engines(crops, backends=("keras", "onnx"), repeats=3):
+    """Startup, memory and latency of each embedding engine, each measured in its own spawned process."""
+    import multiprocessing as mp
+    rows = []
+    for backend in backends:
+        with mp.get_context("spawn").Pool(1) as pool:
+            try:
+                rows.append(pool.apply(_probe_engine, (backend, crops, repeats)))
+            except (FileNotFoundError, ImportError) as e:
+                print(f"[WARNING] Skipping {backend} engine: {str(e)}")
+    return rows
+
+
+def onnx_embeddings(images, detector_backend="opencv"):
+    """(onnx, deepface) embeddings of the same images from the ONNX engine and DeepFace.represent.
+
+    Both sides detect and align with the same DeepFace backend, so any
+    difference comes from the model export.
+    """
+    from deepface import DeepFace
+    from deepface_scripts.embedding_engine import MODEL_NAME, OnnxArcFaceEngine
+    engine = OnnxArcFaceEngine(detector_backend=detector_backend)
+    expected = np.array([DeepFace.represent(img, model_name=MODEL_NAME, detector_backend=detector_backend,
+                                            enforce_detection=False)[0]["embedding"] for img in images], dtype=np.float32)
+    return engine.represent(images), expected
+
+
+def cosine_similarities(actual, expected):
+    """Per-image cosine similarity of two embedding arrays."""
+    from deepface_scripts.gallery import l2_normalize
+    return np.sum(l2_normalize(actual) * l2_normalize(expected), axis=1)
+
+
+def onnx_parity(images, detector_backend="opencv"):
+    """Cosine distance between DeepFace.represent and the ONNX engine on the same images."""
+    actual, expected = onnx_embeddings(images, detector_backend)
+    dist = 1.0 - cosine_similarities(actual, expected)
+    return {"images": len(images), "mean_cos_dist": float(dist.mean()), "max_cos_dist": float(dist.max()),
+            "max_abs_diff": float(np.abs(actual - expected).max())}
+
+
+def print_table(rows):
+    if not rows:
+        print("[INFO] No results")
+        return
+    keys = list(rows[0].keys())
+    print(" | ".join(f"{k:>14}" for k in keys))
+    for row in rows:
+        print(" | ".join(f"{v:>14.3f}" if isinstance(v, float) else f"{str(v):>14}" for v in row.values()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Face pipeline benchmarks")
+    parser.add_argument("--dataset", default=TEST_DATASET_DIR, help="Folder of test images")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    batch = sub.add_parser("batch", help="ArcFace throughput per batch size")
+    batch.add_argument("--faces", type=int, default=32)
+    batch.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 4, 8, 16])
+
+    ann = sub.add_parser("ann", help="IVF recall vs latency against exact search")
+    ann.add_argument("--embeddings", help="Use this embedding pickle instead of a synthetic gallery")
+    ann.add_argument("--users", type=int, default=1000)
+    ann.add_argument("--samples", type=int, default=200)
+    ann.add_argument("--queries", type=int, default=200)
+    ann.add_argument("--spread", type=float, default=0.8, help="Within-user noise of the synthetic gallery")
+    ann.add_argument("--k", type=int, default=10)
+    ann.add_argument("--nlist", type=int, default=None)
+    ann.add_argument("--nprobes", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+
+    precision = sub.add_parser("precision", help="float16/int8 gallery memory, speed and decision changes")
+    precision.add_argument("--embeddings", default=None, help="Embeddings path (default: the enrolled gallery)")
+    precision.add_argument("--faces", type=int, default=200, help="Max test_dataset images to embed as extra queries")
+
+    shards = sub.add_parser("shards", help="Sharded process-pool gallery scan vs single process")
+    shards.add_argument("--sizes", type=int, nargs="+", default=[2000, 20000, 100000], help="Gallery vectors")
+    shards.add_argument("--samples", type=int, default=20, help="Samples per synthetic user")
+    shards.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4])
+    shards.add_argument("--cores", type=int, nargs="+", default=None, help="Pin shard workers to these cores")
+    shards.add_argument("--queries", type=int, default=20)
+
+    workers = sub.add_parser("workers", help="Enrollment embedding time vs ArcFace worker processes")
+    workers.add_argument("--faces", type=int, default=200)
+    workers.add_argument("--workers", type=int, nargs="+", default=[1, 2, 3, 4])
+
+    detector = sub.add_parser("detector", help="Face detector backends: speed and recall on test_dataset")
+    detector.add_argument("--faces", type=int, default=200)
+    detector.add_argument("--batch-size", type=int, default=8, help="Frames per detector call")
+    detector.add_argument("--yunet-sizes", type=int, nargs="+", default=[160, 240, 320])
+    detector.add_argument("--recall", type=float, default=None, help="Recall the chosen backend must reach")
+
+    preprocess = sub.add_parser("preprocess", help="ArcFace with and without DeepFace's re-detection: latency and compatibility")
+    preprocess.add_argument("--faces", type=int, default=100)
+    preprocess.add_argument("--embeddings", default=None, help="Gallery to check decisions against (default: the enrolled one)")
+
+    engines = sub.add_parser("engines", help="Keras vs ONNX (cv2.dnn) ArcFace: parity, startup, memory, latency")
+    engines.add_argument("--faces", type=int, default=50)
+    engines.add_argument("--skip-parity", action="store_true", help="Only time the engines")
+
+    args = parser.parse_args()
+
+    if args.command == "batch":
+        crops = load_test_images(args.dataset, args.faces) or synthetic_crops(args.faces)
+        print(f"[INFO] Benchmarking ArcFace on {len(crops)} crops")
+        print_table(benchmark_batch_sizes(crops, args.batch_sizes))
+    elif args.command == "ann":
+        from deepface_scripts.ann_index import benchmark_recall
+        if args.embeddings:
+            from deepface_scripts.embed_utils import load_embeddings
+            from deepface_scripts.gallery import flatten_embeddings
+            user_ids, vectors = flatten_embeddings(load_embeddings(args.embeddings))
+            rng = np.random.default_rng(1)
+            queries = vectors[rng.integers(0, len(vectors), args.queries)]
+            queries = queries + rng.standard_normal(queries.shape).astype(np.float32) * 0.01
+        else:
+            user_ids, vectors, centres = synthetic_gallery(args.users, args.samples, spread=args.spread)
+            queries = ann_queries(centres, args.queries, spread=args.spread)
+        print(f"[INFO] ANN benchmark: {len(vectors)} samples, {len(set(user_ids))} users, {len(queries)} queries")
+        print_table(benchmark_recall(user_ids, vectors, queries, args.nprobes, args.k, args.nlist))
+    elif args.command == "precision":
+        from deepface_scripts.embed_utils import EMBEDDINGS_PATH, load_gallery_arrays
+        user_ids, vectors = load_gallery_arrays(args.embeddings or EMBEDDINGS_PATH)
+        if not user_ids:
+            print("[ERROR] No enrolled embeddings to evaluate")
+            return
+        vectors = np.asarray(vectors, dtype=np.float32)
+        queries = [vectors]
+        crops = load_test_images(args.dataset, args.faces)
+        if crops:
+            from deepface_scripts.embedding_engine import get_engine
+            queries.append(get_engine().represent(crops))
+        queries = np.concatenate(queries)
+        print(f"[INFO] Precision evaluation: {len(vectors)} gallery samples, {len(set(user_ids))} users, "
+              f"{len(queries)} queries ({len(crops)} from {args.dataset})")
+        print_table(benchmark_precisions(user_ids, vectors, queries))
+    elif args.command == "shards":
+        from deepface_scripts.sharded_gallery import benchmark_shards
+        rows = []
+        for size in args.sizes:
+            user_ids, vectors, centres = synthetic_gallery(max(1, size // args.samples), args.samples)
+            queries = ann_queries(centres, args.queries)
+            print(f"[INFO] Shard benchmark: {len(vectors)} samples, {len(centres)} users")
+            rows.extend(benchmark_shards(user_ids, vectors, queries, args.shards, args.cores))
+        print_table(rows)
+    elif args.command == "workers":
+        from deepface_scripts.parallel_embedding import benchmark_workers
+        crops = load_test_images(args.dataset, args.faces) or synthetic_crops(args.faces)
+        print(f"[INFO] Benchmarking enrollment embedding of {len(crops)} crops")
+        print_table(benchmark_workers(crops, args.workers))
+    elif args.command == "preprocess":
+        from deepface_scripts.embed_utils import EMBEDDINGS_PATH, load_gallery_arrays
+        from deepface_scripts.face_detector import get_detector
+        from deepface_scripts.gallery import GalleryMatcher
+        images = load_test_images(args.dataset, args.faces)
+        if images:
+            crops = [c if c is not None and c.size else img for img, c in zip(images, get_detector().crop_batch(images))]
+        else:
+            crops = synthetic_crops(args.faces)
+        user_ids, vectors = load_gallery_arrays(args.embeddings or EMBEDDINGS_PATH)
+        matcher = GalleryMatcher(user_ids, vectors) if len(user_ids) else None
+        print(f"[INFO] Preprocessing comparison on {len(crops)} crops, gallery of {len(user_ids)} samples")
+        rows = compare_preprocessing(crops, matcher=matcher)
+        print_table(rows)
+        if any(row["compatible"] == "no" for row in rows):
+            print("[WARNING] Keep PREPROCESS_BACKEND = \"opencv\" or re-enroll before switching to \"skip\"")
+    elif args.command == "engines":
+        images = load_test_images(args.dataset, args.faces)
+        if images and not args.skip_parity:
+            print(f"[INFO] ONNX parity against DeepFace.represent on {len(images)} images")
+            print_table([onnx_parity(images)])
+        crops = images or synthetic_crops(args.faces)
+        print(f"[INFO] Benchmarking embedding engines on {len(crops)} crops")
+        print_table(benchmark_engines(crops))
+    elif args.command == "detector":
+        from deepface_scripts.face_detector import RECALL_TARGET, benchmark_detectors
+        images = load_test_images(args.dataset, args.faces)
+        if not images:
+            print(f"[ERROR] No test images in {args.dataset}")
+            return
+        configs = [("res10", {})] + [("yunet", {"size": (s, s)}) for s in args.yunet_sizes]
+        recall = args.recall if args.recall is not None else RECALL_TARGET
+        print(f"[INFO] Detector benchmark on {len(images)} images, recall target {recall:.2f}")
+        print_table(benchmark_detectors(images, configs, args.batch_size, recall))
+
+
+if __name__ == "__main__":
+    main()
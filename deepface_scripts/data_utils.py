@@ -3,10 +3,20 @@ import cv2
 import time
 import numpy as np
 from deepface_scripts.model_utils import load_res10_model, face_cropped
-from deepface_scripts.embed_utils import load_embeddings
+from deepface_scripts.embed_utils import list_embedded_users
 
 
-def generate_dataset(user_id, num_images=200, url="http://localhost:8080/stream.mjpg"):
+# "fixed" (first N crops, 0.1 s apart) or "quality" (stream-rate, scored and
+# diversity-filtered); callers that want the quality capture pass mode="quality".
+CAPTURE_MODE = "fixed"
+
+def generate_dataset(user_id, num_images=200, url="http://localhost:8080/stream.mjpg", mode=CAPTURE_MODE):
+    if mode == "quality":
+        # num_images is the legacy 200-crop count; the quality capture keeps far fewer, diverse crops
+        from deepface_scripts.enrollment_capture import capture_enrollment, TARGET_SAMPLES
+        images, _, _ = capture_enrollment(user_id, target=min(num_images, TARGET_SAMPLES))
+        return images
+
     print(f"[INFO] Capturing {num_images} images with faces for user {user_id} from MJPEG stream")
     images = []
     cap = None
@@ -78,5 +88,4 @@ def generate_dataset(user_id, num_images=200, url="http://localhost:8080/stream.
             print("[INFO] MJPEG stream released")
 
 def list_users():
-    embeddings = load_embeddings()
-    return sorted(set(e["user_id"] for e in embeddings))
\ No newline at end of file
+    return sorted(list_embedded_users())
\ No newline at end of file
@@ -1,27 +1,23 @@
-import os
-import pickle
 import cv2
 import numpy as np
-from deepface import DeepFace
+from .embedding_engine import DEFAULT_BATCH_SIZE
 from .model_utils import load_res10_model, face_cropped
+from .embedding_store import get_store
+from .parallel_embedding import EMBED_WORKERS, enrollment_engine
 from sklearn.cluster import DBSCAN
 
-def extract_embeddings_from_memory(user_id, images):
-    embeddings = []
-    for idx, img in enumerate(images, 1):
-        if not isinstance(img, np.ndarray):
-            continue
-        try:
-            emb = DeepFace.represent(
-                img_path=img,
-                model_name="ArcFace",
-                enforce_detection=False,
-                detector_backend="opencv"
-            )[0]["embedding"]
-            embeddings.append({"user_id": user_id, "embedding": emb})
-        except Exception as e:
-            print(f"[INFO] Error processing image {idx}: {str(e)}")
-    return embeddings
+EMBEDDINGS_PATH = "/home/salah/doorLockGui/deepface_scripts/face_embeddings.pkl"
+
+def extract_embeddings_from_memory(user_id, images, batch_size=DEFAULT_BATCH_SIZE, workers=EMBED_WORKERS):
+    crops = [img for img in images if isinstance(img, np.ndarray) and img.size > 0]
+    if not crops:
+        return []
+    try:
+        vectors = enrollment_engine(workers).represent(crops, batch_size=batch_size)
+    except Exception as e:
+        print(f"[ERROR] Error embedding {len(crops)} images: {str(e)}")
+        return []
+    return [{"user_id": user_id, "embedding": v.tolist()} for v in vectors]
 
 def remove_outliers(embeddings, target_user_ids=None, eps=0.4, min_samples=5):
     if not embeddings:
@@ -33,15 +29,19 @@ def remove_outliers(embeddings, target_user_ids=None, eps=0.4, min_samples=5):
     filtered = [e for e, label in zip(embeddings, clustering.labels_) if label != -1]
     return filtered
 
-def load_embeddings(file_path="/home/salah/doorLockGui/deepface_scripts/face_embeddings.pkl"):
+def load_embeddings(file_path=EMBEDDINGS_PATH):
     try:
-        if not os.path.exists(file_path):
-            return []
-        with open(file_path, "rb") as f:
-            return pickle.load(f)
-    except Exception:
+        return get_store(file_path).entries()
+    except Exception as e:
+        print(f"[ERROR] Failed to load embeddings: {str(e)}")
         return []
 
-def save_embeddings(embeddings, file_path="/home/salah/doorLockGui/deepface_scripts/face_embeddings.pkl"):
-    with open(file_path, "wb") as f:
-        pickle.dump(embeddings, f)
\ No newline at end of file
+def save_embeddings(embeddings, file_path=EMBEDDINGS_PATH):
+    get_store(file_path).replace_all(embeddings)
+
+def load_gallery_arrays(file_path=EMBEDDINGS_PATH):
+    """Return (user_ids, vectors) straight from the memory-mapped store, without building dicts."""
+    return get_store(file_path).arrays()
+
+def list_embedded_users(file_path=EMBEDDINGS_PATH):
+    return get_store(file_path).user_ids()
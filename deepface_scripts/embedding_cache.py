@@ -0,0 +1,159 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Sequence, Tuple
+import cv2
+import numpy as np
+from deepface_scripts.gallery import EMBEDDING_DIM
+
+CACHE_SIZE = 64
+HASH_TOLERANCE = 3  # Max differing dHash bits (of 64) for a near-duplicate
+THUMB_SIZE = 16
+THUMB_TOLERANCE = 6.0  # Max mean absolute grey-level difference between thumbnails
+
+
+def crop_signature(crop: np.ndarray) -> Tuple[int, np.ndarray]:
+    """Return a 64-bit difference hash and a small grey thumbnail of a face crop."""
+    gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY) if crop.ndim == 3 else crop
+    small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    dhash = int(np.packbits(bits).view(">u8")[0])
+    thumb = cv2.resize(gray, (THUMB_SIZE, THUMB_SIZE), interpolation=cv2.INTER_AREA).astype(np.float32)
+    return dhash, thumb
+
+
+def hamming(keys: np.ndarray, key: int) -> np.ndarray:
+    """Bit distance between one 64-bit hash and an array of hashes."""
+    xor = np.bitwise_xor(keys, np.uint64(key))
+    return np.unpackbits(xor.view(np.uint8)).reshape(len(keys), 64).sum(axis=1)
+
+
+class EmbeddingCache:
+    """Bounded LRU of embeddings keyed by crop similarity.
+
+    A crop whose dHash is within `tolerance` bits of a cached crop, and
+    whose thumbnail is close too, reuses the cached embedding instead of
+    another ArcFace pass.
+    """
+
+    def __init__(self, max_size: int = CACHE_SIZE, tolerance: int = HASH_TOLERANCE,
+                 thumb_tolerance: float = THUMB_TOLERANCE):
+        self.max_size = max(1, max_size)
+        self.tolerance = tolerance
+        self.thumb_tolerance = thumb_tolerance
+        self.entries = OrderedDict()  # dhash -> (thumbnail, embedding)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def similar(self, a: Tuple[int, np.ndarray], b: Tuple[int, np.ndarray]) -> bool:
+        """True when two crop signatures are close enough to share an embedding."""
+        if bin(a[0] ^ b[0]).count("1") > self.tolerance:
+            return False
+        return np.abs(a[1] - b[1]).mean() <= self.thumb_tolerance
+
+    def lookup(self, dhash: int, thumb: np.ndarray) -> Optional[np.ndarray]:
+        with self.lock:
+            if not self.entries:
+                self.misses += 1
+                return None
+            keys = np.fromiter(self.entries.keys(), dtype=np.uint64, count=len(self.entries))
+            distances = hamming(keys, dhash)
+            for idx in np.argsort(distances, kind="stable"):
+                if distances[idx] > self.tolerance:
+                    break
+                key = int(keys[idx])
+                cached_thumb, embedding = self.entries[key]
+                if np.abs(cached_thumb - thumb).mean() <= self.thumb_tolerance:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return embedding
+            self.misses += 1
+            return None
+
+    def insert(self, dhash: int, thumb: np.ndarray, embedding: np.ndarray):
+        with self.lock:
+            self.entries[dhash] = (thumb, embedding)
+            self.entries.move_to_end(dhash)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self.entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / total, 3) if total else None,
+        }
+
+
+class CachedEngine:
+    """Wraps an embedding engine so near-duplicate crops skip the model.
+
+    The cache is only meant to span one recognition attempt (the same person
+    standing still): call reset() when an attempt starts and whenever the
+    gallery or engine changes, so a later visitor whose crop happens to look
+    alike can never reuse an earlier person's embedding.
+    """
+
+    def __init__(self, engine: Any, cache: Optional[EmbeddingCache] = None):
+        self.engine = engine
+        self.cache = cache or EmbeddingCache()
+
+    def represent(self, crops: Sequence[np.ndarray], batch_size: Optional[int] = None) -> np.ndarray:
+        signatures = [crop_signature(c) for c in crops]
+        results = [self.cache.lookup(*sig) for sig in signatures]
+        # Misses that duplicate an earlier miss in the same batch share its embedding
+        missing, aliases = [], {}
+        for i, r in enumerate(results):
+            if r is not None:
+                continue
+            twin = next((j for j in missing if self.cache.similar(signatures[i], signatures[j])), None)
+            if twin is None:
+                missing.append(i)
+            else:
+                aliases[i] = twin
+        if missing:
+            fresh = self.engine.represent([crops[i] for i in missing], batch_size=batch_size)
+            for i, emb in zip(missing, fresh):
+                self.cache.insert(*signatures[i], emb)
+                results[i] = emb
+            for i, twin in aliases.items():
+                results[i] = results[twin]
+        if not results:
+            return np.zeros((0, EMBEDDING_DIM), dtype=np.float32)
+        return np.stack(results).astype(np.float32)
+
+    def reset(self):
+        """Forget every cached embedding (hit/miss counters are kept)."""
+        self.cache.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return self.cache.stats()
+
+
+_cached_engine = None
+
+
+def get_cached_engine(max_size: int = CACHE_SIZE, tolerance: int = HASH_TOLERANCE) -> CachedEngine:
+    """Return the process-wide cached wrapper around the shared ArcFace engine."""
+    global _cached_engine
+    from deepface_scripts.embedding_engine import get_engine
+    engine = get_engine()
+    if _cached_engine is None or _cached_engine.engine is not engine:
+        _cached_engine = CachedEngine(engine, EmbeddingCache(max_size, tolerance))
+    return _cached_engine
+
+
+def reset_cached_engine():
+    """Clear the shared cache, if one was created; called at the start of every attempt."""
+    if _cached_engine is not None:
+        _cached_engine.reset()
@@ -0,0 +1,174 @@
+import argparse
+import os
+import cv2
+import numpy as np
+from typing import List, Optional, Sequence
+
+MODEL_NAME = "ArcFace"
+# "keras" runs DeepFace's TensorFlow model; "onnx" runs ONNX_MODEL through
+# cv2.dnn. The onnx engine only avoids importing DeepFace/TensorFlow
+# altogether with the "skip" preprocess (see PREPROCESS_BACKEND).
+ENGINE_BACKEND = "keras"
+ONNX_MODEL = "/home/salah/doorLockGui/deepface_scripts/model/arcface.onnx"
+ONNX_OPSET = 13
+INPUT_SIZE = (112, 112)
+EMBEDDING_DIM = 512
+DEFAULT_BATCH_SIZE = 8
+# "opencv" (or any DeepFace backend) re-detects the face inside each crop, as
+# DeepFace.represent does and as every existing gallery was enrolled. "skip"
+# feeds our detector's crops straight to ArcFace with DeepFace's
+# resize/pad/scale preprocessing: faster, but only switch to it after
+# `benchmarks.py preprocess` reports the enrolled gallery as compatible, or
+# after re-enrolling everyone with it.
+PREPROCESS_BACKEND = "opencv"
+
+
+def resize_pad(img: np.ndarray, target_size=INPUT_SIZE) -> np.ndarray:
+    """Aspect-preserving resize with centred zero padding, scaled to [0, 1].
+
+    Mirrors DeepFace's extract_faces preprocessing so tensors built here feed
+    ArcFace exactly like DeepFace.represent does.
+    """
+    factor = min(target_size[0] / img.shape[0], target_size[1] / img.shape[1])
+    img = cv2.resize(img, (int(img.shape[1] * factor), int(img.shape[0] * factor)))
+    diff_0 = target_size[0] - img.shape[0]
+    diff_1 = target_size[1] - img.shape[1]
+    img = np.pad(img, ((diff_0 // 2, diff_0 - diff_0 // 2), (diff_1 // 2, diff_1 - diff_1 // 2), (0, 0)), "constant")
+    if img.shape[0:2] != target_size:
+        img = cv2.resize(img, target_size)
+    return img.astype(np.float32) / 255.0
+
+
+class ArcFaceEngine:
+    """Batched ArcFace embeddings for a list of BGR face crops.
+
+    Crops are preprocessed into one NHWC float32 tensor and pushed through
+    the Keras model `batch_size` faces at a time. With detector_backend
+    "opencv" (the default) each crop first goes through DeepFace's
+    Haar-cascade face extraction, so embeddings match DeepFace.represent
+    output exactly; with "skip" the crop is only resized, padded and scaled
+    the way DeepFace does it.
+    """
+
+    def __init__(self, batch_size: int = DEFAULT_BATCH_SIZE, detector_backend: str = PREPROCESS_BACKEND):
+        self.batch_size = max(1, int(batch_size))
+        self.detector_backend = detector_backend
+        self.model = build_keras_model()
+
+    def preprocess(self, crop: np.ndarray) -> np.ndarray:
+        """Return the (112, 112, 3) model input for one crop."""
+        if self.detector_backend != "skip":
+            from deepface.commons import functions
+            faces = functions.extract_faces(
+                img=crop,
+                target_size=INPUT_SIZE,
+                detector_backend=self.detector_backend,
+                enforce_detection=False,
+                align=True
+            )
+            if faces:
+                return faces[0][0][0]
+        return resize_pad(crop)
+
+    def preprocess_batch(self, crops: Sequence[np.ndarray]) -> np.ndarray:
+        """Stack the crops into one (N, 112, 112, 3) tensor."""
+        if not len(crops):
+            return np.zeros((0,) + INPUT_SIZE + (3,), dtype=np.float32)
+        return np.stack([self.preprocess(c) for c in crops]).astype(np.float32)
+
+    def embed_tensor(self, tensor: np.ndarray, batch_size: Optional[int] = None) -> np.ndarray:
+        """Run ArcFace over a preprocessed tensor in chunks of batch_size."""
+        batch_size = batch_size or self.batch_size
+        out = np.zeros((len(tensor), EMBEDDING_DIM), dtype=np.float32)
+        for i in range(0, len(tensor), batch_size):
+            out[i:i + batch_size] = self.model(tensor[i:i + batch_size], training=False).numpy()
+        return out
+
+    def represent(self, crops: Sequence[np.ndarray], batch_size: Optional[int] = None) -> np.ndarray:
+        """Return an (N, 512) float32 array of embeddings, one row per crop."""
+        return self.embed_tensor(self.preprocess_batch(crops), batch_size)
+
+
+class OnnxArcFaceEngine(ArcFaceEngine):
+    """ArcFaceEngine running the exported ONNX graph through cv2.dnn instead of TensorFlow.
+
+    Preprocessing is inherited unchanged. The graph is exported with an NCHW
+    input (see convert_to_onnx), so tensors are transposed before the forward pass.
+    """
+
+    def __init__(self, batch_size: int = DEFAULT_BATCH_SIZE, detector_backend: str = PREPROCESS_BACKEND,
+                 model_path: str = ONNX_MODEL):
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"ONNX ArcFace model not found: {model_path} "
+                                    f"(run: python -m deepface_scripts.embedding_engine convert)")
+        self.batch_size = max(1, int(batch_size))
+        self.detector_backend = detector_backend
+        self.model_path = model_path
+        self.net = cv2.dnn.readNetFromONNX(model_path)
+
+    def embed_tensor(self, tensor: np.ndarray, batch_size: Optional[int] = None) -> np.ndarray:
+        batch_size = batch_size or self.batch_size
+        out = np.zeros((len(tensor), EMBEDDING_DIM), dtype=np.float32)
+        for i in range(0, len(tensor), batch_size):
+            self.net.setInput(np.ascontiguousarray(tensor[i:i + batch_size].transpose(0, 3, 1, 2)))
+            out[i:i + batch_size] = self.net.forward().reshape(-1, EMBEDDING_DIM)
+        return out
+
+
+ENGINES = {"keras": ArcFaceEngine, "onnx": OnnxArcFaceEngine}
+
+
+def build_keras_model():
+    """DeepFace's ArcFace Keras model (imports DeepFace and TensorFlow)."""
+    from deepface import DeepFace
+    return DeepFace.build_model(MODEL_NAME).model
+
+
+def convert_to_onnx(output_path: str = ONNX_MODEL, opset: int = ONNX_OPSET) -> str:
+    """Export DeepFace's ArcFace to ONNX with tf2onnx, taking NCHW input as cv2.dnn expects."""
+    import tensorflow as tf
+    import tf2onnx
+    model = build_keras_model()
+    spec = (tf.TensorSpec((None,) + INPUT_SIZE + (3,), tf.float32, name="input"),)
+    tf2onnx.convert.from_keras(model, input_signature=spec, opset=opset, inputs_as_nchw=["input"],
+                               output_path=output_path)
+    return output_path
+
+
+_engine = None
+
+
+def get_engine(batch_size: int = DEFAULT_BATCH_SIZE, backend: str = ENGINE_BACKEND) -> ArcFaceEngine:
+    """Return the process-wide engine, building ArcFace on first use."""
+    global _engine
+    if _engine is None:
+        if backend not in ENGINES:
+            raise ValueError(f"Unknown embedding engine: {backend}")
+        _engine = ENGINES[backend](batch_size=batch_size)
+    return _engine
+
+
+def represent_crops(crops: List[np.ndarray], batch_size: Optional[int] = None) -> np.ndarray:
+    """Embed crops with the shared engine."""
+    return get_engine().represent(crops, batch_size)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ArcFace engine tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+    convert = sub.add_parser("convert", help="Export DeepFace's ArcFace to ONNX for the cv2.dnn engine")
+    convert.add_argument("--output", default=ONNX_MODEL)
+    convert.add_argument("--opset", type=int, default=ONNX_OPSET)
+    args = parser.parse_args()
+
+    if args.command == "convert":
+        path = convert_to_onnx(args.output, args.opset)
+        tensor = np.random.default_rng(0).random((4,) + INPUT_SIZE + (3,), dtype=np.float32)
+        keras_out = build_keras_model()(tensor, training=False).numpy()
+        onnx_out = OnnxArcFaceEngine(model_path=path).embed_tensor(tensor)
+        print(f"[INFO] Wrote {path} ({os.path.getsize(path) / 1e6:.1f} MB); "
+              f"max |keras - onnx| on random input: {np.abs(keras_out - onnx_out).max():.2e}")
+
+
+if __name__ == "__main__":
+    main()
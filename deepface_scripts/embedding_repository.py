@@ -0,0 +1,65 @@
+import numpy as np
+from typing import Any, Dict, Optional, Sequence, Union
+from deepface_scripts.embed_utils import EMBEDDINGS_PATH
+from deepface_scripts.embedding_store import get_store, group_entries
+from deepface_scripts.gallery import EMBEDDING_DIM
+from deepface_scripts.gallery_events import publish_version
+
+Embeddings = Union[np.ndarray, Sequence[Dict[str, Any]]]
+# Edits cost only their own size: the IVF index is derived data that the
+# recognition service brings up to date (ann_index.sync_index, from
+# store.changes_since) when the published version reaches it. Without a
+# running service, `python -m deepface_scripts.ann_index sync` updates it.
+
+
+def _vectors_and_meta(user_id: str, embeddings: Embeddings, meta: Optional[Dict[str, Any]]):
+    """Accept either an (N, 512) array or entries in either pickle layout."""
+    if isinstance(embeddings, np.ndarray):
+        return embeddings.reshape(-1, EMBEDDING_DIM), dict(meta or {})
+    entries = [dict(e, user_id=user_id) for e in embeddings]
+    vectors, entry_meta = group_entries(entries).get(user_id, ([], {}))
+    entry_meta.update(meta or {})
+    return np.asarray(vectors, dtype=np.float32).reshape(-1, EMBEDDING_DIM), entry_meta
+
+
+def add_user_embeddings(user_id: str, embeddings: Embeddings, meta: Optional[Dict[str, Any]] = None,
+                        path: str = EMBEDDINGS_PATH) -> int:
+    """Append embeddings for a user; returns the new gallery version."""
+    vectors, meta = _vectors_and_meta(user_id, embeddings, meta)
+    version = get_store(path).append(user_id, vectors, meta)
+    publish_version(version)
+    return version
+
+
+def replace_user(user_id: str, embeddings: Embeddings, meta: Optional[Dict[str, Any]] = None,
+                 path: str = EMBEDDINGS_PATH) -> int:
+    """Atomically swap all of a user's embeddings for new ones; returns the new gallery version."""
+    vectors, meta = _vectors_and_meta(user_id, embeddings, meta)
+    version = get_store(path).replace(user_id, vectors, meta)
+    publish_version(version)
+    return version
+
+
+def remove_user(user_id: str, path: str = EMBEDDINGS_PATH) -> bool:
+    """Remove every embedding of a user; False if they had none."""
+    store = get_store(path)
+    removed = store.remove(user_id)
+    if removed:
+        publish_version(store.version)
+    return removed
+
+
+def replace_gallery(entries: Sequence[Dict[str, Any]], path: str = EMBEDDINGS_PATH) -> int:
+    """Swap the whole gallery for `entries` (either pickle layout); returns the new gallery version."""
+    version = get_store(path).replace_all(entries)
+    publish_version(version)
+    return version
+
+
+def clear_gallery(path: str = EMBEDDINGS_PATH) -> int:
+    """Drop every user (system reset); returns the new gallery version."""
+    return replace_gallery([], path)
+
+
+def gallery_version(path: str = EMBEDDINGS_PATH) -> int:
+    return get_store(path).version
@@ -0,0 +1,404 @@
+import fcntl
+import json
+import os
+import pickle
+import threading
+import numpy as np
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from deepface_scripts.gallery import EMBEDDING_DIM
+
+STORE_SUFFIX = ".store"
+MANIFEST_FILE = "manifest.json"
+WAL_FILE = "wal.log"
+LOCK_FILE = "lock"
+MAX_SEGMENTS = 8  # Compact once appends have produced more segments than this
+MAX_WAL_RECORDS = 64  # ...or once the log has this many records to replay
+MAX_DEAD_FRACTION = 0.3  # ...or once this share of stored rows belongs to removed users
+
+
+def store_path(embeddings_path: str) -> str:
+    """Store directory kept next to the legacy pickle (face_embeddings.pkl -> face_embeddings.store/)."""
+    return os.path.splitext(embeddings_path)[0] + STORE_SUFFIX
+
+
+def read_pickle_entries(path: str) -> List[Dict[str, Any]]:
+    """Read a legacy embedding pickle (flat or nested layout)."""
+    with open(path, "rb") as f:
+        entries = pickle.load(f)
+    if not isinstance(entries, list):
+        raise ValueError(f"Invalid embeddings format: expected list, got {type(entries)}")
+    return entries
+
+
+def group_entries(entries: Sequence[Dict[str, Any]]) -> Dict[str, Tuple[List[Any], Dict[str, Any]]]:
+    """Map user_id -> (sample vectors, extra entry keys) across flat and nested entries."""
+    users = {}
+    for entry in entries:
+        if not isinstance(entry, dict) or "user_id" not in entry:
+            raise ValueError(f"Invalid embedding entry: {type(entry)}")
+        vectors, meta = users.setdefault(str(entry["user_id"]), ([], {}))
+        if "embeddings" in entry:
+            vectors.extend(s["embedding"] for s in entry["embeddings"])
+            meta.update({k: v for k, v in entry.items() if k not in ("user_id", "embeddings")})
+        else:
+            vectors.append(entry["embedding"])
+    return users
+
+
+class EmbeddingStore:
+    """Columnar on-disk gallery: immutable float32 .npy segments, a checkpoint and a write-ahead log.
+
+    manifest.json is a checkpoint mapping each user to (segment, offset,
+    count) row ranges plus any extra per-user keys (centroid, prototype
+    flags). Every later mutation writes its own segment (if it carries
+    vectors) and appends one JSON record to wal.log: "add", "replace" or a
+    "remove" tombstone. The current state is the checkpoint with the log
+    replayed on top, so a mutation costs only its own size. Compaction
+    folds the log into a new checkpoint and rewrites the live rows into a
+    single segment.
+
+    Readers memory-map the segments, so every process shares the same
+    page-cache copy. Writers serialise on an flock()ed lock file, so
+    concurrent edits from the GUI backend and enrollment scripts cannot
+    lose each other's updates.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self.lock = threading.RLock()
+        self._segments = {}
+        self._state = None
+        self._state_key = None
+        self._compactor = None
+        self._writing = False
+
+    @property
+    def manifest_path(self) -> str:
+        return os.path.join(self.root, MANIFEST_FILE)
+
+    @property
+    def wal_path(self) -> str:
+        return os.path.join(self.root, WAL_FILE)
+
+    def exists(self) -> bool:
+        return os.path.exists(self.manifest_path)
+
+    @contextmanager
+    def _writer(self):
+        """Thread lock plus an exclusive flock shared with other processes; reentrant within a thread."""
+        with self.lock:
+            if self._writing:
+                # A second flock on a new descriptor would wait on our own lock
+                yield
+                return
+            os.makedirs(self.root, exist_ok=True)
+            with open(os.path.join(self.root, LOCK_FILE), "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                self._writing = True
+                try:
+                    self._state = None  # Another process may have written since our last read
+                    yield
+                finally:
+                    self._writing = False
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def exclusive(self):
+        """Hold the writer lock, e.g. while bringing a file derived from the store up to date."""
+        return self._writer()
+
+    def state(self) -> Dict[str, Any]:
+        """Checkpoint plus replayed log, re-read only when either file has changed."""
+        key = tuple(os.stat(p).st_mtime_ns if os.path.exists(p) else None for p in (self.manifest_path, self.wal_path))
+        key += (os.path.getsize(self.wal_path) if os.path.exists(self.wal_path) else 0,)
+        if self._state is not None and key == self._state_key:
+            return self._state
+        if self.exists():
+            with open(self.manifest_path) as f:
+                state = json.load(f)
+        else:
+            state = {"seq": 0, "segments": {}, "users": {}}
+        state["checkpoint_seq"] = state["seq"]
+        state["wal_records"] = 0
+        state["touched"] = []  # (seq, user_id) of every logged mutation since the checkpoint
+        for record in self._read_wal():
+            if record["seq"] > state["seq"]:
+                self._apply(state, record)
+                state["touched"].append((record["seq"], record["user_id"]))
+        self._state, self._state_key = state, key
+        return state
+
+    def _read_wal(self) -> List[Dict[str, Any]]:
+        if not os.path.exists(self.wal_path):
+            return []
+        records = []
+        with open(self.wal_path) as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    break  # Torn tail from a crash mid-append; everything after it is ignored
+        return records
+
+    @staticmethod
+    def _apply(state: Dict[str, Any], record: Dict[str, Any]):
+        user_id = record["user_id"]
+        if record["op"] == "remove":
+            state["users"].pop(user_id, None)
+        else:
+            if record["op"] == "replace" or user_id not in state["users"]:
+                state["users"][user_id] = {"rows": [], "meta": {}}
+            user = state["users"][user_id]
+            if record.get("rows"):
+                seg, off, count = record["rows"]
+                state["segments"][seg] = off + count
+                user["rows"].append(record["rows"])
+            user["meta"].update(record.get("meta") or {})
+        state["seq"] = record["seq"]
+        state["wal_records"] += 1
+
+    def _append_wal(self, record: Dict[str, Any]):
+        """Durably append one record, first cutting off any torn line left by a crash."""
+        if os.path.exists(self.wal_path):
+            with open(self.wal_path, "rb+") as f:
+                data = f.read()
+                if data and not data.endswith(b"\n"):
+                    f.truncate(data.rfind(b"\n") + 1)
+        with open(self.wal_path, "a") as f:
+            f.write(json.dumps(record) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self._state = None
+
+    def _write_manifest(self, state: Dict[str, Any]):
+        """Write a new checkpoint and empty the log it supersedes."""
+        checkpoint = {k: state[k] for k in ("seq", "segments", "users")}
+        for path, content in ((self.manifest_path, json.dumps(checkpoint)), (self.wal_path, "")):
+            tmp = path + ".tmp"
+            with open(tmp, "w") as f:
+                f.write(content)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, path)
+        self._state = None
+
+    def _segment(self, name: str) -> np.ndarray:
+        if name not in self._segments:
+            self._segments[name] = np.load(os.path.join(self.root, name), mmap_mode="r")
+        return self._segments[name]
+
+    def _write_segment(self, name: str, vectors: np.ndarray) -> List[Any]:
+        tmp = os.path.join(self.root, name + ".tmp")
+        with open(tmp, "wb") as f:
+            np.save(f, np.ascontiguousarray(vectors, dtype=np.float32).reshape(-1, EMBEDDING_DIM))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, os.path.join(self.root, name))
+        self._segments.pop(name, None)
+        return [name, 0, len(vectors)]
+
+    def _remove_unused_segments(self, state: Dict[str, Any]):
+        used = set(state["segments"])
+        for name in os.listdir(self.root):
+            if name.startswith("seg-") and name.endswith(".npy") and name not in used:
+                self._segments.pop(name, None)
+                os.remove(os.path.join(self.root, name))
+
+    def _read(self, func):
+        """Run a read, retrying once if a concurrent compaction removed a segment under it."""
+        try:
+            return func()
+        except FileNotFoundError:
+            self._state = None
+            self._segments.clear()
+            return func()
+
+    @property
+    def version(self) -> int:
+        """Sequence number of the last applied mutation; changes whenever the gallery does."""
+        return self.state()["seq"]
+
+    def changes_since(self, version: int) -> Optional[Dict[str, Optional[np.ndarray]]]:
+        """Users changed after `version`, mapped to their current vectors (None if removed).
+
+        Returns None when the log no longer reaches back that far (a
+        compaction or full rewrite happened since), so the caller must reload
+        everything instead of applying a delta.
+        """
+        def read():
+            state = self.state()
+            if version == state["seq"]:
+                return {}
+            if version < state["checkpoint_seq"] or version > state["seq"]:
+                return None
+            touched = {user_id for seq, user_id in state["touched"] if seq > version}
+            return {uid: self.user_vectors(uid) if uid in state["users"] else None for uid in touched}
+        return self._read(read)
+
+    def user_ids(self) -> List[str]:
+        """Enrolled users, read from the manifest and log without touching any vectors."""
+        return list(self.state()["users"])
+
+    def __len__(self) -> int:
+        return sum(c for user in self.state()["users"].values() for _, _, c in user["rows"])
+
+    def user_vectors(self, user_id: str) -> np.ndarray:
+        def read():
+            user = self.state()["users"].get(user_id)
+            if not user or not user["rows"]:
+                return np.zeros((0, EMBEDDING_DIM), dtype=np.float32)
+            parts = [self._segment(seg)[off:off + count] for seg, off, count in user["rows"]]
+            return parts[0] if len(parts) == 1 else np.concatenate(parts)
+        return self._read(read)
+
+    def user_meta(self, user_id: str) -> Dict[str, Any]:
+        user = self.state()["users"].get(user_id)
+        return dict(user["meta"]) if user else {}
+
+    def arrays(self) -> Tuple[List[str], np.ndarray]:
+        """All live rows as (user_ids, vectors).
+
+        When the store is a single compacted segment the vectors are the
+        read-only memory map itself (zero-copy); otherwise live ranges are
+        gathered into one array.
+        """
+        def read():
+            state = self.state()
+            ranges = [(uid, seg, off, count) for uid, user in state["users"].items()
+                      for seg, off, count in user["rows"]]
+            if not ranges:
+                return [], np.zeros((0, EMBEDDING_DIM), dtype=np.float32)
+            user_ids = [uid for uid, _, _, count in ranges for _ in range(count)]
+            segment = ranges[0][1]
+            offsets = np.cumsum([0] + [count for _, _, _, count in ranges])
+            contiguous = all(seg == segment and off == offsets[i] for i, (_, seg, off, _) in enumerate(ranges))
+            if contiguous and len(state["segments"]) == 1 and offsets[-1] == state["segments"][segment]:
+                return user_ids, self._segment(segment)
+            return user_ids, np.concatenate([self._segment(seg)[off:off + count] for _, seg, off, count in ranges])
+        with self.lock:
+            return self._read(read)
+
+    def entries(self, as_lists: bool = True) -> List[Dict[str, Any]]:
+        """The gallery in the nested pickle layout, one entry per user."""
+        out = []
+        for user_id in self.user_ids():
+            samples = [{"user_id": user_id, "embedding": v.tolist() if as_lists else v}
+                       for v in self.user_vectors(user_id)]
+            out.append({"user_id": user_id, "embeddings": samples, **self.user_meta(user_id)})
+        return out
+
+    def _mutate(self, op: str, user_id: str, vectors: Optional[np.ndarray] = None,
+                meta: Optional[Dict[str, Any]] = None) -> int:
+        """Write the mutation's own segment, then log it; returns the new version."""
+        with self._writer():
+            seq = self.state()["seq"] + 1
+            record = {"seq": seq, "op": op, "user_id": str(user_id)}
+            if vectors is not None:
+                vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, EMBEDDING_DIM)
+                if len(vectors):
+                    record["rows"] = self._write_segment(f"seg-{seq:08d}.npy", vectors)
+            if meta:
+                record["meta"] = meta
+            self._append_wal(record)
+        self.maybe_compact()
+        return seq
+
+    def append(self, user_id: str, vectors: np.ndarray, meta: Optional[Dict[str, Any]] = None) -> int:
+        """Add vectors to a user (existing rows of that user are kept)."""
+        return self._mutate("add", user_id, vectors, meta)
+
+    def replace(self, user_id: str, vectors: np.ndarray, meta: Optional[Dict[str, Any]] = None) -> int:
+        """Swap all of a user's rows for new ones in a single logged step."""
+        return self._mutate("replace", user_id, vectors, meta)
+
+    def remove(self, user_id: str) -> bool:
+        """Log a tombstone for a user; their rows are reclaimed by the next compaction."""
+        if str(user_id) not in self.state()["users"]:
+            return False
+        self._mutate("remove", user_id)
+        return True
+
+    def replace_all(self, entries: Sequence[Dict[str, Any]]) -> int:
+        """Write a whole gallery (either pickle layout) as a fresh checkpoint with one segment."""
+        with self._writer():
+            seq = self.state()["seq"] + 1
+            self._checkpoint(group_entries(entries), seq)
+            return seq
+
+    def _checkpoint(self, users: Dict[str, Tuple[Sequence[Any], Dict[str, Any]]], seq: int):
+        state = {"seq": seq, "segments": {}, "users": {}}
+        blocks, offset = [], 0
+        for user_id, (vectors, meta) in users.items():
+            vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, EMBEDDING_DIM)
+            state["users"][user_id] = {"rows": [], "meta": dict(meta)}
+            if len(vectors):
+                blocks.append(vectors)
+                state["users"][user_id]["rows"].append([None, offset, len(vectors)])
+                offset += len(vectors)
+        if offset:
+            name = f"seg-{seq:08d}-base.npy"
+            self._write_segment(name, np.concatenate(blocks))
+            state["segments"][name] = offset
+            for user in state["users"].values():
+                for row in user["rows"]:
+                    row[0] = name
+        self._write_manifest(state)
+        self._remove_unused_segments(state)
+
+    def dead_fraction(self) -> float:
+        stored = sum(self.state()["segments"].values())
+        return 1.0 - len(self) / stored if stored else 0.0
+
+    def needs_compaction(self) -> bool:
+        state = self.state()
+        return (len(state["segments"]) > MAX_SEGMENTS or state["wal_records"] > MAX_WAL_RECORDS
+                or self.dead_fraction() > MAX_DEAD_FRACTION)
+
+    def compact(self):
+        """Fold the log into a new checkpoint and rewrite the live rows into a single segment.
+
+        The version is unchanged: compaction never changes the gallery contents.
+        """
+        with self._writer():
+            users = {uid: (self.user_vectors(uid), self.user_meta(uid)) for uid in self.user_ids()}
+            self._checkpoint(users, self.state()["seq"])
+
+    def maybe_compact(self, background: bool = True):
+        """Compact when needed, on a background thread unless told otherwise."""
+        if not self.needs_compaction():
+            return
+        if not background:
+            self.compact()
+            return
+        if self._compactor is not None and self._compactor.is_alive():
+            return
+        self._compactor = threading.Thread(target=self._compact_safely, daemon=True)
+        self._compactor.start()
+
+    def _compact_safely(self):
+        try:
+            self.compact()
+        except Exception as e:
+            print(f"[ERROR] Embedding store compaction failed: {str(e)}")
+
+    def migrate_from_pickle(self, pickle_path: str) -> int:
+        """Import a legacy flat or nested face_embeddings.pkl; returns the number of users."""
+        self.replace_all(read_pickle_entries(pickle_path))
+        return len(self.user_ids())
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(embeddings_path: str) -> EmbeddingStore:
+    """Process-wide store for an embeddings path, migrating the legacy pickle on first use."""
+    root = store_path(embeddings_path)
+    with _stores_lock:
+        if root not in _stores:
+            store = EmbeddingStore(root)
+            if not store.exists() and os.path.exists(embeddings_path):
+                users = store.migrate_from_pickle(embeddings_path)
+                print(f"[INFO] Migrated {embeddings_path} to {root} ({users} users)")
+            _stores[root] = store
+        return _stores[root]
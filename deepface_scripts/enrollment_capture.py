@@ -0,0 +1,298 @@
+import time
+import cv2
+import numpy as np
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from deepface_scripts.face_detector import as_detector
+from deepface_scripts.model_utils import enrollment_detector
+from deepface_scripts.frame_source import FRAME_SOURCE, get_frame_source
+from deepface_scripts.embedding_cache import crop_signature, hamming
+from deepface_scripts.gallery import EMBEDDING_DIM, l2_normalize
+
+TARGET_SAMPLES = 40  # Diverse samples kept per enrollment (prototypes are built from these)
+POOL_FACTOR = 2  # Candidates collected per kept sample before the diversity pass
+CAPTURE_TIMEOUT = 20.0  # Seconds before enrolling with whatever candidates were found
+QUALITY_SIZE = 112  # Crops are scored at this size so metrics do not depend on distance
+MIN_SHARPNESS = 60.0  # Laplacian variance of the scored crop; lower is motion blur / defocus
+MIN_BRIGHTNESS = 50.0
+MAX_BRIGHTNESS = 210.0
+MIN_FACE_FRACTION = 0.04  # Face box area relative to the frame
+DUPLICATE_BITS = 4  # dHash bits within which a candidate counts as a repeat of an accepted one
+DUPLICATE_THUMB = 6.0
+DUPLICATE_WINDOW = 64  # Signatures of the most recent accepted crops compared against
+MIN_DIVERSITY = 0.02  # Cosine distance below which further samples add nothing new
+CROP_SIZE = (200, 200)
+# Streaming enrollment: embed a few crops at a time and stop once the
+# running centroid and spread stop moving.
+EMBED_BATCH = 4
+MIN_SAMPLES = 15  # Inliers required before convergence is considered
+PATIENCE = 3  # Consecutive settled batches needed to stop
+CENTROID_TOLERANCE = 0.002  # Cosine movement of the centroid per batch
+SPREAD_TOLERANCE = 0.005  # Change of the mean distance to the centroid per batch
+WARMUP_SAMPLES = 5  # Accepted unconditionally before outlier rejection starts
+OUTLIER_SIGMA = 3.0
+MAX_INLIER_DISTANCE = 0.4  # Same cosine radius remove_outliers' DBSCAN uses
+
+
+def quality_metrics(grays: np.ndarray) -> Dict[str, np.ndarray]:
+    """Sharpness (Laplacian variance) and exposure for a stack of (N, S, S) grey crops."""
+    g = grays.astype(np.float32)
+    lap = 4 * g[:, 1:-1, 1:-1] - g[:, :-2, 1:-1] - g[:, 2:, 1:-1] - g[:, 1:-1, :-2] - g[:, 1:-1, 2:]
+    return {
+        "sharpness": lap.reshape(len(g), -1).var(axis=1),
+        "brightness": g.reshape(len(g), -1).mean(axis=1),
+        "contrast": g.reshape(len(g), -1).std(axis=1),
+    }
+
+
+def quality_scores(metrics: Dict[str, np.ndarray], face_fraction: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Return (acceptable mask, score in [0, 1]) from quality_metrics and box sizes."""
+    sharp, bright = metrics["sharpness"], metrics["brightness"]
+    ok = ((sharp >= MIN_SHARPNESS) & (bright >= MIN_BRIGHTNESS) & (bright <= MAX_BRIGHTNESS)
+          & (face_fraction >= MIN_FACE_FRACTION))
+    score = (np.minimum(sharp / (4 * MIN_SHARPNESS), 1.0)
+             * (1.0 - np.abs(bright - 128.0) / 128.0)
+             * np.minimum(face_fraction / (4 * MIN_FACE_FRACTION), 1.0))
+    return ok, score.astype(np.float32)
+
+
+def largest_face(frame: np.ndarray, detector: Any) -> Optional[Tuple[int, int, int, int]]:
+    return as_detector(detector).largest_box(frame)
+
+
+def select_diverse(embeddings: np.ndarray, scores: np.ndarray, count: int,
+                   min_distance: float = MIN_DIVERSITY) -> List[int]:
+    """Greedy farthest-point selection, weighted by quality, starting from the best sample.
+
+    Each step takes the candidate whose cosine distance to everything
+    already kept is largest (scaled by its quality), so near-identical
+    poses are skipped in favour of new angles and expressions.
+    """
+    if not len(embeddings):
+        return []
+    unit = l2_normalize(embeddings)
+    chosen = [int(np.argmax(scores))]
+    nearest = 1.0 - unit @ unit[chosen[0]]
+    weight = 0.5 + 0.5 * scores
+    while len(chosen) < min(count, len(unit)):
+        gain = np.where(nearest > min_distance, nearest * weight, -1.0)
+        gain[chosen] = -1.0
+        pick = int(np.argmax(gain))
+        if gain[pick] < 0:
+            break
+        chosen.append(pick)
+        nearest = np.minimum(nearest, 1.0 - unit @ unit[pick])
+    return chosen
+
+
+def face_candidates(detector: Any, source: str = FRAME_SOURCE, timeout: float = CAPTURE_TIMEOUT,
+                    stats: Optional[Dict[str, Any]] = None) -> Iterator[Tuple[np.ndarray, float]]:
+    """Yield (200x200 crop, quality score) for every usable, non-repeated face until the timeout.
+
+    Frames are read from the shared frame source without sleeps. Each face
+    crop is scored for blur, exposure and size; rejects and near-duplicates
+    of recently yielded crops are dropped. Only the signatures of the last
+    DUPLICATE_WINDOW yielded crops are remembered, not the crops themselves.
+    """
+    stats = stats if stats is not None else {}
+    for key in ("frames", "no_face", "low_quality", "duplicates"):
+        stats.setdefault(key, 0)
+    frames = get_frame_source(source)
+    hashes, thumbs = [], []
+    deadline = time.time() + timeout
+    last_seq = 0
+    while time.time() < deadline:
+        frame = frames.read(after_seq=last_seq)
+        if frame is None:
+            continue
+        last_seq = frame.seq
+        stats["frames"] += 1
+        box = largest_face(frame.image, detector)
+        if box is None:
+            stats["no_face"] += 1
+            continue
+        x, y, w, h = box
+        crop = frame.image[y:y + h, x:x + w]
+        gray = cv2.cvtColor(cv2.resize(crop, (QUALITY_SIZE, QUALITY_SIZE)), cv2.COLOR_BGR2GRAY)
+        fraction = np.array([w * h / float(frame.image.shape[0] * frame.image.shape[1])])
+        ok, score = quality_scores(quality_metrics(gray[None]), fraction)
+        if not ok[0]:
+            stats["low_quality"] += 1
+            continue
+        dhash, thumb = crop_signature(gray)
+        if hashes:
+            close = np.flatnonzero(hamming(np.asarray(hashes, dtype=np.uint64), dhash) <= DUPLICATE_BITS)
+            if any(np.abs(thumbs[i] - thumb).mean() <= DUPLICATE_THUMB for i in close):
+                stats["duplicates"] += 1
+                continue
+        hashes.append(dhash)
+        thumbs.append(thumb)
+        if len(hashes) > DUPLICATE_WINDOW:
+            del hashes[0], thumbs[0]
+        yield cv2.resize(crop, CROP_SIZE), float(score[0])
+
+
+def capture_enrollment(user_id: str, target: int = TARGET_SAMPLES, timeout: float = CAPTURE_TIMEOUT,
+                       detector: Any = None, source: str = FRAME_SOURCE,
+                       engine: Any = None) -> Tuple[List[np.ndarray], np.ndarray, Dict[str, Any]]:
+    """Capture sharp, well-exposed, diverse face crops for enrollment at stream rate.
+
+    Collects POOL_FACTOR * target candidates from face_candidates (or as
+    many as arrive before the timeout), embeds them in one batch and keeps
+    the `target` most diverse ones.
+
+    Returns:
+        (crops, embeddings, stats): the kept 200x200 crops, their ArcFace
+        embeddings (so callers need not embed them again) and capture stats.
+    """
+    start = time.time()
+    detector = enrollment_detector(detector)
+    stats = {}
+    crops, scores = [], []
+    for crop, score in face_candidates(detector, source, timeout, stats):
+        crops.append(crop)
+        scores.append(score)
+        if len(crops) >= target * POOL_FACTOR:
+            break
+    stats["candidates"] = len(crops)
+    stats["capture_s"] = round(time.time() - start, 2)
+    if not crops:
+        print(f"[ERROR] No usable face crops for user {user_id}: {stats}")
+        return [], np.zeros((0, 0), dtype=np.float32), stats
+
+    engine = engine if engine is not None else _default_engine()
+    embeddings = np.asarray(engine.represent(crops), dtype=np.float32)
+    keep = select_diverse(embeddings, np.asarray(scores, dtype=np.float32), target)
+    stats["kept"] = len(keep)
+    stats["total_s"] = round(time.time() - start, 2)
+    print(f"[INFO] Enrollment capture for user {user_id}: {stats}")
+    return [crops[i] for i in keep], embeddings[keep], stats
+
+
+def _default_engine() -> Any:
+    from deepface_scripts.parallel_embedding import enrollment_engine
+    return enrollment_engine()
+
+
+class RunningInliers:
+    """Constant-memory inlier statistics for one user's embeddings as they arrive.
+
+    Keeps the running sum of accepted unit vectors (the centroid), a
+    Welford mean/variance of their distances to it, and a bounded set of
+    at most `max_samples` diverse samples: once full, a new inlier replaces
+    the most redundant kept sample if it is further from the rest. After
+    `warmup` samples, embeddings further from the centroid than
+    MAX_INLIER_DISTANCE or mean + outlier_sigma * std are rejected, which
+    stands in for the DBSCAN pass over the whole set.
+    """
+
+    def __init__(self, max_samples: int = TARGET_SAMPLES, outlier_sigma: float = OUTLIER_SIGMA,
+                 warmup: int = WARMUP_SAMPLES):
+        self.max_samples = max(1, max_samples)
+        self.outlier_sigma = outlier_sigma
+        self.warmup = warmup
+        self.sum = np.zeros(EMBEDDING_DIM, dtype=np.float64)
+        self.count = 0
+        self.rejected = 0
+        self.dist_mean = 0.0
+        self.dist_m2 = 0.0
+        self.samples = np.zeros((self.max_samples, EMBEDDING_DIM), dtype=np.float32)
+        self.kept = 0
+
+    @property
+    def centroid(self) -> np.ndarray:
+        return l2_normalize(self.sum[None].astype(np.float32))[0]
+
+    @property
+    def spread(self) -> float:
+        """Mean cosine distance of accepted samples to the centroid."""
+        return self.dist_mean
+
+    @property
+    def spread_std(self) -> float:
+        return float(np.sqrt(self.dist_m2 / (self.count - 1))) if self.count > 1 else 0.0
+
+    def add(self, vector: np.ndarray) -> bool:
+        """Fold one embedding in; False if it was rejected as an outlier."""
+        v = l2_normalize(vector[None])[0]
+        if self.count >= self.warmup:
+            d = 1.0 - float(v @ self.centroid)
+            if d > MAX_INLIER_DISTANCE or d > self.dist_mean + self.outlier_sigma * self.spread_std:
+                self.rejected += 1
+                return False
+        self.sum += v
+        self.count += 1
+        d = 1.0 - float(v @ self.centroid)
+        delta = d - self.dist_mean
+        self.dist_mean += delta / self.count
+        self.dist_m2 += delta * (d - self.dist_mean)
+        self._keep(v)
+        return True
+
+    def _keep(self, v: np.ndarray):
+        if self.kept < self.max_samples:
+            self.samples[self.kept] = v
+            self.kept += 1
+            return
+        sims = self.samples @ self.samples.T
+        np.fill_diagonal(sims, -1.0)
+        redundant = int(np.argmax(sims.max(axis=1)))
+        new_sims = self.samples @ v
+        new_sims[redundant] = -1.0
+        if new_sims.max() < sims[redundant].max():
+            self.samples[redundant] = v
+
+    def vectors(self) -> np.ndarray:
+        return self.samples[:self.kept].copy()
+
+
+def embedded_batches(candidates: Iterator[Tuple[np.ndarray, float]], engine: Any,
+                     batch_size: int = EMBED_BATCH) -> Iterator[np.ndarray]:
+    """Embed crops a few at a time as they arrive; only one batch of crops is ever held."""
+    batch = []
+    for crop, _ in candidates:
+        batch.append(crop)
+        if len(batch) >= batch_size:
+            yield np.asarray(engine.represent(batch), dtype=np.float32)
+            batch = []
+    if batch:
+        yield np.asarray(engine.represent(batch), dtype=np.float32)
+
+
+def stream_enrollment(user_id: str, timeout: float = CAPTURE_TIMEOUT, detector: Any = None,
+                      source: str = FRAME_SOURCE, engine: Any = None,
+                      max_samples: int = TARGET_SAMPLES) -> Tuple[np.ndarray, Dict[str, Any]]:
+    """Enroll from a generator pipeline: capture -> embed in small batches -> running inlier stats.
+
+    Capture stops once at least MIN_SAMPLES inliers are in and, for
+    PATIENCE consecutive batches, the centroid has moved less than
+    CENTROID_TOLERANCE (cosine) and the spread less than SPREAD_TOLERANCE,
+    or when the timeout passes. Memory stays flat: no crop outlives its
+    batch and at most `max_samples` embeddings are kept.
+
+    Returns:
+        (vectors, stats): the kept inlier embeddings and capture statistics.
+    """
+    start = time.time()
+    detector = enrollment_detector(detector)
+    engine = engine if engine is not None else _default_engine()
+    stats = {}
+    inliers = RunningInliers(max_samples)
+    stable = 0
+    candidates = face_candidates(detector, source, timeout, stats)
+    for vectors in embedded_batches(candidates, engine):
+        previous_centroid, previous_spread = inliers.centroid, inliers.spread
+        accepted = sum(inliers.add(v) for v in vectors)
+        if not accepted or inliers.count <= 1:
+            continue
+        shift = 1.0 - float(inliers.centroid @ previous_centroid)
+        settled = shift < CENTROID_TOLERANCE and abs(inliers.spread - previous_spread) < SPREAD_TOLERANCE
+        stable = stable + 1 if settled else 0
+        if inliers.count >= MIN_SAMPLES and stable >= PATIENCE:
+            stats["converged"] = True
+            break
+    candidates.close()
+    stats.update({"converged": stats.get("converged", False), "inliers": inliers.count,
+                  "outliers": inliers.rejected, "kept": inliers.kept, "spread": round(inliers.spread, 4),
+                  "total_s": round(time.time() - start, 2)})
+    print(f"[INFO] Streaming enrollment for user {user_id}: {stats}")
+    return inliers.vectors(), stats
@@ -0,0 +1,193 @@
+import os
+import time
+import threading
+import cv2
+import numpy as np
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+Box = Tuple[int, int, int, int]
+Detection = Tuple[int, int, int, int, float]  # x, y, w, h, confidence
+
+MODEL_DIR = "/home/salah/doorLockGui/deepface_scripts/model"
+DETECTOR_BACKEND = "res10"  # "res10" (Caffe SSD) or "yunet" (cv2.FaceDetectorYN)
+CONFIDENCE_THRESHOLD = 0.5
+RES10_PROTO = os.path.join(MODEL_DIR, "deploy.prototxt")
+RES10_MODEL = os.path.join(MODEL_DIR, "res10_300x300_ssd_iter_140000.caffemodel")
+RES10_SIZE = (300, 300)
+# BGR mean the Res10 SSD was trained with (model_utils used 117 for green by mistake)
+RES10_MEAN = (104.0, 177.0, 123.0)
+# From https://github.com/opencv/opencv_zoo/tree/main/models/face_detection_yunet
+YUNET_MODEL = os.path.join(MODEL_DIR, "face_detection_yunet_2023mar.onnx")
+YUNET_SIZE = (320, 320)  # Frames are resized to this before detection; smaller is faster
+YUNET_THRESHOLD = 0.6
+YUNET_NMS = 0.3
+RECALL_TARGET = 0.95
+
+
+def clip_box(x1: float, y1: float, x2: float, y2: float, width: int, height: int) -> Optional[Box]:
+    """Corner coordinates clipped to the image as (x, y, w, h); None if nothing is left."""
+    x1, y1 = max(0, int(x1)), max(0, int(y1))
+    x2, y2 = min(width - 1, int(x2)), min(height - 1, int(y2))
+    if x2 <= x1 or y2 <= y1:
+        return None
+    return x1, y1, x2 - x1, y2 - y1
+
+
+class FaceDetector:
+    """Batched face detection returning (x, y, w, h, confidence) per face, best first."""
+
+    name = "base"
+
+    def detect_batch(self, images: Sequence[np.ndarray]) -> List[List[Detection]]:
+        raise NotImplementedError
+
+    def detect(self, image: np.ndarray) -> List[Detection]:
+        return self.detect_batch([image])[0]
+
+    def best_box(self, image: np.ndarray) -> Optional[Box]:
+        """Most confident face box, or None."""
+        faces = self.detect(image)
+        return faces[0][:4] if faces else None
+
+    def largest_box(self, image: np.ndarray) -> Optional[Box]:
+        faces = self.detect(image)
+        return max(faces, key=lambda f: f[2] * f[3])[:4] if faces else None
+
+    def crop(self, image: np.ndarray) -> Optional[np.ndarray]:
+        box = self.best_box(image)
+        if box is None:
+            return None
+        x, y, w, h = box
+        return image[y:y + h, x:x + w]
+
+    def crop_batch(self, images: Sequence[np.ndarray]) -> List[Optional[np.ndarray]]:
+        """Most confident face crop of every image, from one detector call."""
+        crops = []
+        for image, faces in zip(images, self.detect_batch(images)):
+            if faces:
+                x, y, w, h = faces[0][:4]
+                crops.append(image[y:y + h, x:x + w])
+            else:
+                crops.append(None)
+        return crops
+
+    def warm_up(self):
+        self.detect_batch([np.zeros((RES10_SIZE[1], RES10_SIZE[0], 3), dtype=np.uint8)])
+
+
+class Res10Detector(FaceDetector):
+    """Res10 SSD over cv2.dnn; a list of frames goes through one blobFromImages forward pass."""
+
+    name = "res10"
+
+    def __init__(self, net: Any = None, threshold: float = CONFIDENCE_THRESHOLD,
+                 size: Tuple[int, int] = RES10_SIZE, mean: Tuple[float, float, float] = RES10_MEAN):
+        self.net = net if net is not None else cv2.dnn.readNetFromCaffe(RES10_PROTO, RES10_MODEL)
+        self.threshold = threshold
+        self.size = tuple(size)
+        self.mean = mean
+
+    def detect_batch(self, images: Sequence[np.ndarray]) -> List[List[Detection]]:
+        if not len(images):
+            return []
+        blob = cv2.dnn.blobFromImages(list(images), 1.0, self.size, self.mean, swapRB=False, crop=False)
+        self.net.setInput(blob)
+        # (1, 1, K, 7) rows of [image index, class, confidence, x1, y1, x2, y2] in relative coordinates
+        rows = self.net.forward().reshape(-1, 7)
+        rows = rows[rows[:, 2] > self.threshold]
+        out = [[] for _ in images]
+        for row in rows[np.argsort(-rows[:, 2])]:
+            i = int(row[0])
+            h, w = images[i].shape[:2]
+            box = clip_box(row[3] * w, row[4] * h, row[5] * w, row[6] * h, w, h)
+            if box is not None:
+                out[i].append(box + (float(row[2]),))
+        return out
+
+
+class YuNetDetector(FaceDetector):
+    """OpenCV's YuNet (cv2.FaceDetectorYN) at a fixed input size; boxes are scaled back to each frame."""
+
+    name = "yunet"
+
+    def __init__(self, model_path: str = YUNET_MODEL, size: Tuple[int, int] = YUNET_SIZE,
+                 threshold: float = YUNET_THRESHOLD, nms: float = YUNET_NMS):
+        if not hasattr(cv2, "FaceDetectorYN"):
+            raise RuntimeError("YuNet needs OpenCV >= 4.5.4 (cv2.FaceDetectorYN)")
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"YuNet model not found: {model_path}")
+        self.size = tuple(size)
+        self.threshold = threshold
+        self.model = cv2.FaceDetectorYN.create(model_path, "", self.size, threshold, nms, 5000)
+
+    def detect_batch(self, images: Sequence[np.ndarray]) -> List[List[Detection]]:
+        out = []
+        for image in images:
+            h, w = image.shape[:2]
+            _, faces = self.model.detect(cv2.resize(image, self.size))
+            sx, sy = w / self.size[0], h / self.size[1]
+            found = []
+            for face in (faces if faces is not None else []):
+                x, y, fw, fh = face[:4]
+                box = clip_box(x * sx, y * sy, (x + fw) * sx, (y + fh) * sy, w, h)
+                if box is not None:
+                    found.append(box + (float(face[-1]),))
+            out.append(sorted(found, key=lambda f: -f[4]))
+        return out
+
+
+BACKENDS = {"res10": Res10Detector, "yunet": YuNetDetector}
+_detectors = {}
+_detectors_lock = threading.Lock()
+
+
+def get_detector(backend: str = DETECTOR_BACKEND) -> FaceDetector:
+    """Process-wide detector for a backend, loaded on first use."""
+    with _detectors_lock:
+        if backend not in _detectors:
+            if backend not in BACKENDS:
+                raise ValueError(f"Unknown detector backend: {backend}")
+            _detectors[backend] = BACKENDS[backend]()
+        return _detectors[backend]
+
+
+def as_detector(detector: Any = None) -> FaceDetector:
+    """Accept a FaceDetector, a raw Res10 cv2.dnn net (older callers) or None (the default backend)."""
+    if detector is None:
+        return get_detector()
+    if isinstance(detector, FaceDetector):
+        return detector
+    return Res10Detector(net=detector)
+
+
+def benchmark_detectors(images: Sequence[np.ndarray], configs: Sequence[Tuple[str, Dict[str, Any]]],
+                        batch_size: int = 8, recall_target: float = RECALL_TARGET,
+                        repeats: int = 2) -> List[Dict[str, Any]]:
+    """Time each (backend, options) config on face images and report its recall.
+
+    Every test image is assumed to contain a face, so recall is the share
+    of images with at least one detection. The fastest config meeting
+    recall_target is marked as chosen.
+    """
+    rows = []
+    for backend, options in configs:
+        try:
+            detector = BACKENDS[backend](**options)
+        except (RuntimeError, FileNotFoundError, cv2.error) as e:
+            print(f"[WARNING] Skipping {backend} {options}: {str(e)}")
+            continue
+        detector.warm_up()
+        best = float("inf")
+        for _ in range(repeats):
+            found = 0
+            start = time.perf_counter()
+            for i in range(0, len(images), batch_size):
+                found += sum(1 for faces in detector.detect_batch(images[i:i + batch_size]) if faces)
+            best = min(best, time.perf_counter() - start)
+        size = options.get("size", RES10_SIZE if backend == "res10" else YUNET_SIZE)
+        rows.append({"backend": backend, "input": f"{size[0]}x{size[1]}", "ms_per_frame": 1000 * best / len(images),
+                     "recall": found / len(images), "chosen": ""})
+    eligible = [r for r in rows if r["recall"] >= recall_target]
+    if eligible:
+        min(eligible, key=lambda r: r["ms_per_frame"])["chosen"] = "*"
+    return rows
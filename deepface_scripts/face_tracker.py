@@ -0,0 +1,125 @@
+import time
+import cv2
+import numpy as np
+from typing import Any, Callable, Dict, Optional, Tuple
+
+Box = Tuple[int, int, int, int]
+
+DETECT_EVERY = 5  # Full detector run at least every N frames
+MIN_TRACK_CONFIDENCE = 0.6  # Normalised template correlation below this re-detects
+SEARCH_SCALE = 1.6  # Search window size relative to the face box
+BOX_SMOOTHING = 0.5  # Weight of the new position when smoothing tracked boxes
+
+
+class FaceTracker:
+    """Detect-then-track face cropping.
+
+    The full detector runs on the first frame, every `detect_every` frames
+    and whenever tracking confidence drops. In between, the face box is
+    propagated by matching the last detected face (as a grayscale template)
+    inside a window around its previous position, which is far cheaper than
+    a 300x300 SSD forward pass for someone standing at the door.
+    """
+
+    def __init__(self, detect_box: Callable[[np.ndarray], Optional[Box]],
+                 detect_every: int = DETECT_EVERY,
+                 min_confidence: float = MIN_TRACK_CONFIDENCE,
+                 search_scale: float = SEARCH_SCALE,
+                 smoothing: float = BOX_SMOOTHING):
+        self.detect_box = detect_box
+        self.detect_every = max(1, detect_every)
+        self.min_confidence = min_confidence
+        self.search_scale = search_scale
+        self.smoothing = smoothing
+        self.frames = 0
+        self.detector_calls = 0
+        self.tracked_frames = 0
+        self.redetections = 0
+        self.detect_s = 0.0
+        self.track_s = 0.0
+        self.reset()
+
+    def reset(self):
+        """Forget the current face (e.g. at the start of a new attempt)."""
+        self.box = None
+        self.template = None
+        self.since_detect = 0
+        self.confidence = 0.0
+
+    def _detect(self, image: np.ndarray, gray: np.ndarray) -> Optional[Box]:
+        start = time.perf_counter()
+        box = self.detect_box(image)
+        self.detect_s += time.perf_counter() - start
+        self.detector_calls += 1
+        self.since_detect = 0
+        if box is None or box[2] <= 0 or box[3] <= 0:
+            self.reset()
+            return None
+        x, y, w, h = box
+        self.box = box
+        self.template = gray[y:y + h, x:x + w].copy()
+        self.confidence = 1.0
+        return box
+
+    def _track(self, gray: np.ndarray) -> Optional[Box]:
+        start = time.perf_counter()
+        try:
+            x, y, w, h = self.box
+            img_h, img_w = gray.shape[:2]
+            cx, cy = x + w / 2, y + h / 2
+            sw, sh = w * self.search_scale, h * self.search_scale
+            x0, y0 = max(0, int(cx - sw / 2)), max(0, int(cy - sh / 2))
+            x1, y1 = min(img_w, int(cx + sw / 2)), min(img_h, int(cy + sh / 2))
+            window = gray[y0:y1, x0:x1]
+            th, tw = self.template.shape[:2]
+            if window.shape[0] < th or window.shape[1] < tw:
+                return None
+            scores = cv2.matchTemplate(window, self.template, cv2.TM_CCOEFF_NORMED)
+            _, max_val, _, max_loc = cv2.minMaxLoc(scores)
+            self.confidence = float(max_val)
+            if max_val < self.min_confidence:
+                return None
+            nx, ny = x0 + max_loc[0], y0 + max_loc[1]
+            a = self.smoothing
+            self.box = (int(round(a * nx + (1 - a) * x)), int(round(a * ny + (1 - a) * y)), w, h)
+            return self.box
+        finally:
+            self.track_s += time.perf_counter() - start
+
+    def update(self, image: np.ndarray) -> Optional[Box]:
+        """Return the face box for the next frame, detecting or tracking as needed."""
+        self.frames += 1
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+        if self.box is None or self.since_detect + 1 >= self.detect_every:
+            return self._detect(image, gray)
+        box = self._track(gray)
+        if box is None:
+            self.redetections += 1
+            return self._detect(image, gray)
+        self.since_detect += 1
+        self.tracked_frames += 1
+        return box
+
+    def crop(self, image: np.ndarray) -> Optional[np.ndarray]:
+        """Return the face crop for the next frame, or None when no face is found."""
+        if not isinstance(image, np.ndarray) or image.size == 0:
+            return None
+        box = self.update(image)
+        if box is None:
+            return None
+        x, y, w, h = box
+        face = image[y:y + h, x:x + w]
+        return face if face.size else None
+
+    def stats(self) -> Dict[str, Any]:
+        avg_detect_ms = 1000 * self.detect_s / self.detector_calls if self.detector_calls else 0.0
+        avg_track_ms = 1000 * self.track_s / max(1, self.tracked_frames + self.redetections)
+        return {
+            "frames": self.frames,
+            "detector_calls": self.detector_calls,
+            "tracked_frames": self.tracked_frames,
+            "redetections": self.redetections,
+            "avg_detect_ms": round(avg_detect_ms, 2),
+            "avg_track_ms": round(avg_track_ms, 2),
+            "saved_ms": round(self.tracked_frames * avg_detect_ms - 1000 * self.track_s, 1),
+        }
@@ -0,0 +1,281 @@
+import glob
+import os
+import struct
+import threading
+import time
+import urllib.request
+import cv2
+import numpy as np
+from multiprocessing import shared_memory
+from typing import Iterator, List, NamedTuple, Optional, Sequence, Union
+
+MJPEG_URL = "http://localhost:8080/stream.mjpg"
+SHM_NAME = "nexus_frames"
+SHM_SIZE = 1 << 20  # Room for one JPEG frame from start_mjpeg (236x236 is ~30 KB)
+# seq (odd while a write is in progress), capture timestamp, JPEG length
+SHM_HEADER = struct.Struct("<QdI")
+SHM_DATA_OFFSET = 32
+FRAME_SOURCE = "mjpeg"  # "mjpeg", "shm" or "replay"
+READ_TIMEOUT = 2.0
+MAX_FRAME_AGE = 0.5
+RECONNECT_DELAY = 1.0
+
+
+class Frame(NamedTuple):
+    image: np.ndarray
+    timestamp: float
+    seq: int
+
+
+class FrameSource:
+    """Keeps one connection to a camera feed warm and hands out the freshest frame.
+
+    Subclasses run a background loop that calls _publish() for every frame
+    that arrives. Only the newest frame is kept (as JPEG bytes or an
+    image), so readers never see stale buffered frames; JPEG frames are
+    decoded lazily, once, when first read.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._jpeg = None
+        self._image = None
+        self._timestamp = None
+        self._seq = 0
+        self._decoded_seq = 0
+        self._thread = None
+        self._running = False
+        self.frames_received = 0
+
+    def start(self) -> "FrameSource":
+        if not self._running:
+            self._running = True
+            self._thread = threading.Thread(target=self._loop, daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout=RECONNECT_DELAY + READ_TIMEOUT)
+            self._thread = None
+
+    def _loop(self):
+        while self._running:
+            try:
+                self._run()
+            except Exception as e:
+                print(f"[ERROR] {type(self).__name__} failed: {str(e)}")
+            if self._running:
+                time.sleep(RECONNECT_DELAY)
+
+    def _run(self):
+        raise NotImplementedError
+
+    def _publish(self, image: Optional[np.ndarray] = None, jpeg: Optional[bytes] = None,
+                 timestamp: Optional[float] = None):
+        with self._condition:
+            self._image = image
+            self._jpeg = jpeg
+            self._timestamp = timestamp if timestamp is not None else time.time()
+            self._seq += 1
+            self.frames_received += 1
+            self._condition.notify_all()
+
+    def read(self, after_seq: int = 0, timeout: float = READ_TIMEOUT,
+             max_age: Optional[float] = MAX_FRAME_AGE) -> Optional[Frame]:
+        """Return the newest frame with seq > after_seq, waiting up to timeout for one."""
+        self.start()
+        deadline = time.time() + timeout
+        with self._condition:
+            while True:
+                fresh = self._seq > after_seq and (max_age is None or time.time() - self._timestamp <= max_age)
+                if fresh:
+                    break
+                remaining = deadline - time.time()
+                if remaining <= 0 or not self._condition.wait(remaining):
+                    return None
+            if self._image is None or self._decoded_seq != self._seq:
+                if self._jpeg is not None:
+                    self._image = cv2.imdecode(np.frombuffer(self._jpeg, dtype=np.uint8), cv2.IMREAD_COLOR)
+                self._decoded_seq = self._seq
+            if self._image is None:
+                return None
+            return Frame(self._image, self._timestamp, self._seq)
+
+    def frames(self, count: int, timeout: float = READ_TIMEOUT) -> Iterator[Frame]:
+        """Yield up to count distinct frames at stream rate (no fixed sleeps)."""
+        last_seq = 0
+        for _ in range(count):
+            frame = self.read(after_seq=last_seq, timeout=timeout)
+            if frame is None:
+                return
+            last_seq = frame.seq
+            yield frame
+
+
+class MJPEGFrameSource(FrameSource):
+    """Reads the multipart stream served by start_mjpeg.py over one persistent HTTP connection."""
+
+    def __init__(self, url: str = MJPEG_URL):
+        super().__init__()
+        self.url = url
+
+    def _run(self):
+        with urllib.request.urlopen(self.url, timeout=READ_TIMEOUT) as stream:
+            print(f"[INFO] MJPEG frame source connected to {self.url}")
+            while self._running:
+                line = stream.readline()
+                if not line:
+                    raise ConnectionError("MJPEG stream closed")
+                if not line.startswith(b"--"):
+                    continue
+                headers = {}
+                while True:
+                    header = stream.readline().strip()
+                    if not header:
+                        break
+                    key, _, value = header.decode("latin-1").partition(":")
+                    headers[key.strip().lower()] = value.strip()
+                length = int(headers.get("content-length", 0))
+                if not length:
+                    continue
+                jpeg = stream.read(length)
+                timestamp = float(headers["x-timestamp"]) if "x-timestamp" in headers else None
+                self._publish(jpeg=jpeg, timestamp=timestamp)
+
+
+class SharedFrameWriter:
+    """Writer side of the shared-memory feed, used by start_mjpeg.py.
+
+    The header is a sequence lock: seq is odd while a frame is being copied
+    in, so readers retry instead of decoding a torn frame.
+    """
+
+    def __init__(self, name: str = SHM_NAME, size: int = SHM_SIZE):
+        try:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.seq = 0
+
+    def write(self, jpeg: bytes, timestamp: Optional[float] = None):
+        length = len(jpeg)
+        if SHM_DATA_OFFSET + length > self.shm.size:
+            return
+        timestamp = timestamp if timestamp is not None else time.time()
+        self.seq += 1
+        SHM_HEADER.pack_into(self.shm.buf, 0, self.seq, timestamp, length)
+        self.shm.buf[SHM_DATA_OFFSET:SHM_DATA_OFFSET + length] = jpeg
+        self.seq += 1
+        SHM_HEADER.pack_into(self.shm.buf, 0, self.seq, timestamp, length)
+
+    def close(self, unlink: bool = True):
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+
+
+class SharedMemoryFrameSource(FrameSource):
+    """Reads JPEG frames that start_mjpeg.py copies into a shared-memory block."""
+
+    def __init__(self, name: str = SHM_NAME, poll_interval: float = 0.002):
+        super().__init__()
+        self.name = name
+        self.poll_interval = poll_interval
+
+    def _run(self):
+        shm = shared_memory.SharedMemory(name=self.name)
+        try:
+            # The writer owns the block; stop this process's tracker from unlinking it on exit
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(shm._name, "shared_memory")
+        except Exception:
+            pass
+        last_seq = 0
+        try:
+            while self._running:
+                seq, timestamp, length = SHM_HEADER.unpack_from(shm.buf, 0)
+                if seq == last_seq or seq % 2 == 1:
+                    time.sleep(self.poll_interval)
+                    continue
+                jpeg = bytes(shm.buf[SHM_DATA_OFFSET:SHM_DATA_OFFSET + length])
+                if SHM_HEADER.unpack_from(shm.buf, 0)[0] != seq:
+                    continue  # Overwritten while copying
+                last_seq = seq
+                self._publish(jpeg=jpeg, timestamp=timestamp)
+        finally:
+            shm.close()
+
+
+class ReplayFrameSource(FrameSource):
+    """Replays images, a folder, a video file or synthetic frames at a fixed rate."""
+
+    def __init__(self, source: Union[None, str, Sequence[np.ndarray]] = None, fps: float = 30.0,
+                 loop: bool = True, size=(236, 236)):
+        super().__init__()
+        self.source = source
+        self.fps = fps
+        self.loop = loop
+        self.size = size
+
+    def _images(self) -> Iterator[np.ndarray]:
+        if self.source is None:
+            rng = np.random.default_rng(0)
+            base = np.tile(np.linspace(0, 255, self.size[0], dtype=np.uint8), (self.size[1], 1))
+            i = 0
+            while True:
+                noise = rng.integers(0, 16, self.size[::-1], dtype=np.uint8)
+                yield cv2.merge([cv2.add(np.roll(base, i, axis=1), noise)] * 3)
+                i += 1
+        elif isinstance(self.source, str) and os.path.isdir(self.source):
+            paths = sorted(glob.glob(os.path.join(self.source, "*.jpg")) + glob.glob(os.path.join(self.source, "*.png")))
+            for path in paths:
+                img = cv2.imread(path)
+                if img is not None:
+                    yield img
+        elif isinstance(self.source, str):
+            cap = cv2.VideoCapture(self.source)
+            try:
+                while True:
+                    ret, frame = cap.read()
+                    if not ret:
+                        break
+                    yield frame
+            finally:
+                cap.release()
+        else:
+            yield from self.source
+
+    def _run(self):
+        interval = 1.0 / self.fps
+        while self._running:
+            produced = False
+            for img in self._images():
+                if not self._running:
+                    return
+                self._publish(image=img)
+                produced = True
+                time.sleep(interval)
+            if not self.loop or not produced:
+                self._running = False
+
+
+_sources = {}
+_sources_lock = threading.Lock()
+
+
+def get_frame_source(kind: str = FRAME_SOURCE, **kwargs) -> FrameSource:
+    """Return the process-wide, already started frame source of the given kind."""
+    with _sources_lock:
+        if kind not in _sources:
+            backends = {"mjpeg": MJPEGFrameSource, "shm": SharedMemoryFrameSource, "replay": ReplayFrameSource}
+            if kind not in backends:
+                raise ValueError(f"Unknown frame source: {kind}")
+            _sources[kind] = backends[kind](**kwargs).start()
+        return _sources[kind]
+
+
+def capture_frames(count: int, kind: str = FRAME_SOURCE, timeout: float = READ_TIMEOUT) -> List[Frame]:
+    """Grab count fresh, distinct frames from the shared source."""
+    return list(get_frame_source(kind).frames(count, timeout=timeout))
@@ -0,0 +1,271 @@
+import numpy as np
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+# Cosine distance below which a frame counts as a match (same value the
+# per-user loop in recognize_from_camera used).
+MATCH_THRESHOLD = 0.4
+# Number of best-matching samples averaged per user.
+DEFAULT_TOP_K = 5
+# With more users than this, queries are first compared to each user's
+# centroid and only the closest users' samples are scored.
+CENTROID_SHORTLIST = 32
+# From this many samples on, a matcher given an IVF index (ann_index) takes
+# its candidate users from the index's nearest samples instead.
+ANN_MIN_SAMPLES = 20000
+# Nearest samples fetched from the index per frame to pick candidate users.
+ANN_NEIGHBOURS = 64
+EMBEDDING_DIM = 512
+# In-memory gallery precision: "float32", "float16" (half the memory) or
+# "int8" (a quarter, plus one float32 scale per vector).
+GALLERY_PRECISION = "float32"
+# Quantized rows are widened to float32 this many at a time while scoring.
+SCORE_CHUNK_ROWS = 8192
+
+
+def l2_normalize(vectors: np.ndarray) -> np.ndarray:
+    """Return float32 row vectors scaled to unit length (zero rows stay zero)."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def quantize(matrix: np.ndarray, precision: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """Encode unit row vectors as (codes, per-row scales); scales is None unless int8."""
+    if precision == "float32":
+        return np.ascontiguousarray(matrix, dtype=np.float32), None
+    if precision == "float16":
+        return np.ascontiguousarray(matrix, dtype=np.float16), None
+    if precision == "int8":
+        peak = np.abs(matrix).max(axis=1) if len(matrix) else np.zeros(0, dtype=np.float32)
+        scales = (np.where(peak > 0, peak, 1.0) / 127.0).astype(np.float32)
+        codes = np.round(matrix / scales[:, None]).astype(np.int8)
+        return np.ascontiguousarray(codes), scales
+    raise ValueError(f"Unknown gallery precision: {precision}")
+
+
+def dequantize(codes: np.ndarray, scales: Optional[np.ndarray]) -> np.ndarray:
+    vectors = codes.astype(np.float32)
+    if scales is not None:
+        vectors *= scales[:, None]
+    return vectors
+
+
+def score_rows(q: np.ndarray, matrix: np.ndarray, scales: Optional[np.ndarray],
+               rows: Optional[np.ndarray] = None) -> np.ndarray:
+    """Cosine similarities (frames, rows) of unit queries against stored, possibly quantized, rows."""
+    if scales is None and matrix.dtype == np.float32:
+        return q @ (matrix if rows is None else matrix[rows]).T
+    n = len(matrix) if rows is None else len(rows)
+    out = np.empty((len(q), n), dtype=np.float32)
+    for start in range(0, n, SCORE_CHUNK_ROWS):
+        idx = slice(start, start + SCORE_CHUNK_ROWS) if rows is None else rows[start:start + SCORE_CHUNK_ROWS]
+        out[:, start:start + SCORE_CHUNK_ROWS] = q @ matrix[idx].astype(np.float32).T
+        if scales is not None:
+            out[:, start:start + SCORE_CHUNK_ROWS] *= scales[idx]
+    return out
+
+
+def top_k_mean(per_user: np.ndarray, top_k: int, k_eff: np.ndarray) -> np.ndarray:
+    """Mean of the top-k similarities along the last axis; -inf entries are padding."""
+    if per_user.shape[-1] > top_k:
+        per_user = -np.partition(-per_user, top_k - 1, axis=-1)[..., :top_k]
+    per_user = np.where(np.isfinite(per_user), per_user, 0.0)
+    return per_user.sum(axis=-1) / k_eff
+
+
+def flatten_embeddings(entries: Sequence[Dict[str, Any]]) -> Tuple[List[str], np.ndarray]:
+    """Flatten a loaded embedding pickle into parallel user ids and vectors.
+
+    Accepts both layouts found in face_embeddings.pkl: the nested
+    {"user_id", "embeddings": [{"embedding": [...]}, ...]} entries written by
+    training_pipeline and the flat {"user_id", "embedding": [...]} entries
+    written by the GUI routes.
+    """
+    user_ids = []
+    vectors = []
+    for entry in entries:
+        if not isinstance(entry, dict) or "user_id" not in entry:
+            raise ValueError(f"Invalid embedding entry: {type(entry)}")
+        samples = entry["embeddings"] if "embeddings" in entry else [entry]
+        for sample in samples:
+            emb = sample.get("embedding") if isinstance(sample, dict) else None
+            if emb is None or len(emb) != EMBEDDING_DIM:
+                raise ValueError(f"Invalid embedding for user {entry['user_id']}")
+            user_ids.append(entry["user_id"])
+            vectors.append(emb)
+    if not vectors:
+        return [], np.zeros((0, EMBEDDING_DIM), dtype=np.float32)
+    return user_ids, np.asarray(vectors, dtype=np.float32)
+
+
+class GalleryMatcher:
+    """Match query embeddings against every stored sample with one matrix product.
+
+    All stored vectors are L2-normalised into a contiguous float32 matrix,
+    grouped by user, with a parallel label array. A query (or a burst of
+    queries) is scored against the whole gallery at once and each user's
+    score is the mean of its top-k cosine similarities. Large galleries use
+    a two-stage search: a centroid prefilter picks `shortlist` candidate
+    users and only their samples (or prototypes) are scored. Galleries of
+    ANN_MIN_SAMPLES or more with an `index` (an ann_index.IVFIndex of the
+    same gallery version) take the candidates from the index instead.
+
+    With precision "float16" or "int8" the matrix is kept quantized and
+    widened to float32 one chunk of rows at a time while scoring, so the
+    resident gallery shrinks 2x or ~4x.
+    """
+
+    def __init__(self, user_ids: Sequence[str], vectors: np.ndarray,
+                 top_k: int = DEFAULT_TOP_K, threshold: float = MATCH_THRESHOLD,
+                 shortlist: Optional[int] = CENTROID_SHORTLIST, precision: str = GALLERY_PRECISION,
+                 index: Any = None):
+        self.top_k = max(1, int(top_k))
+        self.threshold = threshold
+        self.shortlist = shortlist
+        self.precision = precision
+        self.index = index
+        self._build(list(user_ids), np.asarray(vectors, dtype=np.float32))
+
+    @classmethod
+    def from_embeddings(cls, entries: Sequence[Dict[str, Any]], **kwargs) -> "GalleryMatcher":
+        """Build a matcher from the list returned by embed_utils.load_embeddings."""
+        user_ids, vectors = flatten_embeddings(entries)
+        return cls(user_ids, vectors, **kwargs)
+
+    def _build(self, user_ids: List[str], vectors: np.ndarray, normalized: bool = False):
+        if user_ids:
+            self.users, labels = np.unique(np.asarray(user_ids, dtype=str), return_inverse=True)
+        else:
+            self.users, labels = np.array([], dtype=str), np.array([], dtype=np.int64)
+        order = np.argsort(labels, kind="stable")
+        self.labels = np.ascontiguousarray(labels[order], dtype=np.int32)
+        matrix = vectors.reshape(-1, EMBEDDING_DIM)[order]
+        matrix = matrix if normalized else l2_normalize(matrix)
+        self.counts = np.bincount(self.labels, minlength=len(self.users))
+
+        # Padded (users, max_samples) index into the matrix columns; padding
+        # points at an extra column that always scores -inf.
+        n = len(self.labels)
+        max_count = int(self.counts.max()) if len(self.counts) else 0
+        offsets = np.cumsum(self.counts) - self.counts
+        cols = np.arange(max_count)
+        self._pad_index = np.where(cols[None, :] < self.counts[:, None], offsets[:, None] + cols[None, :], n)
+        self._k_eff = np.minimum(self.counts, self.top_k).astype(np.float32)
+        self._offsets = offsets
+        if n:
+            self.centroids = l2_normalize(np.add.reduceat(matrix, offsets, axis=0))
+        else:
+            self.centroids = np.zeros((0, EMBEDDING_DIM), dtype=np.float32)
+        self.matrix, self.scales = quantize(matrix, self.precision)
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    @property
+    def nbytes(self) -> int:
+        """Resident size of the sample matrix (codes plus scales)."""
+        return self.matrix.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    def vectors(self, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Float32 copy of the stored (normalised) vectors, optionally only some rows."""
+        codes = self.matrix if rows is None else self.matrix[rows]
+        scales = self.scales if rows is None or self.scales is None else self.scales[rows]
+        return dequantize(codes, scales)
+
+    def similarities(self, q: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Cosine similarities (frames, rows) of unit queries against stored rows."""
+        return score_rows(q, self.matrix, self.scales, rows)
+
+    def updated(self, changes: Dict[str, Optional[np.ndarray]]) -> "GalleryMatcher":
+        """Return a new matcher with each changed user's samples replaced (None removes the user).
+
+        Only the changed users' vectors are normalised; everyone else's rows
+        are reused from this matcher's matrix, so a delta from the store is
+        applied without re-reading or re-normalising the whole gallery. The
+        index no longer matches the new gallery and is not carried over.
+        """
+        keep = ~np.isin(self.users[self.labels], np.asarray(list(changes), dtype=str))
+        user_ids = list(self.users[self.labels[keep]])
+        blocks = [self.vectors(np.flatnonzero(keep))]
+        for user_id, vectors in changes.items():
+            if vectors is not None and len(vectors):
+                user_ids.extend([user_id] * len(vectors))
+                blocks.append(l2_normalize(np.asarray(vectors).reshape(-1, EMBEDDING_DIM)))
+        matcher = GalleryMatcher.__new__(GalleryMatcher)
+        matcher.top_k, matcher.threshold, matcher.shortlist = self.top_k, self.threshold, self.shortlist
+        matcher.precision, matcher.index = self.precision, None
+        matcher._build(user_ids, np.concatenate(blocks), normalized=True)
+        return matcher
+
+    def add_user(self, user_id: str, vectors: np.ndarray) -> "GalleryMatcher":
+        return self.updated({user_id: vectors})
+
+    def remove_user(self, user_id: str) -> "GalleryMatcher":
+        return self.updated({user_id: None})
+
+    def user_scores(self, queries: np.ndarray) -> np.ndarray:
+        """Return a (frames, users) array of top-k mean cosine similarities."""
+        q = l2_normalize(np.atleast_2d(queries))
+        if self.index is not None and len(self) >= ANN_MIN_SAMPLES:
+            return self._index_scores(q)
+        if self.shortlist and len(self.users) > self.shortlist:
+            return self._shortlist_scores(q)
+        sims = self.similarities(q)
+        sims = np.concatenate([sims, np.full((len(q), 1), -np.inf, dtype=np.float32)], axis=1)
+        return top_k_mean(sims[:, self._pad_index], self.top_k, self._k_eff)
+
+    def _shortlist_scores(self, q: np.ndarray) -> np.ndarray:
+        """Two-stage scores: users outside each frame's centroid shortlist get -1 (distance 2)."""
+        candidates = np.argpartition(-(q @ self.centroids.T), self.shortlist - 1, axis=1)[:, :self.shortlist]
+        return self._candidate_scores(q, candidates)
+
+    def _index_scores(self, q: np.ndarray) -> np.ndarray:
+        """Two-stage scores with the users owning each frame's ANN_NEIGHBOURS nearest indexed samples as candidates."""
+        labels, _ = self.index.search(q, ANN_NEIGHBOURS)
+        candidates = []
+        for row in labels:
+            names = np.unique(np.asarray([label for label in row if label], dtype=str))
+            # Labels the index has but this gallery version lacks are dropped
+            pos = np.minimum(np.searchsorted(self.users, names), len(self.users) - 1)
+            candidates.append(pos[self.users[pos] == names])
+        return self._candidate_scores(q, candidates)
+
+    def _candidate_scores(self, q: np.ndarray, candidates: Sequence[np.ndarray]) -> np.ndarray:
+        """Exact top-k scores of each frame's candidate users; everyone else gets -1 (distance 2)."""
+        scores = np.full((len(q), len(self.users)), -1.0, dtype=np.float32)
+        for i, cand in enumerate(candidates):
+            if not len(cand):
+                continue
+            cols = self._pad_index[cand]
+            rows = cols[cols < len(self.labels)]
+            sims = np.full(len(self.labels) + 1, -np.inf, dtype=np.float32)
+            sims[rows] = self.similarities(q[i:i + 1], rows)[0]
+            scores[i, cand] = top_k_mean(sims[cols], self.top_k, self._k_eff[cand])
+        return scores
+
+    def user_distances(self, queries: np.ndarray) -> np.ndarray:
+        """Return a (frames, users) array of cosine distances (1 - similarity)."""
+        return 1.0 - self.user_scores(queries)
+
+    def match(self, queries: np.ndarray) -> Dict[str, Any]:
+        """Match one embedding or a burst of embeddings (averaged) against the gallery.
+
+        Returns:
+            Dict[str, Any]: best user_id, its distance, the margin to the
+            runner-up user and whether the distance is below the threshold.
+        """
+        if not len(self.users):
+            return {"match": False, "user_id": None, "distance": float("inf"), "margin": float("inf")}
+        distances = self.user_distances(queries).mean(axis=0)
+        order = np.argsort(distances)
+        best = int(order[0])
+        best_distance = float(distances[best])
+        margin = float(distances[order[1]] - best_distance) if len(order) > 1 else float("inf")
+        return {
+            "match": best_distance < self.threshold,
+            "user_id": str(self.users[best]),
+            "distance": best_distance,
+            "margin": margin,
+        }
+
@@ -0,0 +1,95 @@
+import json
+import threading
+import time
+from typing import Callable, Optional
+from deepface_scripts.embedding_store import get_store
+
+BROKER = "localhost"
+PORT = 1883
+GALLERY_TOPIC = "nexus/gallery/version"
+POLL_INTERVAL = 2.0  # Fallback check of the store version when MQTT is unavailable
+
+
+def publish_version(version: int, broker: str = BROKER, port: int = PORT) -> bool:
+    """Announce a new gallery version as a retained MQTT message (best effort)."""
+    try:
+        import paho.mqtt.publish as publish
+        payload = json.dumps({"version": version, "timestamp": time.time()})
+        publish.single(GALLERY_TOPIC, payload, qos=1, retain=True, hostname=broker, port=port)
+        return True
+    except Exception as e:
+        print(f"[WARNING] Could not publish gallery version {version}: {str(e)}")
+        return False
+
+
+class GalleryWatcher:
+    """Calls on_change(version) whenever the stored gallery version moves forward.
+
+    Subscribes to the retained MQTT version topic for immediate updates and
+    also polls the store (a couple of stat() calls) so changes are picked
+    up even without a broker. The callback decides how to apply them.
+    """
+
+    def __init__(self, embeddings_path: str, on_change: Callable[[int], None],
+                 poll_interval: float = POLL_INTERVAL, broker: str = BROKER, port: int = PORT):
+        self.store = get_store(embeddings_path)
+        self.on_change = on_change
+        self.poll_interval = poll_interval
+        self.broker = broker
+        self.port = port
+        self.version = None
+        self.client = None
+        self._running = False
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self, version: Optional[int] = None) -> "GalleryWatcher":
+        self.version = version if version is not None else self.store.version
+        self._running = True
+        self._connect_mqtt()
+        self._thread = threading.Thread(target=self._poll, name="gallery-watcher", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._running = False
+        if self.client is not None:
+            self.client.loop_stop()
+            self.client.disconnect()
+
+    def _connect_mqtt(self):
+        try:
+            import paho.mqtt.client as mqtt
+            self.client = mqtt.Client(client_id=f"gallery_watcher_{int(time.time())}")
+            self.client.on_connect = lambda client, userdata, flags, rc: client.subscribe(GALLERY_TOPIC, qos=1)
+            self.client.on_message = self._on_message
+            self.client.connect(self.broker, self.port, 60)
+            self.client.loop_start()
+        except Exception as e:
+            print(f"[WARNING] Gallery watcher running without MQTT: {str(e)}")
+            self.client = None
+
+    def _on_message(self, client, userdata, msg):
+        try:
+            version = int(json.loads(msg.payload.decode())["version"])
+        except (ValueError, KeyError, TypeError):
+            return
+        self._notify(version)
+
+    def _poll(self):
+        while self._running:
+            time.sleep(self.poll_interval)
+            try:
+                self._notify(self.store.version)
+            except Exception as e:
+                print(f"[ERROR] Gallery version check failed: {str(e)}")
+
+    def _notify(self, version: int):
+        # The retained message at connect or a late one can trail the poll:
+        # only newer versions count, and callbacks from the MQTT and poll
+        # threads run one at a time, in version order.
+        with self._lock:
+            if self.version is not None and version <= self.version:
+                return
+            self.version = version
+            self.on_change(version)
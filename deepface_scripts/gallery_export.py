@@ -0,0 +1,112 @@
+import json
+import struct
+import numpy as np
+from typing import Any, Dict, Iterator, List, Optional
+from deepface_scripts.embed_utils import EMBEDDINGS_PATH
+from deepface_scripts.embedding_store import get_store
+from deepface_scripts.gallery import EMBEDDING_DIM, l2_normalize
+
+PAGE_SIZE = 50  # Users per page when the caller does not ask for a limit
+# Binary stream: magic + format version + embedding dimension, then one
+# record per user: uint16 id length, utf-8 id, uint32 rows, rows x dim
+# little-endian float32.
+BINARY_MAGIC = b"NXEM"
+BINARY_VERSION = 1
+BINARY_HEADER = struct.Struct("<4sHH")
+BINARY_RECORD = struct.Struct("<H")
+BINARY_ROWS = struct.Struct("<I")
+
+
+def page_users(path: str = EMBEDDINGS_PATH, offset: int = 0, limit: Optional[int] = PAGE_SIZE) -> List[str]:
+    """One page of enrolled user ids, in a stable (sorted) order."""
+    users = sorted(get_store(path).user_ids())
+    offset = max(0, int(offset))
+    return users[offset:] if limit is None else users[offset:offset + max(0, int(limit))]
+
+
+def vector_summary(vectors: np.ndarray) -> Dict[str, Any]:
+    """Count and compactness of one user's samples.
+
+    centroid_norm is the length of the mean of the unit vectors (1.0 when
+    every sample points the same way, lower as they spread out); spread is
+    the mean cosine distance of the samples to their normalised centroid.
+    """
+    if not len(vectors):
+        return {"count": 0, "centroid_norm": None, "spread": None, "max_distance": None}
+    unit = l2_normalize(vectors)
+    mean = unit.mean(axis=0)
+    norm = float(np.linalg.norm(mean))
+    distances = 1.0 - unit @ (mean / norm) if norm > 0 else np.ones(len(unit), dtype=np.float32)
+    return {
+        "count": int(len(unit)),
+        "centroid_norm": norm,
+        "spread": float(distances.mean()),
+        "max_distance": float(distances.max()),
+    }
+
+
+def summarize_gallery(path: str = EMBEDDINGS_PATH, offset: int = 0,
+                      limit: Optional[int] = PAGE_SIZE) -> Dict[str, Any]:
+    """Per-user summaries for one page of the gallery, without any raw vectors."""
+    store = get_store(path)
+    total = len(store.user_ids())
+    users = []
+    for user_id in page_users(path, offset, limit):
+        meta = store.user_meta(user_id)
+        users.append({"user_id": user_id, **vector_summary(store.user_vectors(user_id)),
+                      "prototypes": bool(meta.get("prototypes")), "sample_count": meta.get("sample_count")})
+    next_offset = offset + len(users)
+    return {
+        "version": store.version,
+        "total_users": total,
+        "total_vectors": len(store),
+        "offset": offset,
+        "next_offset": next_offset if next_offset < total else None,
+        "users": users,
+    }
+
+
+def iter_entries(path: str = EMBEDDINGS_PATH, offset: int = 0,
+                 limit: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+    """Yield one nested entry per user, reading each user's vectors only when it is reached."""
+    store = get_store(path)
+    for user_id in page_users(path, offset, limit):
+        samples = [{"user_id": user_id, "embedding": v.tolist()} for v in store.user_vectors(user_id)]
+        yield {"user_id": user_id, "embeddings": samples, **store.user_meta(user_id)}
+
+
+def iter_ndjson(path: str = EMBEDDINGS_PATH, offset: int = 0, limit: Optional[int] = None) -> Iterator[bytes]:
+    """Stream the gallery as newline-delimited JSON, one user per line."""
+    for entry in iter_entries(path, offset, limit):
+        yield (json.dumps(entry) + "\n").encode()
+
+
+def iter_binary(path: str = EMBEDDINGS_PATH, offset: int = 0, limit: Optional[int] = None) -> Iterator[bytes]:
+    """Stream the gallery as raw float32 records (see BINARY_HEADER) without any text conversion."""
+    store = get_store(path)
+    yield BINARY_HEADER.pack(BINARY_MAGIC, BINARY_VERSION, EMBEDDING_DIM)
+    for user_id in page_users(path, offset, limit):
+        vectors = np.ascontiguousarray(store.user_vectors(user_id), dtype="<f4")
+        name = user_id.encode()
+        yield BINARY_RECORD.pack(len(name)) + name + BINARY_ROWS.pack(len(vectors))
+        yield vectors.tobytes()
+
+
+def read_binary(data: bytes) -> Dict[str, np.ndarray]:
+    """Decode a stream written by iter_binary into {user_id: (rows, dim) float32}."""
+    magic, version, dim = BINARY_HEADER.unpack_from(data, 0)
+    if magic != BINARY_MAGIC or version != BINARY_VERSION:
+        raise ValueError("Not a gallery binary stream")
+    pos = BINARY_HEADER.size
+    users = {}
+    while pos < len(data):
+        (length,) = BINARY_RECORD.unpack_from(data, pos)
+        pos += BINARY_RECORD.size
+        user_id = data[pos:pos + length].decode()
+        pos += length
+        (rows,) = BINARY_ROWS.unpack_from(data, pos)
+        pos += BINARY_ROWS.size
+        size = rows * dim * 4
+        users[user_id] = np.frombuffer(data[pos:pos + size], dtype="<f4").reshape(rows, dim)
+        pos += size
+    return users
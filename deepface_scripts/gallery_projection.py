@@ -0,0 +1,114 @@
+import threading
+import numpy as np
+from typing import Any, Dict
+from deepface_scripts.embed_utils import EMBEDDINGS_PATH
+from deepface_scripts.embedding_store import get_store
+from deepface_scripts.gallery import EMBEDDING_DIM, l2_normalize
+
+PROJECTION_METHOD = "pca"  # "pca" or "random" (fixed Gaussian projection, never refitted)
+# Users added or removed since the last PCA fit are projected onto the old
+# axes; once they account for this share of the gallery the axes are refitted.
+REFIT_FRACTION = 0.25
+POINT_DECIMALS = 3  # Coordinates are rounded to keep the response to a few KB
+RANDOM_SEED = 0
+
+
+def pca_basis(vectors: np.ndarray) -> tuple:
+    """Mean and the top two principal axes (2, dim) of unit row vectors."""
+    mean = vectors.mean(axis=0)
+    _, _, vt = np.linalg.svd(vectors - mean, full_matrices=False)
+    axes = np.zeros((2, vectors.shape[1]), dtype=np.float32)
+    axes[:len(vt[:2])] = vt[:2]
+    return mean.astype(np.float32), axes
+
+
+def random_basis(dim: int = EMBEDDING_DIM, seed: int = RANDOM_SEED) -> tuple:
+    axes = np.random.default_rng(seed).standard_normal((2, dim)).astype(np.float32)
+    return np.zeros(dim, dtype=np.float32), axes / np.sqrt(dim)
+
+
+class GalleryProjection:
+    """2-D layout of every stored embedding, cached by gallery version.
+
+    The first request fits the axes on the whole gallery; later versions are
+    applied as deltas from the store, projecting only the changed users'
+    vectors. PCA axes are refitted once the users changed since the fit
+    reach REFIT_FRACTION of the gallery (or the store's log no longer
+    reaches back to the cached version).
+    """
+
+    def __init__(self, embeddings_path: str = EMBEDDINGS_PATH, method: str = PROJECTION_METHOD,
+                 refit_fraction: float = REFIT_FRACTION):
+        if method not in ("pca", "random"):
+            raise ValueError(f"Unknown projection method: {method}")
+        self.store = get_store(embeddings_path)
+        self.method = method
+        self.refit_fraction = refit_fraction
+        self.version = None
+        self.mean = None
+        self.axes = None
+        self.points = {}  # user_id -> (n, 2) float32
+        self.changed_since_fit = set()
+        self.lock = threading.Lock()
+
+    def _project(self, vectors: np.ndarray) -> np.ndarray:
+        return ((l2_normalize(vectors) - self.mean) @ self.axes.T).astype(np.float32)
+
+    def _fit(self, version: int):
+        user_ids, vectors = self.store.arrays()
+        if self.method == "random":
+            self.mean, self.axes = random_basis(EMBEDDING_DIM)
+        elif len(vectors) > 1:
+            self.mean, self.axes = pca_basis(l2_normalize(vectors))
+        else:
+            self.mean, self.axes = np.zeros(EMBEDDING_DIM, dtype=np.float32), np.eye(2, EMBEDDING_DIM, dtype=np.float32)
+        projected = self._project(vectors) if len(vectors) else np.zeros((0, 2), dtype=np.float32)
+        labels = np.asarray(user_ids, dtype=str)
+        self.points = {uid: projected[labels == uid] for uid in dict.fromkeys(user_ids)}
+        self.changed_since_fit = set()
+        self.version = version
+
+    def refresh(self) -> bool:
+        """Bring the layout up to the store's version; True if anything changed."""
+        with self.lock:
+            version = self.store.version
+            if version == self.version:
+                return False
+            changes = self.store.changes_since(self.version) if self.version is not None else None
+            if changes is None:
+                self._fit(version)
+                return True
+            for user_id, vectors in changes.items():
+                if vectors is None or not len(vectors):
+                    self.points.pop(user_id, None)
+                else:
+                    self.points[user_id] = self._project(vectors)
+            self.changed_since_fit.update(changes)
+            self.version = version
+            if self.method == "pca" and len(self.changed_since_fit) > self.refit_fraction * max(1, len(self.points)):
+                self._fit(version)
+            return True
+
+    def layout(self, decimals: int = POINT_DECIMALS) -> Dict[str, Any]:
+        """JSON-ready points per user plus each user's mean position."""
+        self.refresh()
+        with self.lock:
+            users = [{
+                "user_id": uid,
+                "points": np.round(pts, decimals).tolist(),
+                "center": np.round(pts.mean(axis=0), decimals).tolist(),
+            } for uid, pts in sorted(self.points.items())]
+            return {"version": self.version, "method": self.method, "users": users}
+
+
+_projections = {}
+_projections_lock = threading.Lock()
+
+
+def get_projection(embeddings_path: str = EMBEDDINGS_PATH, method: str = PROJECTION_METHOD) -> GalleryProjection:
+    """Shared projection cache per (gallery, method)."""
+    key = (embeddings_path, method)
+    with _projections_lock:
+        if key not in _projections:
+            _projections[key] = GalleryProjection(embeddings_path, method)
+        return _projections[key]
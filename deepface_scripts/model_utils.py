@@ -1,30 +1,23 @@
-import os
 import cv2
-import numpy as np
+from deepface_scripts.face_detector import RES10_MODEL, RES10_PROTO, Res10Detector, as_detector
 
 MODEL_DIR = "deepface_scripts/model"
+# Enrollment keeps only confident detections so non-faces never reach the
+# gallery; recognition uses face_detector.CONFIDENCE_THRESHOLD.
+ENROLL_CONFIDENCE_THRESHOLD = 0.9
 
 def load_res10_model():
-    model_path = "/home/salah/doorLockGui/deepface_scripts/model/res10_300x300_ssd_iter_140000.caffemodel"
-    config_path = "/home/salah/doorLockGui/deepface_scripts/model/deploy.prototxt"
-    return cv2.dnn.readNetFromCaffe(config_path, model_path)
+    return cv2.dnn.readNetFromCaffe(RES10_PROTO, RES10_MODEL)
 
-def detect_faces_from_frame(net, frame, conf_threshold=0.9):
-    h, w = frame.shape[:2]
-    blob = cv2.dnn.blobFromImage(frame, 1.0, (300, 300), [104, 117, 123], False, False)
-    net.setInput(blob)
-    detections = net.forward()
-    faces = []
-    for i in range(detections.shape[2]):
-        if detections[0, 0, i, 2] > conf_threshold:
-            box = detections[0, 0, i, 3:7] * np.array([w, h, w, h])
-            (x1, y1, x2, y2) = box.astype("int")
-            faces.append({"box": (x1, y1, x2 - x1, y2 - y1)})
-    return faces
+def enrollment_detector(detector=None, conf_threshold=ENROLL_CONFIDENCE_THRESHOLD):
+    """The given (or default) detector, with a Res10 one raised to the enrollment threshold."""
+    detector = as_detector(detector)
+    if isinstance(detector, Res10Detector) and detector.threshold != conf_threshold:
+        detector = Res10Detector(net=detector.net, threshold=conf_threshold, size=detector.size, mean=detector.mean)
+    return detector
 
-def face_cropped(img, detector):
-    faces = detect_faces_from_frame(detector, img)
-    if not faces:
-        return None
-    x, y, w, h = faces[0]["box"]
-    return img[y:y+h, x:x+w]
\ No newline at end of file
+def detect_faces_from_frame(net, frame, conf_threshold=ENROLL_CONFIDENCE_THRESHOLD):
+    return [{"box": face[:4]} for face in enrollment_detector(net, conf_threshold).detect(frame)]
+
+def face_cropped(img, detector, conf_threshold=ENROLL_CONFIDENCE_THRESHOLD):
+    return enrollment_detector(detector, conf_threshold).crop(img)
@@ -0,0 +1,113 @@
+import multiprocessing as mp
+import threading
+import time
+import numpy as np
+from typing import Any, Dict, List, Optional, Sequence
+
+# ArcFace worker processes for enrollment; 1 embeds in-process with the shared engine.
+EMBED_WORKERS = 1
+# TensorFlow intra-op (or cv2.dnn) threads per worker, so N workers use about N cores
+# instead of each trying to use all of them.
+WORKER_THREADS = 1
+# TensorFlow does not survive fork() once initialised, so workers are spawned
+# and each builds its own ArcFace model once.
+START_METHOD = "spawn"
+EMBEDDING_DIM = 512
+
+
+def _init_worker(threads: int):
+    from deepface_scripts.embedding_engine import ENGINE_BACKEND, get_engine
+    if ENGINE_BACKEND == "onnx":
+        import cv2
+        cv2.setNumThreads(threads)
+    else:
+        try:
+            import tensorflow as tf
+            tf.config.threading.set_intra_op_parallelism_threads(threads)
+            tf.config.threading.set_inter_op_parallelism_threads(1)
+        except Exception as e:
+            print(f"[WARNING] Could not limit TensorFlow threads in embedding worker: {str(e)}")
+    get_engine()
+
+
+def _embed_chunk(crops: List[np.ndarray], batch_size: Optional[int]) -> np.ndarray:
+    from deepface_scripts.embedding_engine import get_engine
+    return get_engine().represent(crops, batch_size)
+
+
+class ParallelEngine:
+    """Drop-in for ArcFaceEngine.represent that spreads crops over a process pool.
+
+    Crops are split into one contiguous chunk per worker and the results are
+    concatenated in input order, so row i is always the embedding of crop i.
+    Workers load ArcFace once (in the pool initializer) and stay up between
+    enrollments.
+    """
+
+    def __init__(self, workers: int = EMBED_WORKERS, threads: int = WORKER_THREADS,
+                 start_method: str = START_METHOD):
+        self.workers = max(1, int(workers))
+        start = time.perf_counter()
+        self.pool = mp.get_context(start_method).Pool(self.workers, initializer=_init_worker, initargs=(threads,))
+        # Wait until every worker has built its model so the first enrollment is not cold
+        self.pool.starmap(_embed_chunk, [([], None)] * self.workers, chunksize=1)
+        self.startup_s = time.perf_counter() - start
+
+    def represent(self, crops: Sequence[np.ndarray], batch_size: Optional[int] = None) -> np.ndarray:
+        """Return an (N, 512) float32 array of embeddings, one row per crop, in input order."""
+        if not len(crops):
+            return np.zeros((0, EMBEDDING_DIM), dtype=np.float32)
+        chunks = [c for c in np.array_split(np.arange(len(crops)), min(self.workers, len(crops))) if len(c)]
+        parts = self.pool.starmap(_embed_chunk, [([crops[i] for i in chunk], batch_size) for chunk in chunks],
+                                  chunksize=1)
+        return np.concatenate(parts).astype(np.float32)
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_parallel_engine(workers: int = EMBED_WORKERS) -> ParallelEngine:
+    """Process-wide pool, rebuilt only if a different worker count is asked for."""
+    global _engine
+    with _engine_lock:
+        if _engine is not None and _engine.workers != workers:
+            _engine.close()
+            _engine = None
+        if _engine is None:
+            _engine = ParallelEngine(workers)
+        return _engine
+
+
+def enrollment_engine(workers: int = EMBED_WORKERS) -> Any:
+    """Engine used to embed enrollment crops: the process pool when workers > 1, else the shared engine."""
+    if workers > 1:
+        return get_parallel_engine(workers)
+    from deepface_scripts.embedding_engine import get_engine
+    return get_engine()
+
+
+def benchmark_workers(crops: Sequence[np.ndarray], worker_counts: Sequence[int] = (1, 2, 3, 4),
+                      repeats: int = 2) -> List[Dict[str, Any]]:
+    """Enrollment embedding time for the same crops at each worker count (pool startup reported separately)."""
+    rows = []
+    reference = None
+    for workers in worker_counts:
+        engine = ParallelEngine(workers)
+        try:
+            best = float("inf")
+            for _ in range(repeats):
+                start = time.perf_counter()
+                vectors = engine.represent(crops)
+                best = min(best, time.perf_counter() - start)
+        finally:
+            engine.close()
+        reference = vectors if reference is None else reference
+        rows.append({"workers": workers, "startup_s": engine.startup_s, "embed_s": best,
+                     "faces_per_s": len(crops) / best,
+                     "max_diff": float(np.abs(vectors - reference).max())})
+    return rows
@@ -0,0 +1,233 @@
+import queue
+import threading
+import time
+import numpy as np
+from typing import Any, Callable, Dict, Optional
+from deepface_scripts.frame_source import FrameSource, get_frame_source
+from deepface_scripts.gallery import GalleryMatcher
+from deepface_scripts.sequential_decision import SequentialDecision
+from deepface_scripts.recognize_from_camera import log_event, publish_result
+
+QUEUE_SIZE = 2
+EMBED_BATCH = 4
+TIMEOUT_SECONDS = 30
+POLL_INTERVAL = 0.1
+
+
+def put_latest(q: queue.Queue, item: Any) -> int:
+    """Put item on a bounded queue, dropping the oldest entries when it is full.
+
+    Returns the number of dropped items, so downstream stages always work on
+    the freshest frames instead of a backlog.
+    """
+    dropped = 0
+    while True:
+        try:
+            q.put_nowait(item)
+            return dropped
+        except queue.Full:
+            try:
+                q.get_nowait()
+                dropped += 1
+            except queue.Empty:
+                pass
+
+
+def drain(q: queue.Queue):
+    while True:
+        try:
+            q.get_nowait()
+        except queue.Empty:
+            return
+
+
+class Stage:
+    """One worker thread: take an item from inbox, process it, push the result to outbox."""
+
+    def __init__(self, name: str, func: Callable, inbox: Optional[queue.Queue], outbox: Optional[queue.Queue],
+                 active: threading.Event, batch: int = 1):
+        self.name = name
+        self.func = func
+        self.inbox = inbox
+        self.outbox = outbox
+        self.active = active
+        self.batch = batch
+        self.processed = 0
+        self.dropped = 0
+        self.busy_s = 0.0
+        self.active_s = 0.0
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name=f"pipeline-{self.name}", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+
+    def _take(self):
+        """Block briefly for one item, then grab whatever else is queued up to the batch size."""
+        if self.inbox is None:
+            return None
+        items = [self.inbox.get(timeout=POLL_INTERVAL)]
+        while len(items) < self.batch:
+            try:
+                items.append(self.inbox.get_nowait())
+            except queue.Empty:
+                break
+        return items if self.batch > 1 else items[0]
+
+    def _run(self):
+        while self._running:
+            if not self.active.wait(POLL_INTERVAL):
+                continue
+            loop_start = time.perf_counter()
+            try:
+                item = self._take()
+            except queue.Empty:
+                self.active_s += time.perf_counter() - loop_start
+                continue
+            start = time.perf_counter()
+            try:
+                outputs = self.func(item)
+            except Exception as e:
+                log_event(f"[ERROR] Pipeline stage {self.name} failed: {str(e)}")
+                outputs = None
+            end = time.perf_counter()
+            self.busy_s += end - start
+            self.active_s += end - loop_start
+            if outputs is None:
+                continue
+            outputs = outputs if isinstance(outputs, list) else [outputs]
+            self.processed += len(outputs) if self.batch > 1 else 1
+            if self.outbox is not None:
+                for out in outputs:
+                    self.dropped += put_latest(self.outbox, out)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "processed": self.processed,
+            "dropped": self.dropped,
+            "busy_ms_per_item": round(1000 * self.busy_s / self.processed, 2) if self.processed else None,
+            "items_per_s": round(self.processed / self.active_s, 2) if self.active_s else None,
+            "queue_depth": self.inbox.qsize() if self.inbox is not None else None,
+        }
+
+
+class RecognitionPipeline:
+    """Capture → detect → embed → match, each stage on its own thread.
+
+    Stages are joined by small bounded queues; when a stage falls behind the
+    oldest queued frame is dropped, so detection of frame N+1 overlaps with
+    embedding of frame N without building a backlog of stale frames. The
+    threads stay parked between attempts and only run while recognize() is
+    collecting evidence. Per-attempt state (the tracker, the engine's
+    embedding cache) is reset by the stage that owns it, not by the caller,
+    and each final decision goes through publish_result like the burst path.
+    """
+
+    def __init__(self, matcher: GalleryMatcher, crop_face: Callable[[np.ndarray], Optional[np.ndarray]],
+                 engine: Any, source: Optional[FrameSource] = None,
+                 queue_size: int = QUEUE_SIZE, embed_batch: int = EMBED_BATCH,
+                 tracker: Optional[Any] = None):
+        self.matcher = matcher
+        self.crop_face = crop_face
+        self.engine = engine
+        self.tracker = tracker
+        self.source = source or get_frame_source()
+        self.active = threading.Event()
+        self.detect_q = queue.Queue(maxsize=queue_size)
+        self.embed_q = queue.Queue(maxsize=queue_size)
+        self.match_q = queue.Queue(maxsize=queue_size)
+        self.result_q = queue.Queue(maxsize=queue_size * 4)
+        self._last_seq = 0
+        # Attempt counter; each stage resets its own state when it moves on
+        self._attempt = 0
+        self._tracker_attempt = 0
+        self._engine_attempt = 0
+        self.stages = [
+            Stage("capture", self._capture, None, self.detect_q, self.active),
+            Stage("detect", self._detect, self.detect_q, self.embed_q, self.active),
+            Stage("embed", self._embed, self.embed_q, self.match_q, self.active, batch=embed_batch),
+            Stage("match", self._match, self.match_q, self.result_q, self.active),
+        ]
+        self._started = False
+
+    def start(self):
+        if not self._started:
+            for stage in self.stages:
+                stage.start()
+            self._started = True
+
+    def stop(self):
+        self.active.clear()
+        for stage in self.stages:
+            stage.stop()
+        self._started = False
+
+    def _capture(self, _):
+        frame = self.source.read(after_seq=self._last_seq, timeout=POLL_INTERVAL)
+        if frame is None:
+            return None
+        self._last_seq = frame.seq
+        return frame
+
+    def _detect(self, frame):
+        if self._tracker_attempt != self._attempt:
+            self._tracker_attempt = self._attempt
+            if self.tracker is not None:
+                self.tracker.reset()
+        crop = self.crop_face(frame.image)
+        if crop is None or not isinstance(crop, np.ndarray) or crop.size == 0:
+            return None
+        return (frame.timestamp, crop)
+
+    def _embed(self, items):
+        if self._engine_attempt != self._attempt:
+            self._engine_attempt = self._attempt
+            if hasattr(self.engine, "reset"):
+                self.engine.reset()  # Embeddings never carry over from an earlier attempt
+        embeddings = self.engine.represent([crop for _, crop in items])
+        return [(ts, emb) for (ts, _), emb in zip(items, embeddings)]
+
+    def _match(self, item):
+        timestamp, emb = item
+        return (timestamp, self.matcher.user_distances(emb)[0])
+
+    def recognize(self, time_budget: float = TIMEOUT_SECONDS, **decision_kwargs) -> Dict[str, Any]:
+        """Run the stages until the sequential decision stops or the time budget runs out."""
+        self.start()
+        for q in (self.detect_q, self.embed_q, self.match_q, self.result_q):
+            drain(q)
+        self._attempt += 1
+        attempt_start = time.time()
+        decision = SequentialDecision(self.matcher.users, time_budget=time_budget,
+                                      threshold=self.matcher.threshold, **decision_kwargs)
+        self.active.set()
+        try:
+            while decision.elapsed() < time_budget:
+                try:
+                    timestamp, distances = self.result_q.get(timeout=POLL_INTERVAL)
+                except queue.Empty:
+                    continue
+                if timestamp < attempt_start:
+                    continue  # Frame captured before this attempt started
+                outcome = decision.update(distances)
+                if outcome:
+                    break
+            else:
+                outcome = decision.finish("time_budget")
+        finally:
+            self.active.clear()
+        publish_result(outcome)
+        return outcome
+
+    def stats(self) -> Dict[str, Any]:
+        stats = {stage.name: stage.stats() for stage in self.stages}
+        if self.tracker is not None:
+            stats["tracker"] = self.tracker.stats()
+        return stats
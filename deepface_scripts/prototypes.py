@@ -0,0 +1,144 @@
+import argparse
+import time
+import numpy as np
+from typing import Any, Dict, List, Sequence
+from deepface_scripts.gallery import GalleryMatcher, flatten_embeddings, l2_normalize
+from deepface_scripts.ann_index import spherical_kmeans
+
+NUM_PROTOTYPES = 8
+HOLDOUT_FRACTION = 0.2
+
+
+def compact_vectors(vectors: np.ndarray, num_prototypes: int = NUM_PROTOTYPES, seed: int = 0) -> np.ndarray:
+    """Reduce one user's inlier embeddings to k-means prototypes."""
+    vectors = l2_normalize(vectors)
+    if len(vectors) <= num_prototypes:
+        return vectors
+    return spherical_kmeans(vectors, num_prototypes, seed=seed)
+
+
+def compact_entry(user_id: str, samples: Sequence[Dict[str, Any]],
+                  num_prototypes: int = NUM_PROTOTYPES) -> Dict[str, Any]:
+    """Build the nested gallery entry for one user from their sample embeddings."""
+    _, vectors = flatten_embeddings([{"user_id": user_id, "embeddings": list(samples)}])
+    prototypes = compact_vectors(vectors, num_prototypes)
+    return {
+        "user_id": user_id,
+        "embeddings": [{"user_id": user_id, "embedding": p.tolist()} for p in prototypes],
+        "prototypes": True,
+        "sample_count": len(vectors),
+    }
+
+
+def group_by_user(entries: Sequence[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+    """Collect every sample per user across flat and nested entries."""
+    users = {}
+    for entry in entries:
+        samples = entry["embeddings"] if "embeddings" in entry else [entry]
+        users.setdefault(entry["user_id"], []).extend(samples)
+    return users
+
+
+def compact_gallery(entries: Sequence[Dict[str, Any]],
+                    num_prototypes: int = NUM_PROTOTYPES) -> List[Dict[str, Any]]:
+    """Return a gallery with one prototype entry per user; already compacted users are untouched."""
+    compacted_users = {e["user_id"]: e for e in entries if e.get("prototypes")}
+    out = []
+    for user_id, samples in group_by_user(entries).items():
+        if user_id in compacted_users:
+            out.append(compacted_users[user_id])
+        else:
+            out.append(compact_entry(user_id, samples, num_prototypes))
+    return out
+
+
+def compact_file(path: str, num_prototypes: int = NUM_PROTOTYPES) -> Dict[str, Any]:
+    """Compact the stored gallery in place through the repository, publishing the new version.
+
+    The original samples are not kept; take a snapshot first
+    (python -m deepface_scripts.replication export FILE) to be able to go back.
+    """
+    from deepface_scripts.embedding_repository import replace_gallery
+    from deepface_scripts.embedding_store import get_store
+    entries = get_store(path).entries(as_lists=False)
+    before, _ = flatten_embeddings(entries)
+    compacted = compact_gallery(entries, num_prototypes)
+    after, _ = flatten_embeddings(compacted)
+    version = replace_gallery(compacted, path)
+    return {"users": len(compacted), "vectors_before": len(before), "vectors_after": len(after), "version": version}
+
+
+def evaluate(entries: Sequence[Dict[str, Any]], num_prototypes: int = NUM_PROTOTYPES,
+             holdout: float = HOLDOUT_FRACTION, seed: int = 0) -> List[Dict[str, Any]]:
+    """Compare the full gallery with its compacted form on held-out samples of each user.
+
+    Each user's samples are split; the remainder is enrolled as-is (full) and
+    as prototypes (compacted), and the held-out samples are matched against
+    both. Reports size, top-1 accuracy, genuine acceptance at the match
+    threshold, impostor acceptance (best other user under the threshold),
+    mean genuine distance and match latency.
+    """
+    rng = np.random.default_rng(seed)
+    full_entries, compact_entries, queries, truth = [], [], [], []
+    for user_id, samples in group_by_user(entries).items():
+        _, vectors = flatten_embeddings([{"user_id": user_id, "embeddings": samples}])
+        if len(vectors) < 2:
+            continue
+        order = rng.permutation(len(vectors))
+        n_test = max(1, int(len(vectors) * holdout))
+        test, train = vectors[order[:n_test]], vectors[order[n_test:]]
+        queries.append(test)
+        truth.extend([user_id] * len(test))
+        full_entries.extend({"user_id": user_id, "embedding": v} for v in train)
+        prototypes = compact_vectors(train, num_prototypes)
+        compact_entries.extend({"user_id": user_id, "embedding": p} for p in prototypes)
+    if not queries:
+        return []
+    queries = np.concatenate(queries)
+    truth = np.asarray(truth, dtype=str)
+    rows = []
+    for name, gallery in (("full", full_entries), ("prototypes", compact_entries)):
+        matcher = GalleryMatcher.from_embeddings(gallery)
+        start = time.perf_counter()
+        distances = matcher.user_distances(queries)
+        ms = 1000 * (time.perf_counter() - start) / len(queries)
+        best = distances.argmin(axis=1)
+        own = np.searchsorted(matcher.users, truth)
+        genuine = distances[np.arange(len(queries)), own]
+        others = distances.copy()
+        others[np.arange(len(queries)), own] = np.inf
+        rows.append({
+            "gallery": name,
+            "vectors": len(matcher),
+            "megabytes": matcher.nbytes / 1e6,
+            "top1_accuracy": float(np.mean(matcher.users[best] == truth)),
+            "genuine_accept": float(np.mean(genuine < matcher.threshold)),
+            "impostor_accept": float(np.mean(others.min(axis=1) < matcher.threshold)) if len(matcher.users) > 1 else None,
+            "genuine_distance": float(genuine.mean()),
+            "ms_per_query": ms,
+        })
+    return rows
+
+
+def main():
+    from deepface_scripts.embed_utils import EMBEDDINGS_PATH, load_embeddings
+    from deepface_scripts.benchmarks import print_table
+    parser = argparse.ArgumentParser(description="Per-user prototype compaction of the face gallery")
+    parser.add_argument("--path", default=EMBEDDINGS_PATH, help="Embeddings path (store lives next to it)")
+    parser.add_argument("--prototypes", type=int, default=NUM_PROTOTYPES)
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("compact", help="Compact the gallery in place (export a replication snapshot first to keep the samples)")
+    report = sub.add_parser("report", help="Size reduction and accuracy impact on held-out samples")
+    report.add_argument("--holdout", type=float, default=HOLDOUT_FRACTION)
+    args = parser.parse_args()
+
+    if args.command == "compact":
+        stats = compact_file(args.path, args.prototypes)
+        print(f"[INFO] Compacted {stats['users']} users: {stats['vectors_before']} -> {stats['vectors_after']} vectors "
+              f"(gallery v{stats['version']})")
+    elif args.command == "report":
+        print_table(evaluate(load_embeddings(args.path), args.prototypes, args.holdout))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+import requests
+from typing import Any, Dict, Optional
+
+# Kept free of model imports so the hardware aggregator can ask for a face
+# result without loading OpenCV or ArcFace itself.
+SERVICE_HOST = "127.0.0.1"
+SERVICE_PORT = 8090
+SERVICE_URL = f"http://{SERVICE_HOST}:{SERVICE_PORT}"
+
+
+def request_recognition(timeout: float = 30) -> Dict[str, Any]:
+    """Ask the running recognition service for a result."""
+    try:
+        response = requests.post(f"{SERVICE_URL}/recognize", timeout=timeout)
+        response.raise_for_status()
+        return response.json()
+    except requests.RequestException as e:
+        print(f"[ERROR] Recognition service request failed: {str(e)}")
+        return {"match": False, "name": "error", "error": str(e)}
+
+
+def service_ready(timeout: float = 1) -> Optional[bool]:
+    """Return True/False for the service readiness, or None when it is unreachable."""
+    try:
+        return requests.get(f"{SERVICE_URL}/ready", timeout=timeout).status_code == 200
+    except requests.RequestException:
+        return None
+
+
+def recognize_and_report() -> Dict[str, Any]:
+    """Request a recognition and feed a match into the access session."""
+    from hardware.aggregator import update_input
+    result = request_recognition()
+    if result.get("match"):
+        update_input("face_result", result)
+    return result
@@ -0,0 +1,239 @@
+#!/usr/bin/python3
+import json
+import time
+import threading
+import numpy as np
+from http import server
+from socketserver import ThreadingMixIn
+from typing import Any, Dict, Optional
+from deepface_scripts.gallery import GalleryMatcher, ANN_MIN_SAMPLES
+from deepface_scripts.ann_index import sync_index
+from deepface_scripts.embedding_engine import get_engine
+from deepface_scripts.face_detector import get_detector
+from deepface_scripts.embed_utils import EMBEDDINGS_PATH
+from deepface_scripts.embedding_store import get_store
+from deepface_scripts.embedding_cache import reset_cached_engine
+from deepface_scripts.gallery_events import GalleryWatcher
+from deepface_scripts.sharded_gallery import ShardedMatcher, GALLERY_SHARDS, SHARD_CORES
+from deepface_scripts.pipeline import RecognitionPipeline
+from deepface_scripts.recognition_client import SERVICE_HOST, SERVICE_PORT, SERVICE_URL
+from deepface_scripts.recognize_from_camera import (capture_images, recognize_images, make_face_cropper,
+                                                   recognition_engine, log_event)
+
+NUM_IMAGES = 10
+PIPELINED = True  # Overlap capture/detect/embed/match on separate threads
+
+
+class RecognitionService:
+    """Keeps Res10, ArcFace and the gallery matrix resident between door attempts."""
+
+    def __init__(self, num_images: int = NUM_IMAGES, pipelined: bool = PIPELINED, shards: int = GALLERY_SHARDS):
+        self.num_images = num_images
+        self.pipelined = pipelined
+        self.shards = shards
+        self.sharded = None
+        self.pipeline = None
+        self.state = "starting"
+        self.error = None
+        self.detector = None
+        self.matcher = None
+        self.gallery_version = None
+        self.gallery_lock = threading.Lock()
+        self.watcher = None
+        self.started_at = time.time()
+        self.ready_at = None
+        self.requests_served = 0
+        self.last_result = None
+        self.last_latency_ms = None
+        # Res10 and the Keras graph are not safe to drive from several threads
+        self.lock = threading.Lock()
+
+    def load(self):
+        """Load both models, build the gallery and run one warm-up inference."""
+        try:
+            self.state = "loading"
+            if self.shards > 1:
+                # Fork the shard workers before TensorFlow starts its threads
+                self.sharded = ShardedMatcher(self.shards, SHARD_CORES)
+            log_event("Recognition service loading the face detector and ArcFace")
+            self.detector = get_detector()
+            get_engine()
+            self.reload_gallery()
+            self.warm_up()
+            if self.pipelined:
+                crop_face, tracker = make_face_cropper(self.detector)
+                self.pipeline = RecognitionPipeline(self.matcher, crop_face, recognition_engine(), tracker=tracker)
+            self.watcher = GalleryWatcher(EMBEDDINGS_PATH, lambda version: self.sync_gallery()).start(self.gallery_version)
+            self.ready_at = time.time()
+            self.state = "ready"
+            log_event(f"Recognition service ready in {self.ready_at - self.started_at:.2f}s")
+        except Exception as e:
+            self.state = "error"
+            self.error = str(e)
+            log_event(f"[ERROR] Recognition service failed to load: {str(e)}")
+
+    def warm_up(self):
+        """Push one dummy frame through the detector and ArcFace so the first attempt is not cold."""
+        dummy = np.zeros((300, 300, 3), dtype=np.uint8)
+        self.detector.warm_up()
+        get_engine().represent([dummy])
+
+    def reload_gallery(self) -> int:
+        """Re-read the whole embedding store into the resident gallery matrix."""
+        store = get_store(EMBEDDINGS_PATH)
+        with self.gallery_lock:
+            with store.exclusive():
+                version = store.version
+                matcher = self._attach_index(GalleryMatcher(*store.arrays()))
+            self._swap_matcher(matcher, version)
+        log_event(f"Gallery v{version} loaded: {len(self.matcher)} samples for {len(self.matcher.users)} users")
+        return len(self.matcher.users)
+
+    def sync_gallery(self) -> bool:
+        """Apply only the users changed since the resident gallery version, if any.
+
+        Falls back to a full reload when the store has been compacted past
+        our version. Called by the gallery watcher and before each attempt.
+        """
+        store = get_store(EMBEDDINGS_PATH)
+        with self.gallery_lock:
+            # Under the writer lock so the matcher and its index see one version
+            with store.exclusive():
+                version = store.version
+                if version == self.gallery_version:
+                    return False
+                changes = store.changes_since(self.gallery_version) if self.matcher is not None else None
+                if changes is None:
+                    matcher = GalleryMatcher(*store.arrays())
+                    log_event(f"Gallery v{version}: full reload ({len(matcher.users)} users)")
+                else:
+                    matcher = self.matcher.updated(changes)
+                    log_event(f"Gallery v{self.gallery_version} -> v{version}: applied {len(changes)} user changes")
+                matcher = self._attach_index(matcher)
+            self._swap_matcher(matcher, version)
+            return True
+
+    def _attach_index(self, matcher: GalleryMatcher) -> GalleryMatcher:
+        """Bring the on-disk IVF index up to date and search it, for galleries large enough to use it.
+
+        Must run under the store's writer lock, so the index reflects the
+        same version as `matcher`. Below ANN_MIN_SAMPLES the index is not
+        maintained here (`python -m deepface_scripts.ann_index sync` updates it).
+        """
+        if len(matcher) >= ANN_MIN_SAMPLES:
+            try:
+                matcher.index = sync_index(EMBEDDINGS_PATH)
+            except Exception as e:
+                log_event(f"[ERROR] ANN index sync failed, using exact search: {str(e)}")
+        return matcher
+
+    def _swap_matcher(self, matcher: GalleryMatcher, version: int):
+        # Waits for an attempt in progress so its decision never sees two galleries
+        with self.lock:
+            if self.sharded is not None:
+                matcher = self.sharded.load(matcher)
+            self.matcher = matcher
+            self.gallery_version = version
+            if self.pipeline is not None:
+                self.pipeline.matcher = matcher
+            reset_cached_engine()
+
+    def recognize(self) -> Dict[str, Any]:
+        """Recognise the person at the door with the resident models."""
+        if self.state != "ready":
+            return {"match": False, "name": "error", "error": f"Service not ready ({self.state})"}
+        start = time.time()
+        try:
+            self.sync_gallery()
+        except Exception as e:
+            log_event(f"[ERROR] Gallery sync failed: {str(e)}")
+        with self.lock:
+            if not len(self.matcher):
+                result = {"match": False, "name": "unknown"}
+            elif self.pipeline is not None:
+                result = self.pipeline.recognize()
+            else:
+                result = self.recognize_burst()
+        self.last_latency_ms = (time.time() - start) * 1000
+        self.requests_served += 1
+        self.last_result = result
+        return result
+
+    def recognize_burst(self) -> Dict[str, Any]:
+        """Capture a fixed burst first, then process it (non-pipelined path)."""
+        images = capture_images(num_images=self.num_images)
+        if not images:
+            return {"match": False, "name": "error", "error": "No images captured"}
+        return recognize_images(images, self.detector, self.matcher)
+
+    def cache_stats(self) -> Optional[Dict[str, Any]]:
+        engine = recognition_engine() if self.state == "ready" else None
+        return engine.stats() if hasattr(engine, "stats") else None
+
+    def health(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "ready": self.state == "ready",
+            "error": self.error,
+            "uptime_s": round(time.time() - self.started_at, 1),
+            "startup_s": round(self.ready_at - self.started_at, 2) if self.ready_at else None,
+            "gallery_version": self.gallery_version,
+            "gallery_users": len(self.matcher.users) if self.matcher else 0,
+            "gallery_samples": len(self.matcher) if self.matcher else 0,
+            "gallery_shards": self.shards,
+            "requests_served": self.requests_served,
+            "last_latency_ms": self.last_latency_ms,
+            "pipeline": self.pipeline.stats() if self.pipeline is not None else None,
+            "embedding_cache": self.cache_stats(),
+        }
+
+
+service = RecognitionService()
+
+
+class RecognitionHandler(server.BaseHTTPRequestHandler):
+    def _send_json(self, status, payload):
+        content = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", len(content))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send_json(200, service.health())
+        elif self.path == "/ready":
+            self._send_json(200 if service.state == "ready" else 503, {"ready": service.state == "ready", "state": service.state})
+        else:
+            self.send_error(404)
+
+    def do_POST(self):
+        if self.path == "/recognize":
+            self._send_json(200, service.recognize())
+        elif self.path == "/reload":
+            try:
+                self._send_json(200, {"success": True, "users": service.reload_gallery()})
+            except Exception as e:
+                self._send_json(500, {"success": False, "error": str(e)})
+        else:
+            self.send_error(404)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class RecognitionServer(ThreadingMixIn, server.HTTPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+if __name__ == "__main__":
+    # Serve health immediately; /ready flips once the models are warm
+    threading.Thread(target=service.load, daemon=True).start()
+    httpd = RecognitionServer((SERVICE_HOST, SERVICE_PORT), RecognitionHandler)
+    log_event(f"Recognition service listening on {SERVICE_URL}")
+    try:
+        httpd.serve_forever()
+    finally:
+        httpd.server_close()
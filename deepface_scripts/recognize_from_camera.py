@@ -1,18 +1,25 @@
 import logging
 import time
-import pickle
-import cv2
 import numpy as np
 from collections import deque
-from deepface import DeepFace
-from scipy.spatial.distance import cosine
-from typing import Dict, Any, List, Optional
+from typing import Callable, Dict, Any, List, Optional, Tuple
 from datetime import datetime
+from deepface_scripts.gallery import GalleryMatcher, EMBEDDING_DIM
+from deepface_scripts.embedding_engine import get_engine
+from deepface_scripts.embedding_cache import get_cached_engine, reset_cached_engine
+from deepface_scripts.sequential_decision import SequentialDecision
+from deepface_scripts.frame_source import capture_frames
+from deepface_scripts.face_tracker import FaceTracker
+from deepface_scripts.face_detector import DETECTOR_BACKEND, as_detector, get_detector
+from deepface_scripts.embedding_store import get_store
+from deepface_scripts.embed_utils import EMBEDDINGS_PATH
 
 # Constants
 TIMEOUT_SECONDS = 30
-CAPTURE_DEVICE = 0  # Default camera index
-EMBEDDING_FILE = "face_embedding.pkl"
+DECISION_MODE = "sequential"  # "sequential" (early exit) or "vote" (fixed 10-frame majority)
+SEQUENTIAL_BATCH = 2  # Crops embedded together between sequential decision checks
+TRACK_FACES = True  # Track the face box between frames instead of running Res10 on every frame
+CACHE_EMBEDDINGS = True  # Reuse embeddings for near-duplicate crops (person standing still)
 
 # Setup logging (consistent with your system)
 logging.basicConfig(filename="/home/salah/doorLockGui/Blynk/door_logs.txt", level=logging.INFO, format="[%(asctime)s] %(message)s")
@@ -22,91 +29,65 @@ def log_event(message: str):
     logging.info(message)
 
 def load_res10_model() -> Optional[Any]:
-    """Load the Res10 face detection model."""
+    """Load the face detector (the configured face_detector backend, Res10 by default)."""
     try:
-        log_event("Loading Res10 face detector")
-        proto_path = "deploy.prototxt"
-        model_path = "res10_300x300_ssd_iter_140000.caffemodel"
-        if not os.path.exists(proto_path) or not os.path.exists(model_path):
-            log_event("[ERROR] Res10 model files not found")
-            return None
-        net = cv2.dnn.readNetFromCaffe(proto_path, model_path)
-        log_event("Res10 model loaded successfully")
-        return net
+        log_event(f"Loading {DETECTOR_BACKEND} face detector")
+        detector = get_detector(DETECTOR_BACKEND)
+        log_event("Face detector loaded successfully")
+        return detector
     except Exception as e:
-        log_event(f"[ERROR] Failed to load Res10 model: {str(e)}")
+        log_event(f"[ERROR] Failed to load face detector: {str(e)}")
         return None
 
+def detect_face_box(image: np.ndarray, detector: Any) -> Optional[Tuple[int, int, int, int]]:
+    """Return the most confident face box as (x, y, w, h), clipped to the image, or None."""
+    return as_detector(detector).best_box(image)
+
 def face_cropped(image: np.ndarray, detector: Any) -> Optional[np.ndarray]:
     """Crop the detected face from an image using the Res10 detector."""
     try:
         if not isinstance(image, np.ndarray) or image.size == 0:
             log_event("[ERROR] Invalid input image for face cropping")
             return None
-        h, w = image.shape[:2]
-        blob = cv2.dnn.blobFromImage(cv2.resize(image, (300, 300)), 1.0, (300, 300), (104.0, 177.0, 123.0))
-        detector.setInput(blob)
-        detections = detector.forward()
-        confidence_threshold = 0.5
-        for i in range(detections.shape[2]):
-            confidence = detections[0, 0, i, 2]
-            if confidence > confidence_threshold:
-                box = detections[0, 0, i, 3:7] * np.array([w, h, w, h])
-                (startX, startY, endX, endY) = box.astype("int")
-                startX, startY = max(0, startX), max(0, startY)
-                endX, endY = min(w - 1, endX), min(h - 1, endY)
-                face = image[startY:endY, startX:endX]
-                if face.size == 0:
-                    log_event("[ERROR] Cropped face is empty")
-                    return None
-                log_event("Face cropped successfully")
-                return face
-        log_event("No face detected in image")
-        return None
+        box = detect_face_box(image, detector)
+        if box is None:
+            log_event("No face detected in image")
+            return None
+        x, y, w, h = box
+        face = image[y:y + h, x:x + w]
+        if face.size == 0:
+            log_event("[ERROR] Cropped face is empty")
+            return None
+        log_event("Face cropped successfully")
+        return face
     except Exception as e:
         log_event(f"[ERROR] Face cropping failed: {str(e)}")
         return None
 
 def capture_images(num_images: int = 10) -> List[np.ndarray]:
-    """Capture a specified number of images from the default camera."""
+    """Grab the next num_images fresh frames from the shared, already-open frame source."""
     try:
         log_event(f"Capturing {num_images} images")
-        cap = cv2.VideoCapture(CAPTURE_DEVICE)
-        if not cap.isOpened():
-            log_event("[ERROR] Failed to open capture device")
+        frames = capture_frames(num_images)
+        if not frames:
+            log_event("[ERROR] No frames from frame source")
             return []
-        images = []
-        for _ in range(num_images):
-            ret, frame = cap.read()
-            if not ret or frame is None:
-                log_event("[ERROR] Failed to capture frame")
-                continue
-            images.append(frame)
-            time.sleep(0.1)  # Brief delay between captures
-        cap.release()
-        log_event(f"Captured {len(images)} images")
-        return images
+        log_event(f"Captured {len(frames)} images, newest {time.time() - frames[-1].timestamp:.3f}s old")
+        return [f.image for f in frames]
     except Exception as e:
         log_event(f"[ERROR] Image capture failed: {str(e)}")
         return []
 
-def load_embeddings() -> List[Dict[str, Any]]:
-    """Load face embeddings from face_embedding.pkl."""
+def load_gallery() -> Tuple[List[str], np.ndarray]:
+    """Load (user_ids, vectors) from the memory-mapped embedding store."""
     try:
-        log_event("Loading embeddings from face_embedding.pkl")
-        with open(EMBEDDING_FILE, "rb") as f:
-            embeddings = pickle.load(f)
-        if not isinstance(embeddings, list):
-            log_event(f"[ERROR] Invalid embeddings format: expected list, got {type(embeddings)}")
-            return []
-        log_event(f"Loaded {len(embeddings)} embeddings")
-        return embeddings
-    except FileNotFoundError:
-        log_event("No face_embedding.pkl found, returning empty list")
-        return []
+        log_event(f"Loading embeddings from {EMBEDDINGS_PATH}")
+        user_ids, vectors = get_store(EMBEDDINGS_PATH).arrays()
+        log_event(f"Loaded {len(user_ids)} embeddings")
+        return user_ids, vectors
     except Exception as e:
         log_event(f"[ERROR] Failed to load embeddings: {str(e)}")
-        return []
+        return [], np.zeros((0, EMBEDDING_DIM), dtype=np.float32)
 
 def process_face_recognition() -> Dict[str, Any]:
     """Process face recognition from captured images.
@@ -140,112 +121,172 @@ def process_face_recognition() -> Dict[str, Any]:
     # Load embeddings
     try:
         log_event("Loading embeddings")
-        embeddings = load_embeddings()
-        log_event(f"Loaded {len(embeddings)} embeddings")
-        if not embeddings:
+        user_ids, vectors = load_gallery()
+        if not user_ids:
             log_event("No embeddings available, returning unknown")
             return {"match": False, "name": "unknown"}
-        # Validate embedding format
-        for e in embeddings:
-            if not isinstance(e, dict) or "user_id" not in e or "embeddings" not in e:
-                log_event(f"[ERROR] Invalid embedding format: {e}")
-                return {"match": False, "name": "error", "error": "Invalid embedding format"}
-            if not isinstance(e["embeddings"], list) or not e["embeddings"]:
-                log_event(f"[ERROR] Empty or invalid embeddings list for user {e.get('user_id', 'unknown')}")
-                return {"match": False, "name": "error", "error": "Invalid embeddings list"}
-            # Extract the first embedding entry
-            emb_entry = e["embeddings"][0]
-            if not isinstance(emb_entry, dict) or "embedding" not in emb_entry:
-                log_event(f"[ERROR] Invalid embedding entry for user {e.get('user_id', 'unknown')}: {emb_entry}")
-                return {"match": False, "name": "error", "error": "Invalid embedding entry"}
-            if not isinstance(emb_entry["embedding"], (list, np.ndarray)) or len(emb_entry["embedding"]) != 512:
-                log_event(f"[ERROR] Invalid embedding size for user {e.get('user_id', 'unknown')}: {len(emb_entry['embedding']) if isinstance(emb_entry['embedding'], (list, np.ndarray)) else type(emb_entry['embedding'])}")
-                return {"match": False, "name": "error", "error": "Invalid embedding size"}
+        # Validate embedding format and build the gallery matrix once per attempt
+        try:
+            matcher = GalleryMatcher(user_ids, vectors)
+        except ValueError as e:
+            log_event(f"[ERROR] Invalid embedding format: {str(e)}")
+            return {"match": False, "name": "error", "error": "Invalid embedding format"}
+        log_event(f"Gallery matrix built: {len(matcher)} samples for {len(matcher.users)} users")
     except Exception as e:
         log_event(f"[ERROR] Failed to load embeddings: {str(e)}")
         return {"match": False, "name": "error", "error": f"Embeddings load failed: {str(e)}"}
 
+    return recognize_images(images, detector, matcher)
+
+def publish_result(result: Dict[str, Any]):
+    """Log the final result and publish it to MQTT when a client is available."""
+    log_event(f"Face recognition result: {result}")
+    # Publish to MQTT (assuming global client)
+    try:
+        client.publish("smartlock/logs", f"{datetime.now()} - Face recognition result: {result}")
+        log_event("Published face recognition result to MQTT topic smartlock/logs")
+    except NameError:
+        log_event("[WARNING] MQTT client not defined, skipping publish")
+
+def make_face_cropper(detector: Any, track: bool = TRACK_FACES) -> Tuple[Callable, Optional[FaceTracker]]:
+    """Return a frame -> crop function (detect-then-track when enabled) and its tracker."""
+    if not track:
+        return (lambda image: face_cropped(image, detector)), None
+    tracker = FaceTracker(lambda image: detect_face_box(image, detector))
+    return tracker.crop, tracker
+
+def detect_face(frame: Any, idx: int, crop_face: Callable) -> Optional[np.ndarray]:
+    """Validate one frame and return its face crop, or None."""
+    if not isinstance(frame, np.ndarray) or frame.size == 0:
+        log_event(f"[ERROR] Invalid frame for image {idx}: shape {frame.shape if isinstance(frame, np.ndarray) else type(frame)}")
+        return None
+    log_event(f"Processing image {idx}, shape: {frame.shape}")
+    try:
+        cropped = crop_face(frame)
+        if cropped is None:
+            log_event(f"⚠️ No face detected in image {idx}")
+            return None
+        if not isinstance(cropped, np.ndarray) or cropped.size == 0:
+            log_event(f"[ERROR] Invalid cropped image for image {idx}: shape {cropped.shape if isinstance(cropped, np.ndarray) else type(cropped)}")
+            return None
+        return cropped
+    except Exception as e:
+        log_event(f"[ERROR] Face cropping failed for image {idx}: {str(e)}")
+        return None
+
+def recognize_images(images: List[np.ndarray], detector: Any, matcher: GalleryMatcher,
+                     mode: str = DECISION_MODE) -> Dict[str, Any]:
+    """Run detection, embedding and matching over captured images with already-loaded models.
+
+    In "sequential" mode frames are embedded a few at a time and the attempt
+    stops as soon as the evidence is conclusive; "vote" embeds every crop as
+    one batch and takes the 10-frame majority.
+
+    Returns:
+        Dict[str, Any]: Result with match status, name, and optional error.
+    """
+    try:
+        reset_cached_engine()  # Embeddings never carry over from an earlier attempt
+        crop_face, tracker = make_face_cropper(detector)
+        if mode == "sequential":
+            result = recognize_sequential(images, crop_face, matcher)
+        else:
+            result = recognize_by_vote(images, crop_face, matcher)
+        if tracker is not None:
+            log_event(f"Face tracker stats: {tracker.stats()}")
+        if CACHE_EMBEDDINGS:
+            log_event(f"Embedding cache stats: {get_cached_engine().stats()}")
+        return result
+    except Exception as e:
+        log_event(f"[ERROR] Face recognition failed: {str(e)}")
+        return {"match": False, "name": "error", "error": str(e)}
+
+def recognition_engine() -> Any:
+    """Engine used for recognition crops: the shared ArcFace engine, behind the crop cache if enabled."""
+    return get_cached_engine() if CACHE_EMBEDDINGS else get_engine()
+
+def recognize_sequential(images: List[np.ndarray], crop_face: Callable, matcher: GalleryMatcher) -> Dict[str, Any]:
+    """Early-exit recognition: stop once a match or reject bound is reached, or the budget runs out."""
+    decision = SequentialDecision(matcher.users, max_frames=len(images), time_budget=TIMEOUT_SECONDS,
+                                  threshold=matcher.threshold)
+    pending = []
+
+    def flush():
+        embeddings = recognition_engine().represent(pending)
+        pending.clear()
+        for emb in embeddings:
+            outcome = decision.update(matcher.user_distances(emb)[0])
+            log_event(f"Sequential evidence after {decision.frames_used} frames: best llr {decision.llr.max():.2f}")
+            if outcome:
+                return outcome
+        return None
+
+    for idx, frame in enumerate(images, 1):
+        if decision.time_budget is not None and decision.elapsed() >= decision.time_budget:
+            log_event("Timeout reached during processing")
+            break
+        cropped = detect_face(frame, idx, crop_face)
+        if cropped is None:
+            continue
+        pending.append(cropped)
+        if len(pending) >= SEQUENTIAL_BATCH:
+            outcome = flush()
+            if outcome:
+                publish_result(outcome)
+                return outcome
+
+    outcome = flush() if pending else None
+    if outcome is None:
+        timed_out = decision.time_budget is not None and decision.elapsed() >= decision.time_budget
+        outcome = decision.finish("time_budget" if timed_out else "no_more_frames")
+    publish_result(outcome)
+    return outcome
+
+def recognize_by_vote(images: List[np.ndarray], crop_face: Callable, matcher: GalleryMatcher) -> Dict[str, Any]:
+    """Fixed-burst recognition: embed every crop and take the 10-frame majority vote."""
     buffer = deque(maxlen=10)
     start = time.time()
 
-    try:
-        for idx, frame in enumerate(images, 1):
-            if time.time() - start >= TIMEOUT_SECONDS:
-                log_event("Timeout reached during processing")
-                break
-
-            # Validate frame
-            if not isinstance(frame, np.ndarray) or frame.size == 0:
-                log_event(f"[ERROR] Invalid frame for image {idx}: shape {frame.shape if isinstance(frame, np.ndarray) else type(frame)}")
-                continue
-
-            log_event(f"Processing image {idx}/{len(images)}, shape: {frame.shape}")
-            try:
-                cropped = face_cropped(frame, detector)
-                if cropped is None:
-                    log_event(f"⚠️ No face detected in image {idx}")
-                    continue
-                if not isinstance(cropped, np.ndarray) or cropped.size == 0:
-                    log_event(f"[ERROR] Invalid cropped image for image {idx}: shape {cropped.shape if isinstance(cropped, np.ndarray) else type(cropped)}")
-                    continue
-            except Exception as e:
-                log_event(f"[ERROR] Face cropping failed for image {idx}: {str(e)}")
-                continue
-
-            try:
-                log_event(f"Face detected in image {idx}, running DeepFace embedding")
-                result = DeepFace.represent(
-                    img_path=cropped,
-                    model_name="ArcFace",
-                    enforce_detection=False,
-                    detector_backend="opencv"
-                )
-                log_event(f"DeepFace output: {result}")
-                if not isinstance(result, list) or not result or "embedding" not in result[0]:
-                    log_event(f"[ERROR] Invalid DeepFace output format for image {idx}: {result}")
-                    continue
-                current_emb = result[0]["embedding"]
-                if not isinstance(current_emb, (list, np.ndarray)) or len(current_emb) != 512:
-                    log_event(f"[ERROR] Invalid embedding size for image {idx}: {len(current_emb) if isinstance(current_emb, (list, np.ndarray)) else type(current_emb)}")
-                    continue
-            except Exception as e:
-                log_event(f"[ERROR] DeepFace embedding failed for image {idx}: {str(e)}")
-                continue
-
-            try:
-                matched_label = "unknown"
-                best_distance = float("inf")
-                for e in embeddings:
-                    # Use the embedding from the nested structure
-                    emb = e["embeddings"][0]["embedding"]
-                    dist = cosine(current_emb, emb)
-                    if dist < 0.4 and dist < best_distance:
-                        best_distance = dist
-                        matched_label = e["user_id"]
-                buffer.append(matched_label)
-                log_event(f"Buffer: {list(buffer)}")
-            except Exception as e:
-                log_event(f"[ERROR] Cosine distance calculation failed for image {idx}: {str(e)}")
-                continue
-
-            if len(buffer) == buffer.maxlen:
-                final = max(set(buffer), key=buffer.count)
-                result = {
-                    "match": final != "unknown",
-                    "name": final
-                }
-                log_event(f"Face recognition result: {result}")
-                # Publish to MQTT (assuming global client)
-                try:
-                    client.publish("smartlock/logs", f"{datetime.now()} - Face recognition result: {result}")
-                    log_event("Published face recognition result to MQTT topic smartlock/logs")
-                except NameError:
-                    log_event("[WARNING] MQTT client not defined, skipping publish")
-                return result
-
-        log_event("Timeout reached or no valid faces recognized")
+    crops = []
+    for idx, frame in enumerate(images, 1):
+        if time.time() - start >= TIMEOUT_SECONDS:
+            log_event("Timeout reached during processing")
+            break
+        cropped = detect_face(frame, idx, crop_face)
+        if cropped is not None:
+            crops.append(cropped)
+
+    if not crops:
+        log_event("No faces detected in captured images")
         return {"match": False, "name": "unknown"}
 
+    try:
+        log_event(f"Faces detected in {len(crops)} images, running batched ArcFace embedding")
+        embeddings = recognition_engine().represent(crops)
     except Exception as e:
-        log_event(f"[ERROR] Face recognition failed: {str(e)}")
-        return {"match": False, "name": "error", "error": str(e)}
\ No newline at end of file
+        log_event(f"[ERROR] ArcFace embedding failed: {str(e)}")
+        return {"match": False, "name": "error", "error": str(e)}
+
+    for idx, current_emb in enumerate(embeddings, 1):
+        try:
+            best = matcher.match(current_emb)
+            matched_label = best["user_id"] if best["match"] else "unknown"
+            buffer.append(matched_label)
+            log_event(f"Best match {best['user_id']} distance {best['distance']:.4f} margin {best['margin']:.4f}")
+            log_event(f"Buffer: {list(buffer)}")
+        except Exception as e:
+            log_event(f"[ERROR] Gallery matching failed for face {idx}: {str(e)}")
+            continue
+
+        if len(buffer) == buffer.maxlen:
+            final = max(set(buffer), key=buffer.count)
+            result = {
+                "match": final != "unknown",
+                "name": final,
+                "frames_used": len(buffer)
+            }
+            publish_result(result)
+            return result
+
+    log_event("Timeout reached or no valid faces recognized")
+    return {"match": False, "name": "unknown"}
@@ -0,0 +1,376 @@
+import argparse
+import base64
+import hashlib
+import hmac
+import io
+import json
+import os
+import threading
+import time
+import numpy as np
+import requests
+from typing import Any, Dict, Optional
+from deepface_scripts.embed_utils import EMBEDDINGS_PATH
+from deepface_scripts.embedding_store import get_store
+from deepface_scripts.embedding_repository import replace_gallery, replace_user, remove_user
+from deepface_scripts.gallery import EMBEDDING_DIM
+from deepface_scripts.gallery_events import BROKER, PORT, GALLERY_TOPIC
+
+PROFILES_PATH = os.path.join(os.path.dirname(__file__), "..", "backend", "utils", "user_profiles.json")
+REPLICA_FILE = "replica.json"  # Follower bookkeeping, kept inside the store directory
+SYNC_INTERVAL = 5.0  # Seconds between polls of the leader when no MQTT announcement arrives
+REQUEST_TIMEOUT = 10.0
+SERVE_PORT = 8010
+# Interface the standalone leader listens on; set to the LAN address followers
+# reach it on. The default only serves followers on this machine.
+SERVE_HOST = "127.0.0.1"
+# Shared secret of every unit in a deployment. Requests and responses carry an
+# HMAC-SHA256 of their content, so only units holding it can pull the gallery
+# and followers never apply data a leader did not sign. This authenticates but
+# does not encrypt: run replication over TLS or a VPN on untrusted networks.
+SECRET_ENV = "NEXUS_REPLICATION_SECRET"
+MAX_CLOCK_SKEW = 300  # Seconds a signed request stays valid
+TIME_HEADER = "X-Replication-Time"
+SIGNATURE_HEADER = "X-Replication-Signature"
+
+
+def load_secret(secret: Optional[str] = None) -> bytes:
+    """The replication secret (argument, else $NEXUS_REPLICATION_SECRET); replication refuses to run without one."""
+    secret = secret or os.environ.get(SECRET_ENV)
+    if not secret:
+        raise RuntimeError(f"Replication needs a shared secret: set {SECRET_ENV} on every unit")
+    return secret.encode()
+
+
+def sign(secret: bytes, *parts: str) -> str:
+    return hmac.new(secret, "\n".join(parts).encode(), hashlib.sha256).hexdigest()
+
+
+def request_signature(secret: bytes, timestamp: str, endpoint: str, since: Optional[int] = None) -> str:
+    return sign(secret, "request", timestamp, endpoint, "" if since is None else str(int(since)))
+
+
+def response_signature(secret: bytes, timestamp: str, body: bytes) -> str:
+    """Binds a response to the request timestamp, so an old response cannot be replayed."""
+    return sign(secret, "response", timestamp, hashlib.sha256(body).hexdigest())
+
+
+def verify_request(secret: bytes, timestamp: Optional[str], signature: Optional[str], endpoint: str,
+                   since: Optional[int] = None) -> bool:
+    """True if the request was signed with the shared secret within MAX_CLOCK_SKEW."""
+    try:
+        if abs(time.time() - float(timestamp)) > MAX_CLOCK_SKEW:
+            return False
+    except (TypeError, ValueError):
+        return False
+    return hmac.compare_digest(request_signature(secret, timestamp, endpoint, since), signature or "")
+
+
+def encode_vectors(vectors: np.ndarray) -> str:
+    """Little-endian float32 rows as base64 (a quarter of the size of the same floats as JSON text)."""
+    return base64.b64encode(np.ascontiguousarray(vectors, dtype="<f4").tobytes()).decode()
+
+
+def decode_vectors(data: str) -> np.ndarray:
+    return np.frombuffer(base64.b64decode(data), dtype="<f4").reshape(-1, EMBEDDING_DIM)
+
+
+def profiles_digest(profiles_path: Optional[str] = PROFILES_PATH) -> Optional[str]:
+    if not profiles_path or not os.path.exists(profiles_path):
+        return None
+    with open(profiles_path, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def read_profiles(profiles_path: Optional[str] = PROFILES_PATH) -> Optional[list]:
+    if not profiles_path or not os.path.exists(profiles_path):
+        return None
+    with open(profiles_path, "r") as f:
+        return json.load(f)
+
+
+def write_profiles(profiles: list, profiles_path: str = PROFILES_PATH):
+    tmp = profiles_path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(profiles, f, indent=2)
+    os.replace(tmp, profiles_path)
+
+
+def export_delta(since: Optional[int], path: str = EMBEDDINGS_PATH,
+                 profiles_path: Optional[str] = PROFILES_PATH) -> Dict[str, Any]:
+    """Users changed on this node after `since`, ready to send to a follower.
+
+    Each changed user maps to their current vectors and metadata, or None
+    if removed. "full" is True when the store's log no longer reaches back
+    to `since` (e.g. after a compaction); the follower must then fetch a
+    snapshot instead.
+    """
+    store = get_store(path)
+    # Under the writer lock so the version, changes and metadata are one state
+    with store.exclusive():
+        version = store.version
+        changes = store.changes_since(since) if since is not None else None
+        delta = {"version": version, "since": since, "full": changes is None,
+                 "profiles_digest": profiles_digest(profiles_path), "users": {}}
+        for user_id, vectors in (changes or {}).items():
+            if vectors is None:
+                delta["users"][user_id] = None
+            else:
+                delta["users"][user_id] = {"vectors": encode_vectors(vectors), "meta": store.user_meta(user_id)}
+    return delta
+
+
+def export_snapshot(path: str = EMBEDDINGS_PATH, profiles_path: Optional[str] = PROFILES_PATH) -> bytes:
+    """The whole gallery plus user profiles as one .npz blob for bootstrapping a node."""
+    store = get_store(path)
+    buffer = io.BytesIO()
+    # Under the writer lock so the version, rows and metadata are one state
+    with store.exclusive():
+        version = store.version
+        user_ids, vectors = store.arrays()
+        users = [[uid, store.user_meta(uid)] for uid in store.user_ids()]
+        np.savez(buffer, version=np.int64(version), user_ids=np.asarray(user_ids, dtype=str),
+                 vectors=np.asarray(vectors, dtype=np.float32).reshape(-1, EMBEDDING_DIM),
+                 users=np.asarray(json.dumps(users)), profiles=np.asarray(json.dumps(read_profiles(profiles_path))))
+    return buffer.getvalue()
+
+
+def import_snapshot(data: bytes, path: str = EMBEDDINGS_PATH,
+                    profiles_path: Optional[str] = PROFILES_PATH) -> int:
+    """Replace this node's gallery (and profiles, if the snapshot has them); returns the snapshot's version."""
+    with np.load(io.BytesIO(data), allow_pickle=False) as snapshot:
+        labels = snapshot["user_ids"]
+        vectors = snapshot["vectors"]
+        # One sort groups every user's rows, instead of a full scan per user
+        order = np.argsort(labels, kind="stable")
+        names, starts = np.unique(labels[order], return_index=True)
+        bounds = dict(zip(names.tolist(), zip(starts, list(starts[1:]) + [len(order)])))
+        entries = []
+        for user_id, meta in json.loads(str(snapshot["users"])):
+            start, stop = bounds.get(user_id, (0, 0))
+            samples = [{"user_id": user_id, "embedding": v} for v in vectors[order[start:stop]]]
+            entries.append({**meta, "user_id": user_id, "embeddings": samples})
+        profiles = json.loads(str(snapshot["profiles"]))
+        version = int(snapshot["version"])
+    replace_gallery(entries, path)
+    if profiles is not None and profiles_path:
+        write_profiles(profiles, profiles_path)
+    return version
+
+
+class ReplicationFollower:
+    """Keeps this node's gallery and profiles in step with a leader node.
+
+    Pulls deltas from the leader's HTTP endpoints and applies only the
+    changed users through embedding_repository (so the local ANN index and
+    recognition service follow). Falls back to a snapshot when the leader
+    says the delta is unavailable or this node's store was edited locally.
+    A retained MQTT announcement from the leader's broker triggers an
+    immediate pull; otherwise the leader is polled every `interval` seconds.
+    Every request is signed and every response verified with the shared
+    secret before anything is applied. Followers are read-only: enroll at
+    the leader.
+    """
+
+    def __init__(self, leader_url: str, path: str = EMBEDDINGS_PATH,
+                 profiles_path: Optional[str] = PROFILES_PATH, interval: float = SYNC_INTERVAL,
+                 broker: Optional[str] = None, port: int = PORT, secret: Optional[str] = None):
+        self.secret = load_secret(secret)
+        self.leader_url = leader_url.rstrip("/")
+        self.path = path
+        self.profiles_path = profiles_path
+        self.interval = interval
+        self.broker = broker
+        self.port = port
+        self.store = get_store(path)
+        self.state_path = os.path.join(self.store.root, REPLICA_FILE)
+        self.client = None
+        self._wake = threading.Event()
+        self._running = False
+        self._thread = None
+
+    def load_state(self) -> Dict[str, Any]:
+        try:
+            with open(self.state_path, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save_state(self, state: Dict[str, Any]):
+        os.makedirs(self.store.root, exist_ok=True)
+        tmp = self.state_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp, self.state_path)
+
+    def _get(self, endpoint: str, since: Optional[int] = None) -> requests.Response:
+        """Signed GET of a leader endpoint; raises unless the response carries the leader's signature."""
+        timestamp = str(time.time())
+        headers = {TIME_HEADER: timestamp,
+                   SIGNATURE_HEADER: request_signature(self.secret, timestamp, endpoint, since)}
+        params = {"since": since} if since is not None else {}
+        response = requests.get(f"{self.leader_url}/{endpoint}", params=params, headers=headers,
+                                timeout=REQUEST_TIMEOUT)
+        response.raise_for_status()
+        expected = response_signature(self.secret, timestamp, response.content)
+        if not hmac.compare_digest(expected, response.headers.get(SIGNATURE_HEADER, "")):
+            raise ValueError(f"Unsigned or tampered response from {self.leader_url}/{endpoint}")
+        return response
+
+    def sync(self) -> Dict[str, Any]:
+        """Pull and apply whatever changed on the leader; returns what was done."""
+        state = self.load_state()
+        since = state.get("leader_version")
+        if state.get("local_version") != self.store.version:
+            since = None  # Local edits since the last sync: only a snapshot restores a faithful copy
+        delta = self._get("delta", since).json() if since is not None else {"full": True}
+
+        if delta.get("full"):
+            version = import_snapshot(self._get("snapshot").content, self.path, self.profiles_path)
+            state = {"leader_version": version, "profiles_digest": profiles_digest(self.profiles_path)}
+            result = {"mode": "snapshot", "version": version, "users": len(self.store.user_ids())}
+        else:
+            for user_id, change in delta["users"].items():
+                if change is None:
+                    remove_user(user_id, self.path)
+                else:
+                    replace_user(user_id, decode_vectors(change["vectors"]), change.get("meta"), self.path)
+            if self.profiles_path and delta.get("profiles_digest") not in (None, state.get("profiles_digest")):
+                write_profiles(self._get("profiles").json()["profiles"], self.profiles_path)
+                state["profiles_digest"] = delta["profiles_digest"]
+            state["leader_version"] = delta["version"]
+            result = {"mode": "delta", "version": delta["version"], "users": len(delta["users"])}
+        state["local_version"] = self.store.version
+        self.save_state(state)
+        return result
+
+    def start(self) -> "ReplicationFollower":
+        self._running = True
+        if self.broker:
+            self._connect_mqtt()
+        self._thread = threading.Thread(target=self._run, name="replication-follower", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._running = False
+        self._wake.set()
+        if self.client is not None:
+            self.client.loop_stop()
+            self.client.disconnect()
+
+    def _connect_mqtt(self):
+        try:
+            import paho.mqtt.client as mqtt
+            self.client = mqtt.Client(client_id=f"replication_follower_{int(time.time())}")
+            self.client.on_connect = lambda client, userdata, flags, rc: client.subscribe(GALLERY_TOPIC, qos=1)
+            self.client.on_message = lambda client, userdata, msg: self._wake.set()
+            self.client.connect(self.broker, self.port, 60)
+            self.client.loop_start()
+        except Exception as e:
+            print(f"[WARNING] Replication follower polling without MQTT: {str(e)}")
+            self.client = None
+
+    def _run(self):
+        while self._running:
+            try:
+                result = self.sync()
+                if result["mode"] == "snapshot" or result["users"]:
+                    print(f"[INFO] Replicated {result['mode']} to leader version {result['version']} ({result['users']} users)")
+            except Exception as e:
+                print(f"[ERROR] Replication from {self.leader_url} failed: {str(e)}")
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+
+def serve(port: int = SERVE_PORT, path: str = EMBEDDINGS_PATH, profiles_path: Optional[str] = PROFILES_PATH,
+          host: str = SERVE_HOST, secret: Optional[str] = None):
+    """Minimal leader endpoints (/delta, /snapshot, /profiles) for nodes without the GUI backend."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from urllib.parse import parse_qs, urlparse
+    key = load_secret(secret)
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            since = parse_qs(url.query).get("since", [None])[0]
+            try:
+                since = int(since) if since else None
+            except ValueError:
+                self.send_error(400)
+                return
+            timestamp = self.headers.get(TIME_HEADER)
+            if url.path in ("/delta", "/snapshot", "/profiles") and not verify_request(
+                    key, timestamp, self.headers.get(SIGNATURE_HEADER), url.path.strip("/"), since):
+                self.send_error(401)
+                return
+            if url.path == "/delta":
+                body = json.dumps(export_delta(since, path, profiles_path)).encode()
+                content_type = "application/json"
+            elif url.path == "/snapshot":
+                body, content_type = export_snapshot(path, profiles_path), "application/octet-stream"
+            elif url.path == "/profiles":
+                body = json.dumps({"profiles": read_profiles(profiles_path)}).encode()
+                content_type = "application/json"
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header(SIGNATURE_HEADER, response_signature(key, timestamp, body))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    print(f"[INFO] Serving gallery replication on {host}:{port}")
+    ThreadingHTTPServer((host, port), Handler).serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replicate the face gallery and user profiles between NEXUS units")
+    parser.add_argument("--path", default=EMBEDDINGS_PATH, help="Embeddings path (store lives next to it)")
+    parser.add_argument("--profiles", default=PROFILES_PATH, help="user_profiles.json to replicate ('' to skip)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    export = sub.add_parser("export", help="Write a snapshot of this node")
+    export.add_argument("file")
+    restore = sub.add_parser("import", help="Replace this node's gallery with a snapshot")
+    restore.add_argument("file")
+    leader = sub.add_parser("serve", help="Serve deltas and snapshots to followers")
+    leader.add_argument("--port", type=int, default=SERVE_PORT)
+    leader.add_argument("--host", default=SERVE_HOST, help="Interface to listen on (the LAN address followers use)")
+    follow = sub.add_parser("follow", help="Keep this node in sync with a leader")
+    follow.add_argument("leader_url", help="e.g. http://door-1:8000/replication or http://door-1:8010")
+    follow.add_argument("--interval", type=float, default=SYNC_INTERVAL)
+    follow.add_argument("--broker", default=None, help=f"Leader's MQTT broker for instant updates (e.g. {BROKER})")
+    follow.add_argument("--once", action="store_true", help="Sync once and exit")
+    args = parser.parse_args()
+    profiles_path = args.profiles or None
+
+    if args.command == "export":
+        with open(args.file, "wb") as f:
+            f.write(export_snapshot(args.path, profiles_path))
+        print(f"[INFO] Wrote snapshot of version {get_store(args.path).version} to {args.file}")
+    elif args.command == "import":
+        with open(args.file, "rb") as f:
+            version = import_snapshot(f.read(), args.path, profiles_path)
+        print(f"[INFO] Imported snapshot of version {version}")
+    elif args.command == "serve":
+        serve(args.port, args.path, profiles_path, args.host)
+    elif args.command == "follow":
+        follower = ReplicationFollower(args.leader_url, args.path, profiles_path, args.interval, args.broker)
+        if args.once:
+            print(f"[INFO] {follower.sync()}")
+            return
+        follower.start()
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            follower.stop()
+
+
+if __name__ == "__main__":
+    main()
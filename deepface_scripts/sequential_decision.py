@@ -0,0 +1,266 @@
+import argparse
+import json
+import math
+import os
+import time
+import numpy as np
+from collections import Counter
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from deepface_scripts.gallery import DEFAULT_TOP_K, MATCH_THRESHOLD, l2_normalize
+
+# Per-frame cosine distance models for ArcFace: genuine attempts cluster low,
+# impostors high. Used to turn each frame into a log-likelihood ratio. These
+# are fallbacks; `python -m deepface_scripts.sequential_decision fit` fits
+# them to the enrolled gallery and writes DISTANCE_MODEL_PATH, which is used
+# whenever it exists.
+GENUINE_MEAN = 0.25
+GENUINE_STD = 0.10
+IMPOSTOR_MEAN = 0.70
+IMPOSTOR_STD = 0.10
+DISTANCE_MODEL_PATH = "/home/salah/doorLockGui/deepface_scripts/face_embeddings.sprt.json"
+MIN_STD = 0.02  # Floor for fitted spreads, so a tight gallery cannot make single frames decisive
+# Target error rates; they set the Wald stopping bounds.
+FALSE_ACCEPT_RATE = 1e-4
+FALSE_REJECT_RATE = 1e-2
+# One frame never contributes more than this much evidence either way.
+MAX_FRAME_LLR = 8.0
+MIN_FRAMES = 3
+MAX_FRAMES = 10
+VOTE_FRAMES = 10  # Burst length of the fixed majority vote the test replaced
+EVAL_SAMPLES = 2000  # Stored samples used as probe frames when fitting and evaluating
+EVAL_TRIALS = 500  # Simulated genuine and impostor attempts per evaluation
+DEFAULT_MODEL = {"genuine_mean": GENUINE_MEAN, "genuine_std": GENUINE_STD,
+                 "impostor_mean": IMPOSTOR_MEAN, "impostor_std": IMPOSTOR_STD}
+
+_model_cache = {}
+
+
+def load_distance_model(path: str = DISTANCE_MODEL_PATH) -> Dict[str, float]:
+    """Fitted genuine/impostor distance model, or the built-in defaults if none was fitted."""
+    if not os.path.exists(path):
+        return dict(DEFAULT_MODEL)
+    mtime = os.stat(path).st_mtime_ns
+    cached = _model_cache.get(path)
+    if cached is None or cached[0] != mtime:
+        try:
+            with open(path) as f:
+                model = json.load(f)
+            cached = (mtime, {key: float(model[key]) for key in DEFAULT_MODEL})
+        except (OSError, ValueError, KeyError) as e:
+            print(f"[WARNING] Invalid distance model {path}, using defaults: {str(e)}")
+            cached = (mtime, dict(DEFAULT_MODEL))
+        _model_cache[path] = cached
+    return dict(cached[1])
+
+
+def sample_distances(user_ids: Sequence[str], vectors: np.ndarray, top_k: int = DEFAULT_TOP_K,
+                     max_samples: int = EVAL_SAMPLES, seed: int = 0) -> Tuple[np.ndarray, List[str], np.ndarray]:
+    """Leave-one-out distances of stored samples to every user, scored like GalleryMatcher.
+
+    Returns (probe labels, users, (probes, users) distances): each probe
+    sample's top-k mean cosine distance to every user, with the probe itself
+    left out of its own user. Probes whose user has no other sample get NaN
+    in their own column.
+    """
+    labels = np.asarray(user_ids, dtype=str)
+    users = sorted(set(labels.tolist()))
+    matrix = l2_normalize(np.asarray(vectors, dtype=np.float32))
+    probe = np.arange(len(labels))
+    if len(probe) > max_samples:
+        probe = np.sort(np.random.default_rng(seed).choice(len(labels), max_samples, replace=False))
+    sims = matrix[probe] @ matrix.T
+    sims[np.arange(len(probe)), probe] = -np.inf
+    distances = np.empty((len(probe), len(users)), dtype=np.float64)
+    for j, user in enumerate(users):
+        top = -np.sort(-sims[:, labels == user], axis=1)[:, :top_k]
+        finite = np.isfinite(top)
+        with np.errstate(invalid="ignore"):
+            distances[:, j] = 1.0 - np.where(finite, top, 0.0).sum(axis=1) / finite.sum(axis=1)
+    return labels[probe], users, distances
+
+
+def fit_distance_model(probe_labels: np.ndarray, users: Sequence[str], distances: np.ndarray) -> Dict[str, float]:
+    """Gaussian genuine/impostor models from leave-one-out gallery distances.
+
+    Genuine is each probe's distance to its own user; impostor is its
+    distance to the closest other user, the case a false accept comes from,
+    which makes the impostor model conservative.
+    """
+    column = {user: j for j, user in enumerate(users)}
+    own = np.array([column[label] for label in probe_labels], dtype=int)
+    rows = np.arange(len(own))
+    genuine = distances[rows, own]
+    others = distances.copy()
+    others[rows, own] = np.inf
+    impostor = others.min(axis=1) if others.shape[1] > 1 else np.array([])
+    genuine, impostor = genuine[np.isfinite(genuine)], impostor[np.isfinite(impostor)]
+    if len(genuine) < 2 or len(impostor) < 2:
+        raise ValueError("Need at least two users with two samples each to fit the distance model")
+    return {"genuine_mean": float(genuine.mean()), "genuine_std": max(MIN_STD, float(genuine.std())),
+            "impostor_mean": float(impostor.mean()), "impostor_std": max(MIN_STD, float(impostor.std())),
+            "genuine_samples": int(len(genuine)), "impostor_samples": int(len(impostor))}
+
+
+def vote_decision(distances: np.ndarray, users: Sequence[str], threshold: float = MATCH_THRESHOLD) -> Optional[str]:
+    """The fixed-burst rule: per-frame best user under the threshold, then the majority label."""
+    best = np.argmin(distances, axis=1)
+    labels = [users[b] if distances[i, b] < threshold else "unknown" for i, b in enumerate(best)]
+    final = Counter(labels).most_common(1)[0][0]
+    return None if final == "unknown" else final
+
+
+def evaluate_decisions(probe_labels: np.ndarray, users: Sequence[str], distances: np.ndarray,
+                       model: Optional[Dict[str, float]] = None, frames: int = VOTE_FRAMES,
+                       trials: int = EVAL_TRIALS, threshold: float = MATCH_THRESHOLD,
+                       seed: int = 0, **decision_kwargs) -> List[Dict[str, Any]]:
+    """FAR/FRR of the sequential test and of the old majority vote on simulated attempts.
+
+    A genuine attempt is `frames` held-out samples of one user against the
+    whole gallery and must be accepted as that user. An impostor attempt
+    is the same frames with that user's column removed, as if they were not
+    enrolled; any accept is a false accept.
+    """
+    rng = np.random.default_rng(seed)
+    users = list(users)
+    column = {user: j for j, user in enumerate(users)}
+    own = np.array([column[label] for label in probe_labels], dtype=int)
+    valid = np.isfinite(distances[np.arange(len(own)), own])
+    candidates = [u for u in users if valid[own == column[u]].any()]
+    stats = {name: {"fa": 0, "fr": 0, "frames": 0} for name in ("sequential", "vote")}
+    if not candidates or len(users) < 2:
+        raise ValueError("Need at least two users with two samples each to evaluate")
+    for _ in range(trials):
+        user = candidates[rng.integers(len(candidates))]
+        pool = np.flatnonzero((own == column[user]) & valid)
+        attempt = distances[rng.choice(pool, frames)]
+        others = [u for u in users if u != user]
+        impostor = np.delete(attempt, column[user], axis=1)
+        for genuine, frame_distances, names in ((True, attempt, users), (False, impostor, others)):
+            decision = SequentialDecision(names, model=model, max_frames=frames, threshold=threshold, **decision_kwargs)
+            result = None
+            for row in frame_distances:
+                result = decision.update(row)
+                if result:
+                    break
+            stats["sequential"]["frames"] += result["frames_used"]
+            stats["vote"]["frames"] += frames
+            for name, accepted in (("sequential", result["name"] if result["match"] else None),
+                                   ("vote", vote_decision(frame_distances, names, threshold))):
+                if genuine and accepted != user:
+                    stats[name]["fr"] += 1
+                if not genuine and accepted is not None:
+                    stats[name]["fa"] += 1
+    return [{"method": name, "far": s["fa"] / trials, "frr": s["fr"] / trials,
+             "mean_frames": s["frames"] / (2 * trials)} for name, s in stats.items()]
+
+
+class SequentialDecision:
+    """Accumulate per-frame distance evidence per user and stop as soon as it is conclusive.
+
+    Each frame adds log N(d; genuine) - log N(d; impostor) to every
+    candidate's running total (a sequential probability ratio test). A user
+    is accepted when their total crosses the upper bound and their mean
+    distance is below the matcher threshold; the attempt is rejected when
+    every candidate falls below the lower bound. The frame and time budgets
+    end undecided attempts as a reject.
+    """
+
+    def __init__(self, users: Sequence[str],
+                 false_accept_rate: float = FALSE_ACCEPT_RATE,
+                 false_reject_rate: float = FALSE_REJECT_RATE,
+                 min_frames: int = MIN_FRAMES,
+                 max_frames: int = MAX_FRAMES,
+                 time_budget: Optional[float] = None,
+                 threshold: float = MATCH_THRESHOLD,
+                 model: Optional[Dict[str, float]] = None):
+        self.users = [str(u) for u in users]
+        self.model = model or load_distance_model()
+        self.upper = math.log((1 - false_reject_rate) / false_accept_rate)
+        self.lower = math.log(false_reject_rate / (1 - false_accept_rate))
+        self.min_frames = min_frames
+        self.max_frames = max_frames
+        self.time_budget = time_budget
+        self.threshold = threshold
+        self.llr = np.zeros(len(self.users), dtype=np.float64)
+        self.distance_sum = np.zeros(len(self.users), dtype=np.float64)
+        self.frames_used = 0
+        self.start = time.monotonic()
+
+    def frame_llr(self, distances: np.ndarray) -> np.ndarray:
+        """Genuine-vs-impostor log-likelihood ratio of each user's distance for one frame."""
+        d = np.asarray(distances, dtype=np.float64)
+        m = self.model
+        genuine = -0.5 * ((d - m["genuine_mean"]) / m["genuine_std"]) ** 2 - math.log(m["genuine_std"])
+        impostor = -0.5 * ((d - m["impostor_mean"]) / m["impostor_std"]) ** 2 - math.log(m["impostor_std"])
+        return np.clip(genuine - impostor, -MAX_FRAME_LLR, MAX_FRAME_LLR)
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.start
+
+    def update(self, distances: np.ndarray) -> Optional[Dict[str, Any]]:
+        """Add one frame's per-user distances; return a result once the test stops."""
+        self.frames_used += 1
+        if len(self.users):
+            self.llr += self.frame_llr(distances)
+            self.distance_sum += np.asarray(distances, dtype=np.float64)
+        return self.check()
+
+    def check(self) -> Optional[Dict[str, Any]]:
+        """Return a result if a bound or a budget has been reached, else None."""
+        if not len(self.users):
+            return self.finish("reject")
+        if self.frames_used >= self.min_frames:
+            best = int(np.argmax(self.llr))
+            mean_distance = self.distance_sum[best] / self.frames_used
+            if self.llr[best] >= self.upper and mean_distance < self.threshold:
+                return self.finish("match", best)
+            if self.llr.max() <= self.lower:
+                return self.finish("reject")
+        if self.frames_used >= self.max_frames:
+            return self.finish("frame_budget")
+        if self.time_budget is not None and self.elapsed() >= self.time_budget:
+            return self.finish("time_budget")
+        return None
+
+    def finish(self, reason: str = "no_more_frames", best: Optional[int] = None) -> Dict[str, Any]:
+        """Build the final result; anything but a bound-crossing match is a reject."""
+        matched = reason == "match" and best is not None
+        result = {
+            "match": matched,
+            "name": self.users[best] if matched else "unknown",
+            "decision": reason,
+            "frames_used": self.frames_used,
+            "elapsed_ms": round(self.elapsed() * 1000, 1),
+        }
+        if self.frames_used and len(self.users):
+            top = best if best is not None else int(np.argmax(self.llr))
+            result["distance"] = float(self.distance_sum[top] / self.frames_used)
+            result["llr"] = float(self.llr[top])
+        return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fit and evaluate the sequential decision's distance models")
+    parser.add_argument("command", choices=["fit", "evaluate"],
+                        help="fit: write DISTANCE_MODEL_PATH from the gallery; evaluate: report FAR/FRR only")
+    parser.add_argument("--embeddings", default=None, help="Embeddings path (default: the enrolled gallery)")
+    parser.add_argument("--model", default=DISTANCE_MODEL_PATH)
+    parser.add_argument("--trials", type=int, default=EVAL_TRIALS)
+    args = parser.parse_args()
+
+    from deepface_scripts.embed_utils import EMBEDDINGS_PATH, load_gallery_arrays
+    from deepface_scripts.benchmarks import print_table
+    user_ids, vectors = load_gallery_arrays(args.embeddings or EMBEDDINGS_PATH)
+    labels, users, distances = sample_distances(user_ids, vectors)
+    print(f"[INFO] {len(labels)} probe samples against {len(users)} users")
+    if args.command == "fit":
+        model = fit_distance_model(labels, users, distances)
+        with open(args.model, "w") as f:
+            json.dump(model, f, indent=2)
+        print(f"[INFO] Wrote {args.model}: {model}")
+    model = load_distance_model(args.model)
+    print_table(evaluate_decisions(labels, users, distances, model=model, trials=args.trials))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+import os
+import threading
+import time
+import multiprocessing as mp
+import numpy as np
+from multiprocessing import resource_tracker, shared_memory
+from typing import Any, Dict, List, Optional, Sequence
+from deepface_scripts.gallery import GalleryMatcher, l2_normalize, score_rows, top_k_mean
+
+# Worker processes scanning the gallery; 1 keeps the in-process GalleryMatcher.
+GALLERY_SHARDS = 1
+# CPU cores the shard workers are pinned to (worker i -> cores[i % len(cores)]),
+# e.g. (1, 2, 3) to keep them off the core TensorFlow and the camera use.
+# None leaves scheduling to the OS.
+SHARD_CORES = None
+START_METHOD = "fork"  # Workers only need NumPy; forking avoids re-importing the caller
+
+
+def shard_bounds(counts: np.ndarray, shards: int) -> List[int]:
+    """User indices splitting the (user-sorted) rows into `shards` runs of roughly equal size."""
+    cum = np.cumsum(counts)
+    total = int(cum[-1]) if len(cum) else 0
+    targets = total * np.arange(1, shards) / shards
+    cuts = np.minimum(np.searchsorted(cum, targets, side="left") + 1, len(counts))
+    return [0] + list(np.maximum.accumulate(cuts).astype(int)) + [len(counts)]
+
+
+def _attach(spec):
+    name, shape, dtype = spec
+    shm = shared_memory.SharedMemory(name=name)
+    return shm, np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+
+def _shard_worker(conn, core: Optional[int]):
+    """Serve one contiguous run of users from shared memory until told to stop."""
+    if core is not None and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, {core})
+    handles, shard = [], None
+    try:
+        while True:
+            command, payload = conn.recv()
+            if command == "load":
+                for shm in handles:
+                    shm.close()
+                handles, shard = [], payload
+                if payload is not None:
+                    shm, matrix = _attach(payload["matrix"])
+                    handles.append(shm)
+                    scales = None
+                    if payload["scales"] is not None:
+                        shm, scales = _attach(payload["scales"])
+                        handles.append(shm)
+                    start, stop = payload["rows"]
+                    shard = dict(payload, matrix=matrix[start:stop],
+                                 scales=None if scales is None else scales[start:stop])
+                conn.send(True)
+            elif command == "score":
+                if shard is None:
+                    conn.send(np.zeros((len(payload), 0), dtype=np.float32))
+                    continue
+                sims = score_rows(payload, shard["matrix"], shard["scales"])
+                sims = np.concatenate([sims, np.full((len(payload), 1), -np.inf, dtype=np.float32)], axis=1)
+                conn.send(top_k_mean(sims[:, shard["pad_index"]], shard["top_k"], shard["k_eff"]))
+            else:
+                break
+    finally:
+        for shm in handles:
+            shm.close()
+
+
+class ShardedMatcher:
+    """Scatter/gather wrapper that scores a GalleryMatcher's rows on a pool of processes.
+
+    The quantized sample matrix is copied once into shared memory and split
+    at user boundaries into `shards` runs of similar size; each persistent
+    worker (optionally pinned to a core) scores its run and returns top-k
+    means for its users, which are concatenated in user order. Every query
+    scans all rows: the centroid shortlist is not used here, sharding is
+    for galleries where an exhaustive scan is wanted but too slow on one core.
+
+    Call load() with each new GalleryMatcher; the workers stay up and just
+    re-attach. Everything except scoring (users, updated(), nbytes, ...) is
+    delegated to the current matcher.
+    """
+
+    def __init__(self, shards: int = GALLERY_SHARDS, cores: Optional[Sequence[int]] = SHARD_CORES,
+                 start_method: str = START_METHOD):
+        self.shards = max(1, int(shards))
+        self.cores = list(cores) if cores else None
+        self.matcher = None
+        self._bounds = []
+        self._shm = []
+        self._lock = threading.Lock()
+        context = mp.get_context(start_method)
+        # Start the tracker before forking so workers share it rather than each
+        # starting one that would unlink the parent's blocks when they exit
+        resource_tracker.ensure_running()
+        self._conns, self._workers = [], []
+        for i in range(self.shards):
+            parent, child = context.Pipe()
+            core = self.cores[i % len(self.cores)] if self.cores else None
+            worker = context.Process(target=_shard_worker, args=(child, core), name=f"gallery-shard-{i}", daemon=True)
+            worker.start()
+            child.close()
+            self._conns.append(parent)
+            self._workers.append(worker)
+
+    def _share(self, array: np.ndarray):
+        shm = shared_memory.SharedMemory(create=True, size=max(1, array.nbytes))
+        np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[...] = array
+        self._shm.append(shm)
+        return shm.name, array.shape, array.dtype.str
+
+    def load(self, matcher: GalleryMatcher) -> "ShardedMatcher":
+        """Point the workers at a new gallery; returns self."""
+        with self._lock:
+            previous, self._shm = self._shm, []
+            matrix = self._share(matcher.matrix)
+            scales = self._share(matcher.scales) if matcher.scales is not None else None
+            self._bounds = shard_bounds(matcher.counts, self.shards)
+            n = len(matcher.labels)
+            for conn, lo, hi in zip(self._conns, self._bounds[:-1], self._bounds[1:]):
+                spec = None
+                if hi > lo:
+                    start = int(matcher._offsets[lo])
+                    stop = int(matcher._offsets[hi - 1] + matcher.counts[hi - 1])
+                    pad = matcher._pad_index[lo:hi]
+                    # Row indices relative to the shard; padding -> the shard's -inf column
+                    pad = np.where(pad < n, pad - start, stop - start)
+                    width = int(matcher.counts[lo:hi].max())
+                    spec = {"matrix": matrix, "scales": scales, "rows": (start, stop),
+                            "pad_index": np.ascontiguousarray(pad[:, :width]),
+                            "k_eff": matcher._k_eff[lo:hi], "top_k": matcher.top_k}
+                conn.send(("load", spec))
+            for conn in self._conns:
+                conn.recv()
+            for shm in previous:
+                shm.close()
+                shm.unlink()
+            self.matcher = matcher
+        return self
+
+    def __getattr__(self, name: str) -> Any:
+        if name == "matcher":
+            raise AttributeError(name)
+        return getattr(self.matcher, name)
+
+    def __len__(self) -> int:
+        return len(self.matcher)
+
+    def user_scores(self, queries: np.ndarray) -> np.ndarray:
+        """(frames, users) top-k mean similarities, gathered from every shard."""
+        q = l2_normalize(np.atleast_2d(queries))
+        with self._lock:
+            for conn in self._conns:
+                conn.send(("score", q))
+            parts = [conn.recv() for conn in self._conns]
+        return np.concatenate(parts, axis=1)
+
+    user_distances = GalleryMatcher.user_distances
+    match = GalleryMatcher.match
+
+    def close(self):
+        with self._lock:
+            for conn in self._conns:
+                try:
+                    conn.send(("stop", None))
+                except (BrokenPipeError, OSError):
+                    pass
+            for worker in self._workers:
+                worker.join(timeout=2)
+                if worker.is_alive():
+                    worker.terminate()
+            for shm in self._shm:
+                shm.close()
+                shm.unlink()
+            self._shm = []
+
+    def __enter__(self) -> "ShardedMatcher":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def benchmark_shards(user_ids: Sequence[str], vectors: np.ndarray, queries: np.ndarray,
+                     shard_counts: Sequence[int], cores: Optional[Sequence[int]] = None,
+                     repeats: int = 5) -> List[Dict[str, Any]]:
+    """Exhaustive-scan latency of the in-process matcher (1 shard) versus the process pool."""
+    matcher = GalleryMatcher(user_ids, vectors, shortlist=None)
+    expected = matcher.user_scores(queries)
+    rows = []
+    for shards in shard_counts:
+        searcher = matcher if shards <= 1 else ShardedMatcher(shards, cores).load(matcher)
+        try:
+            searcher.user_scores(queries[:1])  # Warm up
+            start = time.perf_counter()
+            for _ in range(repeats):
+                for q in queries:
+                    searcher.user_scores(q)
+            ms = 1000 * (time.perf_counter() - start) / (repeats * len(queries))
+            max_diff = float(np.abs(searcher.user_scores(queries) - expected).max()) if len(expected) else 0.0
+        finally:
+            if shards > 1:
+                searcher.close()
+        rows.append({"gallery_vectors": len(matcher), "shards": shards, "ms_per_query": ms, "max_score_diff": max_diff})
+    return rows
@@ -1,38 +1,58 @@
 import cv2
 import numpy as np
 from deepface_scripts import data_utils, embed_utils
+from deepface_scripts.embedding_repository import add_user_embeddings, replace_user, remove_user
+from deepface_scripts.prototypes import compact_entry
+from deepface_scripts.enrollment_capture import capture_enrollment, stream_enrollment
 import pickle
 import uuid
 from core.user_profile import UserProfile, save_user_profile
 from hardware.fp_utils import enroll_fingerprint
 from hardware.aggregator import log_event
 
-def start_face_embedding_extraction(user_id):
-    """Capture images and store face embeddings for a user."""
+# Store k-means prototypes instead of every inlier. Opt-in: top-k mean
+# distances against MATCH_THRESHOLD were tuned on full galleries; check
+# `python -m deepface_scripts.prototypes report` before enabling.
+COMPACT_ON_ENROLL = False
+# "stream" (embed as frames arrive, stop on convergence), "quality" (scored and
+# diversity-filtered batch) or "fixed" (first 200 crops, then DBSCAN)
+ENROLL_MODE = "stream"
+
+def start_face_embedding_extraction(user_id, replace=False):
+    """Capture images and store face embeddings for a user (replacing any existing ones if replace=True)."""
     try:
-        # Capture 200 images
-        images = data_utils.generate_dataset(user_id)
-        if not images:
-            raise ValueError("Failed to capture images")
-        
-        # Extract and filter embeddings
-        embeddings = embed_utils.extract_embeddings_from_memory(user_id, images)
-        filtered_embeddings = embed_utils.remove_outliers(embeddings)
+        if ENROLL_MODE == "stream":
+            # Embed while capturing; outliers are rejected on the fly and capture stops on convergence
+            vectors, _ = stream_enrollment(user_id)
+            if not len(vectors):
+                raise ValueError("Failed to capture images")
+            filtered_embeddings = [{"user_id": user_id, "embedding": v.tolist()} for v in vectors]
+        else:
+            if ENROLL_MODE == "quality":
+                # Sharp, diverse crops, embedded during selection so not embedded again here
+                images, vectors, _ = capture_enrollment(user_id)
+                embeddings = [{"user_id": user_id, "embedding": v.tolist()} for v in vectors]
+            else:
+                images = data_utils.generate_dataset(user_id, mode="fixed")
+                embeddings = embed_utils.extract_embeddings_from_memory(user_id, images)
+            if not images:
+                raise ValueError("Failed to capture images")
+            filtered_embeddings = embed_utils.remove_outliers(embeddings)
         if not filtered_embeddings:
             raise ValueError("No valid embeddings after filtering")
         
-        # Load existing embeddings
-        existing_embeddings = embed_utils.load_embeddings()
-        
-        # Append new embeddings
-        new_entry = {
-            "user_id": user_id,
-            "embeddings": filtered_embeddings
-        }
-        existing_embeddings.append(new_entry)
-        
-        # Save updated embeddings
-        embed_utils.save_embeddings(existing_embeddings)
+        # Store new embeddings, optionally reduced to per-user prototypes
+        if COMPACT_ON_ENROLL:
+            new_entry = compact_entry(user_id, filtered_embeddings)
+        else:
+            new_entry = {
+                "user_id": user_id,
+                "embeddings": filtered_embeddings
+            }
+        if replace:
+            replace_user(user_id, [new_entry])
+        else:
+            add_user_embeddings(user_id, [new_entry])
         log_event(f"Face embeddings saved for user ID {user_id}")
         return True
     except Exception as e:
@@ -61,9 +81,7 @@ def add_new_user(user_id, name, role, fp_position):
         return None
 
 def delete_existing_user(user_id):
-    emb = load_embeddings()
-    filtered = [e for e in emb if e["user_id"] != user_id]
-    save_embeddings(filtered)
+    remove_user(user_id)
     print(f"[INFO] User {user_id}'s embeddings were removed")
 
 # Retained for testing
@@ -1,14 +1,55 @@
-import React, { useEffect, useState } from "react";
+import React, { useCallback, useEffect, useState } from "react";
+
+const API_URL = "http://localhost:8000/admin/api/embeddings"; // adjust the port if needed
+const PAGE_SIZE = 50;
+const PLOT_SIZE = 300;
+const COLORS = ["#e6194b", "#3cb44b", "#4363d8", "#f58231", "#911eb4", "#42d4f4", "#f032e6", "#9a6324"];
+
+// Scatter plot of the server-side 2-D projection, scaled to fit the box.
+function ProjectionPlot({ users }) {
+  const all = users.flatMap((user) => user.points);
+  if (all.length === 0) return null;
+  const xs = all.map((p) => p[0]);
+  const ys = all.map((p) => p[1]);
+  const minX = Math.min(...xs);
+  const minY = Math.min(...ys);
+  const scale = (PLOT_SIZE - 20) / Math.max(Math.max(...xs) - minX, Math.max(...ys) - minY, 1e-6);
+  const toX = (x) => 10 + (x - minX) * scale;
+  const toY = (y) => PLOT_SIZE - 10 - (y - minY) * scale;
+
+  return (
+    <svg width={PLOT_SIZE} height={PLOT_SIZE} style={{ border: "1px solid #ccc" }}>
+      {users.map((user, i) => (
+        <g key={user.user_id} fill={COLORS[i % COLORS.length]}>
+          {user.points.map((p, j) => (
+            <circle key={j} cx={toX(p[0])} cy={toY(p[1])} r={2} opacity={0.6} />
+          ))}
+          <text x={toX(user.center[0])} y={toY(user.center[1])} fontSize={10}>
+            {user.user_id}
+          </text>
+        </g>
+      ))}
+    </svg>
+  );
+}
 
 function EmbeddingViewer() {
-  const [embeddings, setEmbeddings] = useState([]);
+  const [users, setUsers] = useState([]);
+  const [totals, setTotals] = useState({ users: 0, vectors: 0, version: null });
+  const [nextOffset, setNextOffset] = useState(0);
   const [loading, setLoading] = useState(true);
+  const [projection, setProjection] = useState([]);
 
-  useEffect(() => {
-    fetch("http://localhost:8000/api/embeddings") // adjust the port if needed
+  // Summary mode: per-user counts and spread only, one page at a time,
+  // instead of every 512-d vector as text.
+  const loadPage = useCallback((offset) => {
+    setLoading(true);
+    fetch(`${API_URL}?mode=summary&offset=${offset}&limit=${PAGE_SIZE}`)
       .then((response) => response.json())
       .then((data) => {
-        setEmbeddings(data.embeddings || []);
+        setUsers((previous) => (offset === 0 ? data.users : previous.concat(data.users)));
+        setTotals({ users: data.total_users, vectors: data.total_vectors, version: data.version });
+        setNextOffset(data.next_offset);
         setLoading(false);
       })
       .catch((error) => {
@@ -17,24 +58,45 @@ function EmbeddingViewer() {
       });
   }, []);
 
-  if (loading) return <p>Loading embeddings...</p>;
+  useEffect(() => {
+    loadPage(0);
+    fetch(`${API_URL}/projection`)
+      .then((response) => response.json())
+      .then((data) => setProjection(data.users || []))
+      .catch((error) => console.error("Error fetching projection:", error));
+  }, [loadPage]);
+
+  if (loading && users.length === 0) return <p>Loading embeddings...</p>;
 
   return (
     <div>
       <h2>Loaded Embeddings</h2>
-      {embeddings.length === 0 ? (
+      <p>
+        {totals.users} users, {totals.vectors} vectors (gallery version {totals.version})
+      </p>
+      <ProjectionPlot users={projection} />
+      {users.length === 0 ? (
         <p>No embeddings found.</p>
       ) : (
         <ul>
-          {embeddings.map((item, index) => (
-            <li key={index}>
+          {users.map((item) => (
+            <li key={item.user_id}>
               <strong>User ID:</strong> {item.user_id}
               <br />
-              <strong>Embedding:</strong> {item.embedding.slice(0, 5).join(", ")}...
+              <strong>Vectors:</strong> {item.count}
+              {item.prototypes ? ` prototypes (from ${item.sample_count} samples)` : ""}
+              <br />
+              <strong>Spread:</strong>{" "}
+              {item.spread === null ? "-" : `${item.spread.toFixed(3)} (max ${item.max_distance.toFixed(3)})`}
             </li>
           ))}
         </ul>
       )}
+      {nextOffset !== null && (
+        <button onClick={() => loadPage(nextOffset)} disabled={loading}>
+          {loading ? "Loading..." : "Load more"}
+        </button>
+      )}
     </div>
   );
 }
@@ -17,6 +17,8 @@ pygame.mixer.init()
 TIMEOUT = 200
 timeout_thread = None
 timeout_lock = threading.Lock()
+face_thread = None
+face_lock = threading.Lock()
 
 # In-memory log storage for GUI (last 100 logs)
 recent_logs = deque(maxlen=100)
@@ -81,6 +83,16 @@ def start_timeout():
             timeout_thread.start()
             log_event("Started session timeout", gui_keywords=True)
 
+def request_face():
+    """Ask the recognition service for a face result in the background; a match arrives as "face_result"."""
+    global face_thread
+    from deepface_scripts.recognition_client import recognize_and_report
+    with face_lock:
+        if face_thread is None or not face_thread.is_alive():
+            face_thread = threading.Thread(target=recognize_and_report, daemon=True)
+            face_thread.start()
+            log_event("Requested face recognition", gui_keywords=True)
+
 def update_input(input_type, value):
     global session
     session[input_type] = value
@@ -109,6 +121,9 @@ def update_input(input_type, value):
                 log_event("[ERROR]", "Access Rejected", gui_keywords=True)
                 pygame.mixer.Sound("/home/salah/doorLockGui/hardware/Sounds/failure.wav").play()
         clear_session()
+    elif input_type != "face_result" and not (session["face_result"] and session["face_result"].get("match")):
+        # The session still needs another factor: look for a face at the door
+        request_face()
 
 def get_required_inputs():
     try:
@@ -55,7 +55,7 @@ if __name__ == "__main__":
     scripts = [
         f"{base_dir}/Blynk/blynk_code.py",
         f"{base_dir}/gui/start_react.py",
-        #f"{base_dir}/deepface_scripts/recognize_from_camera.py",
+        f"{base_dir}/deepface_scripts/recognition_service.py",     # Resident face recognition (warm models)
         f"{base_dir}/hardware/aggregator.py",
         f"{base_dir}/start_mjpeg.py",                              # MJPEG server first
         f"{base_dir}/hardware/fp_input.py",
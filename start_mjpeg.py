@@ -8,6 +8,7 @@ import logging
 import socketserver
 from http import server
 from threading import Condition
+from deepface_scripts.frame_source import SharedFrameWriter
 
 # Updated HTML page with clean styling
 PAGE = """\
@@ -42,12 +43,23 @@ PAGE = """\
 class StreamingOutput(io.BufferedIOBase):
     def __init__(self):
         self.frame = None
+        self.timestamp = None
         self.condition = Condition()
+        # Local consumers (face recognition) read frames from shared memory instead of HTTP
+        try:
+            self.shared = SharedFrameWriter()
+        except Exception as e:
+            logging.warning('Shared-memory frame feed disabled: %s', str(e))
+            self.shared = None
 
     def write(self, buf):
+        timestamp = time.time()
         with self.condition:
             self.frame = buf
+            self.timestamp = timestamp
             self.condition.notify_all()
+        if self.shared is not None:
+            self.shared.write(buf, timestamp)
         return len(buf)
 
 class StreamingHandler(server.BaseHTTPRequestHandler):
@@ -76,9 +88,11 @@ class StreamingHandler(server.BaseHTTPRequestHandler):
                     with output.condition:
                         output.condition.wait()
                         frame = output.frame
+                        timestamp = output.timestamp
                     self.wfile.write(b'--FRAME\r\n')
                     self.send_header('Content-Type', 'image/jpeg')
                     self.send_header('Content-Length', len(frame))
+                    self.send_header('X-Timestamp', f'{timestamp:.6f}')
                     self.end_headers()
                     self.wfile.write(frame)
                     self.wfile.write(b'\r\n')
@@ -120,3 +134,5 @@ try:
     server.serve_forever()
 finally:
     picam2.stop_recording()
+    if output.shared is not None:
+        output.shared.close()
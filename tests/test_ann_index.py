@@ -0,0 +1,103 @@
+import os
+import numpy as np
+from deepface_scripts import gallery
+from deepface_scripts.ann_index import IVFIndex, exact_search, index_path, load_index, sync_index
+from deepface_scripts.embedding_store import get_store
+from deepface_scripts.gallery import GalleryMatcher, l2_normalize
+
+
+def vectors(n, seed):
+    return np.random.default_rng(seed).standard_normal((n, 512)).astype(np.float32)
+
+
+def user_rows(index, user_id):
+    return sum(int((labels == user_id).sum()) for labels in index.labels)
+
+
+def test_sync_without_index_file_does_not_duplicate(tmp_path):
+    path = str(tmp_path / "face_embeddings.pkl")
+    store = get_store(path)
+    store.append("alice", vectors(5, 0))
+    store.replace("bob", vectors(3, 1))
+    assert not os.path.exists(index_path(path))
+    index = sync_index(path)
+    assert user_rows(index, "bob") == 3
+    assert len(index) == 8
+
+
+def test_sync_after_replace(tmp_path):
+    path = str(tmp_path / "face_embeddings.pkl")
+    store = get_store(path)
+    store.append("alice", vectors(5, 0))
+    store.append("bob", vectors(3, 1))
+    sync_index(path)
+    store.replace("bob", vectors(4, 2))
+    index = sync_index(path)
+    assert user_rows(index, "bob") == 4
+    assert len(load_index(path)) == 9
+
+
+def test_sync_inside_writer_lock(tmp_path):
+    path = str(tmp_path / "face_embeddings.pkl")
+    store = get_store(path)
+    store.append("alice", vectors(5, 0))
+    with store.exclusive():
+        assert sync_index(path).version == store.version
+
+
+def test_sync_applies_only_changes(tmp_path):
+    path = str(tmp_path / "face_embeddings.pkl")
+    store = get_store(path)
+    store.append("alice", vectors(5, 0))
+    store.append("bob", vectors(3, 1))
+    assert len(sync_index(path)) == 8
+    store.append("alice", vectors(2, 3))
+    store.remove("bob")
+    store.append("carol", vectors(4, 4))
+    index = sync_index(path)
+    assert index.version == store.version
+    assert (user_rows(index, "alice"), user_rows(index, "bob"), user_rows(index, "carol")) == (7, 0, 4)
+    assert load_index(path).version == store.version
+
+
+def test_sync_rebuilds_after_compaction(tmp_path):
+    path = str(tmp_path / "face_embeddings.pkl")
+    store = get_store(path)
+    store.append("alice", vectors(5, 0))
+    sync_index(path)
+    store.append("bob", vectors(3, 1))
+    store.compact()
+    assert store.changes_since(load_index(path).version) is None
+    index = sync_index(path)
+    assert len(index) == 8 and index.version == store.version
+
+
+def test_full_probe_matches_exact_search():
+    data = l2_normalize(vectors(600, 5))
+    labels = np.array([f"u{i // 20}" for i in range(len(data))])
+    index = IVFIndex.train(labels, data)
+    queries = vectors(10, 6)
+    found, sims = index.search(queries, 5, nprobe=len(index.centroids))
+    exact_labels, exact_sims = exact_search(data, labels, queries, 5)
+    np.testing.assert_allclose(sims, exact_sims, rtol=1e-5, atol=1e-5)
+    assert (found == exact_labels).all()
+
+
+def test_matcher_searches_index_above_threshold(monkeypatch):
+    labels = np.array([f"u{i // 10}" for i in range(600)])
+    centres = vectors(60, 7)
+    data = centres[np.arange(600) // 10] + 0.5 * vectors(600, 8)
+    queries = centres[[3, 42]] + 0.5 * vectors(2, 9)
+    exact = GalleryMatcher(labels, data, shortlist=None)
+    monkeypatch.setattr(gallery, "ANN_MIN_SAMPLES", 100)
+    matcher = GalleryMatcher(labels, data, shortlist=None, index=IVFIndex.train(labels, data, nlist=16, nprobe=4))
+    calls = []
+    search = matcher.index.search
+    monkeypatch.setattr(matcher.index, "search", lambda *a, **kw: calls.append(1) or search(*a, **kw))
+    distances, expected = matcher.user_distances(queries), exact.user_distances(queries)
+    assert calls
+    for i, user in enumerate(("u3", "u42")):
+        j = list(exact.users).index(user)
+        assert distances[i].argmin() == expected[i].argmin() == j
+        assert abs(distances[i, j] - expected[i, j]) < 1e-5
+    assert matcher.updated({"u0": None}).index is None
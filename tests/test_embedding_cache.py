@@ -0,0 +1,37 @@
+import numpy as np
+from deepface_scripts.embedding_cache import CachedEngine
+
+
+class CountingEngine:
+    def __init__(self):
+        self.calls = 0
+
+    def represent(self, crops, batch_size=None):
+        self.calls += len(crops)
+        return np.random.default_rng(self.calls).standard_normal((len(crops), 512)).astype(np.float32)
+
+
+def face(seed):
+    return np.random.default_rng(seed).integers(0, 256, (120, 100, 3), dtype=np.uint8)
+
+
+def test_near_duplicates_reuse_within_an_attempt():
+    engine = CountingEngine()
+    cached = CachedEngine(engine)
+    crop = face(0)
+    first = cached.represent([crop])
+    again = cached.represent([crop.copy()])
+    np.testing.assert_array_equal(first, again)
+    assert engine.calls == 1
+
+
+def test_reset_forgets_earlier_attempts():
+    engine = CountingEngine()
+    cached = CachedEngine(engine)
+    crop = face(0)
+    first = cached.represent([crop])
+    cached.reset()
+    second = cached.represent([crop])
+    assert engine.calls == 2
+    assert not np.array_equal(first, second)
+    assert cached.stats()["misses"] == 2
@@ -0,0 +1,81 @@
+import numpy as np
+from deepface_scripts.embedding_store import EmbeddingStore
+
+
+def vectors(n, seed):
+    return np.random.default_rng(seed).standard_normal((n, 512)).astype(np.float32)
+
+
+def make_store(tmp_path):
+    return EmbeddingStore(str(tmp_path / "face_embeddings.store"))
+
+
+def test_append_replace_remove(tmp_path):
+    store = make_store(tmp_path)
+    a1, a2, b = vectors(3, 0), vectors(2, 1), vectors(4, 2)
+    assert store.append("alice", a1) == 1
+    assert store.append("alice", a2, {"note": "x"}) == 2
+    assert store.append("bob", b) == 3
+    np.testing.assert_array_equal(store.user_vectors("alice"), np.concatenate([a1, a2]))
+    assert store.user_meta("alice") == {"note": "x"}
+    b2 = vectors(1, 3)
+    store.replace("bob", b2)
+    np.testing.assert_array_equal(store.user_vectors("bob"), b2)
+    assert store.remove("alice")
+    assert not store.remove("alice")
+    assert store.user_ids() == ["bob"]
+    assert len(store) == 1
+    assert store.version == 5
+
+
+def test_state_survives_reopen(tmp_path):
+    store = make_store(tmp_path)
+    store.append("alice", vectors(3, 0))
+    store.replace("bob", vectors(2, 1))
+    store.remove("alice")
+    reopened = make_store(tmp_path)
+    assert reopened.version == store.version
+    assert reopened.user_ids() == ["bob"]
+    np.testing.assert_array_equal(reopened.user_vectors("bob"), vectors(2, 1))
+
+
+def test_changes_since(tmp_path):
+    store = make_store(tmp_path)
+    store.append("alice", vectors(3, 0))
+    base = store.append("bob", vectors(2, 1))
+    assert store.changes_since(base) == {}
+    store.append("alice", vectors(1, 2))
+    store.remove("bob")
+    changes = store.changes_since(base)
+    assert set(changes) == {"alice", "bob"}
+    assert changes["bob"] is None
+    assert len(changes["alice"]) == 4
+    assert store.changes_since(store.version + 1) is None
+
+
+def test_compact_keeps_contents_and_version(tmp_path):
+    store = make_store(tmp_path)
+    store.append("alice", vectors(3, 0))
+    store.append("bob", vectors(2, 1))
+    store.append("alice", vectors(2, 2))
+    store.remove("bob")
+    before_ids, before = store.arrays()
+    version = store.version
+    store.compact()
+    after_ids, after = store.arrays()
+    assert store.version == version
+    assert after_ids == before_ids
+    np.testing.assert_array_equal(after, before)
+    assert store.dead_fraction() == 0.0
+    assert store.changes_since(version - 1) is None
+    assert len(list((tmp_path / "face_embeddings.store").glob("*.npy"))) == 1
+
+
+def test_replace_all(tmp_path):
+    store = make_store(tmp_path)
+    store.append("alice", vectors(3, 0))
+    entries = [{"user_id": "carol", "embedding": v} for v in vectors(2, 5)]
+    version = store.replace_all(entries)
+    assert version == 2
+    assert store.user_ids() == ["carol"]
+    np.testing.assert_array_equal(store.user_vectors("carol"), vectors(2, 5))
@@ -0,0 +1,97 @@
+import numpy as np
+import pytest
+from deepface_scripts.gallery import EMBEDDING_DIM, GalleryMatcher, l2_normalize
+
+
+def clustered_gallery(users=12, samples=(1, 9), spread=0.6, seed=0):
+    """User ids and vectors scattered around one random centre per user."""
+    rng = np.random.default_rng(seed)
+    user_ids, vectors, centres = [], [], {}
+    for u in range(users):
+        user_id = f"user{u:02d}"
+        centres[user_id] = rng.normal(size=EMBEDDING_DIM)
+        for _ in range(rng.integers(*samples)):
+            user_ids.append(user_id)
+            vectors.append(centres[user_id] + spread * rng.normal(size=EMBEDDING_DIM))
+    return user_ids, np.asarray(vectors, dtype=np.float32), centres
+
+
+def brute_force_distances(user_ids, vectors, queries, top_k):
+    """Per-user loop: 1 - mean of the top-k cosine similarities, one frame at a time."""
+    labels = np.asarray(user_ids)
+    users = sorted(set(user_ids))
+    out = np.empty((len(queries), len(users)))
+    for i, query in enumerate(queries):
+        q = query / np.linalg.norm(query)
+        for j, user_id in enumerate(users):
+            samples = vectors[labels == user_id]
+            sims = sorted((s @ q / np.linalg.norm(s) for s in samples), reverse=True)
+            out[i, j] = 1.0 - np.mean(sims[:top_k])
+    return users, out
+
+
+@pytest.mark.parametrize("top_k", [1, 3, 5])
+def test_distances_match_brute_force(top_k):
+    user_ids, vectors, _ = clustered_gallery()
+    queries = np.random.default_rng(1).normal(size=(4, EMBEDDING_DIM))
+    matcher = GalleryMatcher(user_ids, vectors, top_k=top_k, shortlist=None)
+    users, expected = brute_force_distances(user_ids, vectors, queries, top_k)
+    assert list(matcher.users) == users
+    np.testing.assert_allclose(matcher.user_distances(queries), expected, atol=1e-5)
+
+
+def test_match_picks_brute_force_best_user():
+    user_ids, vectors, centres = clustered_gallery()
+    query = centres["user07"] + 0.6 * np.random.default_rng(2).normal(size=EMBEDDING_DIM)
+    users, expected = brute_force_distances(user_ids, vectors, query[None], top_k=5)
+    matcher = GalleryMatcher(user_ids, vectors, shortlist=None)
+    result = matcher.match(query)
+    assert result["user_id"] == users[int(expected[0].argmin())] == "user07"
+    assert result["distance"] == pytest.approx(expected[0].min(), abs=1e-5)
+    assert result["margin"] == pytest.approx(np.sort(expected[0])[1] - expected[0].min(), abs=1e-5)
+    assert result["match"] == (result["distance"] < matcher.threshold)
+
+
+def test_shortlist_keeps_the_best_user_exact():
+    user_ids, vectors, centres = clustered_gallery(users=40)
+    rng = np.random.default_rng(3)
+    queries = np.stack([centres[u] + 0.6 * rng.normal(size=EMBEDDING_DIM) for u in ("user03", "user31")])
+    users, expected = brute_force_distances(user_ids, vectors, queries, top_k=5)
+    distances = GalleryMatcher(user_ids, vectors, shortlist=8).user_distances(queries)
+    for i, user_id in enumerate(("user03", "user31")):
+        j = users.index(user_id)
+        assert distances[i].argmin() == expected[i].argmin() == j
+        assert distances[i, j] == pytest.approx(expected[i, j], abs=1e-5)
+    # Users outside a frame's shortlist are reported at the maximum distance
+    assert np.all(np.isclose(distances, expected, atol=1e-5) | np.isclose(distances, 2.0))
+
+
+def test_updated_matches_rebuild():
+    user_ids, vectors, _ = clustered_gallery()
+    matcher = GalleryMatcher(user_ids, vectors, shortlist=None)
+    new = np.random.default_rng(4).normal(size=(3, EMBEDDING_DIM)).astype(np.float32)
+    changed = matcher.updated({"user02": None, "user05": new, "newcomer": new[:1]})
+    labels = np.asarray(user_ids)
+    keep = ~np.isin(labels, ["user02", "user05"])
+    rebuilt = GalleryMatcher(list(labels[keep]) + ["user05"] * 3 + ["newcomer"],
+                             np.concatenate([vectors[keep], new, new[:1]]), shortlist=None)
+    queries = np.random.default_rng(5).normal(size=(3, EMBEDDING_DIM))
+    assert list(changed.users) == list(rebuilt.users)
+    assert "user02" not in changed.users
+    np.testing.assert_allclose(changed.user_distances(queries), rebuilt.user_distances(queries), atol=1e-5)
+
+
+@pytest.mark.parametrize("precision, ratio, atol", [("float16", 2, 2e-3), ("int8", 3.5, 2e-2)])
+def test_quantized_precision_tracks_float32(precision, ratio, atol):
+    user_ids, vectors, _ = clustered_gallery()
+    queries = np.random.default_rng(6).normal(size=(4, EMBEDDING_DIM))
+    exact = GalleryMatcher(user_ids, vectors, shortlist=None)
+    quantized = GalleryMatcher(user_ids, vectors, shortlist=None, precision=precision)
+    assert exact.nbytes / quantized.nbytes >= ratio
+    np.testing.assert_allclose(quantized.user_distances(queries), exact.user_distances(queries), atol=atol)
+    np.testing.assert_allclose(quantized.vectors(), l2_normalize(exact.vectors()), atol=atol)
+
+
+def test_empty_gallery_never_matches():
+    result = GalleryMatcher([], np.zeros((0, EMBEDDING_DIM))).match(np.ones(EMBEDDING_DIM))
+    assert result["match"] is False and result["user_id"] is None
@@ -0,0 +1,36 @@
+import threading
+from deepface_scripts.gallery_events import GalleryWatcher
+
+
+def watcher(tmp_path, on_change, version=3):
+    w = GalleryWatcher(str(tmp_path / "face_embeddings.pkl"), on_change)
+    w.version = version
+    return w
+
+
+def test_only_newer_versions_fire(tmp_path):
+    seen = []
+    w = watcher(tmp_path, seen.append)
+    for version in (3, 5, 4, 5, 2, 6):
+        w._notify(version)
+    assert seen == [5, 6]
+    assert w.version == 6
+
+
+def test_callbacks_do_not_overlap(tmp_path):
+    active, overlaps, seen = [], [], []
+
+    def on_change(version):
+        active.append(version)
+        overlaps.append(len(active) > 1)
+        seen.append(version)
+        active.pop()
+
+    w = watcher(tmp_path, on_change, version=0)
+    threads = [threading.Thread(target=w._notify, args=(v,)) for v in range(1, 50)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert not any(overlaps)
+    assert seen == sorted(seen)
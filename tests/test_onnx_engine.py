@@ -0,0 +1,18 @@
+import os
+import pytest
+from deepface_scripts.benchmarks import TEST_DATASET_DIR, load_test_images, onnx_embeddings, cosine_similarities
+from deepface_scripts.embedding_engine import ONNX_MODEL
+
+pytest.importorskip("deepface")
+pytestmark = pytest.mark.skipif(not os.path.exists(ONNX_MODEL), reason=f"ONNX ArcFace not exported: {ONNX_MODEL}")
+
+MIN_COSINE = 0.99
+
+
+def test_onnx_matches_deepface_represent():
+    images = load_test_images(TEST_DATASET_DIR)
+    if not images:
+        pytest.skip(f"No test images in {TEST_DATASET_DIR}")
+    similarities = cosine_similarities(*onnx_embeddings(images))
+    low = [(i, round(float(s), 4)) for i, s in enumerate(similarities) if s < MIN_COSINE]
+    assert not low, f"ONNX embeddings diverge from DeepFace.represent (image, cosine): {low}"
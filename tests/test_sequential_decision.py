@@ -0,0 +1,72 @@
+import math
+import numpy as np
+import pytest
+from deepface_scripts.benchmarks import synthetic_gallery
+from deepface_scripts.sequential_decision import (DEFAULT_MODEL, MAX_FRAME_LLR, SequentialDecision, evaluate_decisions,
+                                                  fit_distance_model, sample_distances)
+
+USERS = ["alice", "bob"]
+
+
+def decision(**kwargs):
+    kwargs.setdefault("model", DEFAULT_MODEL)
+    return SequentialDecision(USERS, **kwargs)
+
+
+def run(dec, frames):
+    for row in frames:
+        result = dec.update(np.array(row))
+        if result:
+            return result
+    return dec.finish()
+
+
+def test_wald_bounds():
+    dec = decision(false_accept_rate=1e-3, false_reject_rate=1e-2)
+    assert dec.upper == pytest.approx(math.log(0.99 / 1e-3))
+    assert dec.lower == pytest.approx(math.log(1e-2 / 0.999))
+
+
+def test_no_decision_before_min_frames():
+    dec = decision(min_frames=3)
+    assert dec.update(np.array([0.2, 0.8])) is None
+    assert dec.update(np.array([0.2, 0.8])) is None
+    result = dec.update(np.array([0.2, 0.8]))
+    assert result["match"] and result["name"] == "alice" and result["frames_used"] == 3
+
+
+def test_frame_evidence_is_clipped():
+    llr = decision().frame_llr(np.array([-5.0, 5.0]))
+    assert llr[0] == MAX_FRAME_LLR and llr[1] == -MAX_FRAME_LLR
+
+
+def test_impostor_is_rejected():
+    result = run(decision(), [[0.75, 0.8]] * 10)
+    assert not result["match"] and result["decision"] == "reject"
+
+
+def test_upper_bound_needs_mean_under_threshold():
+    # Strong evidence for alice, but a mean distance above the matcher threshold
+    model = {"genuine_mean": 0.45, "genuine_std": 0.05, "impostor_mean": 0.9, "impostor_std": 0.05}
+    result = run(decision(model=model, max_frames=5), [[0.45, 0.9]] * 5)
+    assert not result["match"] and result["decision"] == "frame_budget"
+
+
+def test_undecided_attempt_hits_frame_budget():
+    result = run(decision(max_frames=4), [[0.475, 0.9]] * 4)
+    assert not result["match"] and result["decision"] == "frame_budget" and result["frames_used"] == 4
+
+
+def test_no_users_rejects():
+    result = SequentialDecision([], model=DEFAULT_MODEL).update(np.zeros(0))
+    assert not result["match"]
+
+
+def test_fitted_model_keeps_false_accepts_at_or_below_vote():
+    ids, vectors, _ = synthetic_gallery(20, 15, spread=0.8)
+    labels, users, distances = sample_distances(ids, vectors)
+    model = fit_distance_model(labels, users, distances)
+    assert model["genuine_mean"] < model["impostor_mean"]
+    rows = {row["method"]: row for row in evaluate_decisions(labels, users, distances, model=model, trials=100)}
+    assert rows["sequential"]["far"] <= rows["vote"]["far"]
+    assert rows["sequential"]["mean_frames"] < rows["vote"]["mean_frames"]